@@ -0,0 +1,132 @@
+import asyncio
+import random
+from typing import List
+
+import httpx
+
+
+class RpcError(Exception):
+    """Error returned by an ethereum json rpc node"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class AsyncEthClient:
+    """Minimal asyncio ethereum json rpc client.
+
+    One client is kept per chain and shared by every coroutine touching that chain.
+    On transport errors the request moves to the next endpoint, like FallbackProvider.
+    """
+
+    def __init__(self, endpoints: List[str], timeout=10, max_attempts=5):
+        assert endpoints, "Endpoint not config"
+        self.endpoints = list(endpoints)
+        self.endpoint = self.endpoints[0]
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self._client = None
+        self._request_id = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def update_endpoint(self):
+        self.endpoint = self.endpoints[(self.endpoints.index(self.endpoint) + 1) % len(self.endpoints)]
+
+    def _next_id(self):
+        self._request_id += 1
+        return self._request_id
+
+    async def post(self, payload):
+        last_error = None
+        for attempt in range(self.max_attempts):
+            try:
+                response = await self.client.post(self.endpoint, json=payload)
+                response.raise_for_status()
+                return response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                last_error = e
+                self.update_endpoint()
+                await asyncio.sleep(random.uniform(0.2, 0.5) * (attempt + 1))
+        raise last_error
+
+    async def request(self, method, params=None):
+        response = await self.post({
+            "jsonrpc": "2.0",
+            "id": self._next_id(),
+            "method": method,
+            "params": params or []
+        })
+        if "error" in response:
+            raise RpcError(response["error"].get("message"), response["error"].get("code"))
+        return response["result"]
+
+    async def batch_request(self, calls):
+        """
+        Send several json rpc calls in one http request.
+
+        :param calls: [(method, params), ...]
+        :return: results in the order of calls, an RpcError in place of a failed call
+        """
+        if not calls:
+            return []
+        payload = [
+            {"jsonrpc": "2.0", "id": index, "method": method, "params": params}
+            for index, (method, params) in enumerate(calls)
+        ]
+        response = await self.post(payload)
+        results = [None] * len(calls)
+        for item in response:
+            if "error" in item:
+                results[item["id"]] = RpcError(item["error"].get("message"), item["error"].get("code"))
+            else:
+                results[item["id"]] = item["result"]
+        return results
+
+    async def block_number(self):
+        return int(await self.request("eth_blockNumber"), 16)
+
+    async def gas_price(self):
+        return int(await self.request("eth_gasPrice"), 16)
+
+    async def get_balance(self, address, block="latest"):
+        return int(await self.request("eth_getBalance", [address, block]), 16)
+
+    async def get_transaction_count(self, address, block="pending"):
+        return int(await self.request("eth_getTransactionCount", [address, block]), 16)
+
+    async def get_logs(self, log_filter):
+        log_filter = dict(log_filter)
+        for key in ["fromBlock", "toBlock"]:
+            if isinstance(log_filter.get(key), int):
+                log_filter[key] = hex(log_filter[key])
+        return await self.request("eth_getLogs", [log_filter])
+
+    async def get_block_by_number(self, block, full_transactions=False):
+        if isinstance(block, int):
+            block = hex(block)
+        return await self.request("eth_getBlockByNumber", [block, full_transactions])
+
+    async def get_transaction_receipt(self, tx_hash):
+        return await self.request("eth_getTransactionReceipt", [tx_hash])
+
+    async def call(self, to, data, block="latest"):
+        return await self.request("eth_call", [{"to": to, "data": data}, block])
+
+    async def estimate_gas(self, tx):
+        return int(await self.request("eth_estimateGas", [tx]), 16)
+
+    async def send_raw_transaction(self, raw_tx):
+        if isinstance(raw_tx, bytes):
+            raw_tx = "0x" + raw_tx.hex()
+        return await self.request("eth_sendRawTransaction", [raw_tx])
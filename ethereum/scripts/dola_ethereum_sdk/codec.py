@@ -0,0 +1,499 @@
+"""
+Dola payload codecs in pure python, mirroring pool_codec.move, lending_codec.move and system_codec.move
+(LibPoolCodec.sol, LibLendingCodec.sol and LibSystemCodec.sol on evm).
+
+Integers are serialized big endian as in serde.move. A DolaAddress is encoded as dola_chain_id u16 | address
+and embedded in a payload behind its u16 length.
+
+A wormhole message sent by a pool to the core is a pool deposit or send message payload, which carries the
+payload of the app named by app_id (system or lending) at its end.
+"""
+
+# App ids
+SYSTEM_APP_ID = 0
+LENDING_APP_ID = 1
+
+# Pool call types
+POOL_DEPOSIT = 0
+POOL_WITHDRAW = 1
+POOL_SEND_MESSAGE = 2
+POOL_REGISTER_OWNER = 3
+POOL_REGISTER_SPENDER = 4
+POOL_DELETE_OWNER = 5
+POOL_DELETE_SPENDER = 6
+
+# Lending call types
+SUPPLY = 0
+WITHDRAW = 1
+BORROW = 2
+REPAY = 3
+LIQUIDATE = 4
+AS_COLLATERAL = 5
+CANCEL_AS_COLLATERAL = 6
+
+# System call types
+BINDING = 0
+UNBINDING = 1
+
+
+class CodecError(ValueError):
+    """Payload that does not match the layout of the codec"""
+
+
+class PayloadReader:
+    """Cursor over a payload, reading fields the way serde::vector_slice/deserialize_* do"""
+
+    def __init__(self, data):
+        self.data = bytes(data)
+        self.index = 0
+
+    def read(self, length):
+        if self.index + length > len(self.data):
+            raise CodecError(f"Payload too short, need {self.index + length} bytes, got {len(self.data)}")
+        data = self.data[self.index:self.index + length]
+        self.index += length
+        return data
+
+    def uint(self, size):
+        return int.from_bytes(self.read(size), "big")
+
+    def u8(self):
+        return self.uint(1)
+
+    def u16(self):
+        return self.uint(2)
+
+    def u64(self):
+        return self.uint(8)
+
+    def u256(self):
+        return self.uint(32)
+
+    def vector(self):
+        """u16 length prefixed bytes"""
+        return self.read(self.u16())
+
+    def dola_address(self):
+        return DolaAddress.decode(self.vector())
+
+    def remaining(self):
+        return len(self.data) - self.index
+
+    def call_type(self, *expected):
+        call_type = self.u8()
+        if expected and call_type not in expected:
+            raise CodecError(f"Invalid call type {call_type}, expect one of {expected}")
+        return call_type
+
+    def finish(self):
+        if self.index != len(self.data):
+            raise CodecError(f"Invalid payload length {len(self.data)}, decoded {self.index} bytes")
+
+
+def serialize_uint(value, size):
+    try:
+        return int(value).to_bytes(size, "big")
+    except OverflowError as e:
+        raise CodecError(f"{value} does not fit in u{size * 8}") from e
+
+
+def serialize_vector(data):
+    return serialize_uint(len(data), 2) + bytes(data)
+
+
+def to_bytes(data):
+    """Accept bytes or a hex string with or without 0x"""
+    if isinstance(data, str):
+        return bytes.fromhex(data.replace("0x", ""))
+    return bytes(data)
+
+
+class DolaAddress:
+    def __init__(self, dola_chain_id, dola_address):
+        self.dola_chain_id = dola_chain_id
+        self.dola_address = to_bytes(dola_address)
+
+    def encode(self):
+        return serialize_uint(self.dola_chain_id, 2) + self.dola_address
+
+    @classmethod
+    def decode(cls, data):
+        data = to_bytes(data)
+        if len(data) < 2:
+            raise CodecError("DolaAddress too short")
+        return cls(int.from_bytes(data[:2], "big"), data[2:])
+
+    @property
+    def address(self):
+        return f"0x{self.dola_address.hex()}"
+
+    def __eq__(self, other):
+        return isinstance(other, DolaAddress) and \
+            (self.dola_chain_id, self.dola_address) == (other.dola_chain_id, other.dola_address)
+
+    def __hash__(self):
+        return hash((self.dola_chain_id, self.dola_address))
+
+    def __repr__(self):
+        return f"DolaAddress({self.dola_chain_id}, {self.address})"
+
+
+class Payload:
+    """Base of the payload types, compared and printed by their fields"""
+
+    def encode(self) -> bytes:
+        raise NotImplementedError
+
+    @classmethod
+    def decode(cls, payload):
+        reader = PayloadReader(to_bytes(payload))
+        decoded = cls.read(reader)
+        reader.finish()
+        return decoded
+
+    @classmethod
+    def read(cls, reader: PayloadReader):
+        raise NotImplementedError
+
+    def to_hex(self):
+        return f"0x{self.encode().hex()}"
+
+    def __eq__(self, other):
+        return type(self) is type(other) and vars(self) == vars(other)
+
+    def __repr__(self):
+        fields = ", ".join(f"{key}={value!r}" for key, value in vars(self).items())
+        return f"{type(self).__name__}({fields})"
+
+
+# === Pool codec ===
+
+class PoolDepositPayload(Payload):
+    call_type = POOL_DEPOSIT
+
+    def __init__(self, pool: DolaAddress, user: DolaAddress, amount, app_id, app_payload=b""):
+        self.pool = pool
+        self.user = user
+        self.amount = amount
+        self.app_id = app_id
+        self.app_payload = to_bytes(app_payload)
+
+    def encode(self):
+        payload = serialize_uint(self.app_id, 2) + serialize_vector(self.pool.encode()) + \
+            serialize_vector(self.user.encode()) + serialize_uint(self.amount, 8) + serialize_uint(POOL_DEPOSIT, 1)
+        if self.app_payload:
+            payload += serialize_vector(self.app_payload)
+        return payload
+
+    @classmethod
+    def read(cls, reader):
+        app_id = reader.u16()
+        pool = reader.dola_address()
+        user = reader.dola_address()
+        amount = reader.u64()
+        reader.call_type(POOL_DEPOSIT)
+        app_payload = reader.vector() if reader.remaining() else b""
+        return cls(pool, user, amount, app_id, app_payload)
+
+
+class PoolWithdrawPayload(Payload):
+    call_type = POOL_WITHDRAW
+
+    def __init__(self, source_chain_id, nonce, pool: DolaAddress, user: DolaAddress, amount):
+        self.source_chain_id = source_chain_id
+        self.nonce = nonce
+        self.pool = pool
+        self.user = user
+        self.amount = amount
+
+    def encode(self):
+        return serialize_uint(self.source_chain_id, 2) + serialize_uint(self.nonce, 8) + \
+            serialize_vector(self.pool.encode()) + serialize_vector(self.user.encode()) + \
+            serialize_uint(self.amount, 8) + serialize_uint(POOL_WITHDRAW, 1)
+
+    @classmethod
+    def read(cls, reader):
+        source_chain_id = reader.u16()
+        nonce = reader.u64()
+        pool = reader.dola_address()
+        user = reader.dola_address()
+        amount = reader.u64()
+        reader.call_type(POOL_WITHDRAW)
+        return cls(source_chain_id, nonce, pool, user, amount)
+
+
+class PoolSendMessagePayload(Payload):
+    call_type = POOL_SEND_MESSAGE
+
+    def __init__(self, user: DolaAddress, app_id, app_payload=b""):
+        self.user = user
+        self.app_id = app_id
+        self.app_payload = to_bytes(app_payload)
+
+    def encode(self):
+        payload = serialize_uint(self.app_id, 2) + serialize_vector(self.user.encode()) + \
+            serialize_uint(POOL_SEND_MESSAGE, 1)
+        if self.app_payload:
+            payload += serialize_vector(self.app_payload)
+        return payload
+
+    @classmethod
+    def read(cls, reader):
+        app_id = reader.u16()
+        user = reader.dola_address()
+        reader.call_type(POOL_SEND_MESSAGE)
+        app_payload = reader.vector() if reader.remaining() else b""
+        return cls(user, app_id, app_payload)
+
+
+class ManagePoolPayload(Payload):
+    """Register or delete a pool owner or spender"""
+
+    def __init__(self, dola_chain_id, dola_contract, call_type):
+        self.dola_chain_id = dola_chain_id
+        self.dola_contract = dola_contract
+        self.call_type = call_type
+
+    def encode(self):
+        return serialize_uint(self.dola_chain_id, 2) + serialize_uint(self.dola_contract, 32) + \
+            serialize_uint(self.call_type, 1)
+
+    @classmethod
+    def read(cls, reader):
+        dola_chain_id = reader.u16()
+        dola_contract = reader.u256()
+        call_type = reader.call_type(POOL_REGISTER_OWNER, POOL_REGISTER_SPENDER, POOL_DELETE_OWNER,
+                                     POOL_DELETE_SPENDER)
+        return cls(dola_chain_id, dola_contract, call_type)
+
+
+# === Lending codec ===
+
+class LendingDepositPayload(Payload):
+    """Supply or repay"""
+
+    def __init__(self, source_chain_id, nonce, receiver: DolaAddress, call_type):
+        self.source_chain_id = source_chain_id
+        self.nonce = nonce
+        self.receiver = receiver
+        self.call_type = call_type
+
+    def encode(self):
+        return serialize_uint(self.source_chain_id, 2) + serialize_uint(self.nonce, 8) + \
+            serialize_vector(self.receiver.encode()) + serialize_uint(self.call_type, 1)
+
+    @classmethod
+    def read(cls, reader):
+        source_chain_id = reader.u16()
+        nonce = reader.u64()
+        receiver = reader.dola_address()
+        call_type = reader.call_type()
+        return cls(source_chain_id, nonce, receiver, call_type)
+
+
+class LendingWithdrawPayload(Payload):
+    """Withdraw or borrow"""
+
+    def __init__(self, source_chain_id, nonce, amount, pool: DolaAddress, receiver: DolaAddress, call_type):
+        self.source_chain_id = source_chain_id
+        self.nonce = nonce
+        self.amount = amount
+        self.pool = pool
+        self.receiver = receiver
+        self.call_type = call_type
+
+    def encode(self):
+        return serialize_uint(self.source_chain_id, 2) + serialize_uint(self.nonce, 8) + \
+            serialize_uint(self.amount, 8) + serialize_vector(self.pool.encode()) + \
+            serialize_vector(self.receiver.encode()) + serialize_uint(self.call_type, 1)
+
+    @classmethod
+    def read(cls, reader):
+        source_chain_id = reader.u16()
+        nonce = reader.u64()
+        amount = reader.u64()
+        pool = reader.dola_address()
+        receiver = reader.dola_address()
+        call_type = reader.call_type()
+        return cls(source_chain_id, nonce, amount, pool, receiver, call_type)
+
+
+class LendingLiquidatePayload(Payload):
+    call_type = LIQUIDATE
+
+    def __init__(self, source_chain_id, nonce, withdraw_pool: DolaAddress, liquidate_user_id):
+        self.source_chain_id = source_chain_id
+        self.nonce = nonce
+        self.withdraw_pool = withdraw_pool
+        self.liquidate_user_id = liquidate_user_id
+
+    def encode(self):
+        return serialize_uint(self.source_chain_id, 2) + serialize_uint(self.nonce, 8) + \
+            serialize_vector(self.withdraw_pool.encode()) + serialize_uint(self.liquidate_user_id, 8) + \
+            serialize_uint(LIQUIDATE, 1)
+
+    @classmethod
+    def read(cls, reader):
+        source_chain_id = reader.u16()
+        nonce = reader.u64()
+        withdraw_pool = reader.dola_address()
+        liquidate_user_id = reader.u64()
+        reader.call_type(LIQUIDATE)
+        return cls(source_chain_id, nonce, withdraw_pool, liquidate_user_id)
+
+
+class LendingLiquidatePayloadV2(Payload):
+    call_type = LIQUIDATE
+    length = 23
+
+    def __init__(self, source_chain_id, nonce, repay_pool_id, liquidate_user_id, liquidate_pool_id):
+        self.source_chain_id = source_chain_id
+        self.nonce = nonce
+        self.repay_pool_id = repay_pool_id
+        self.liquidate_user_id = liquidate_user_id
+        self.liquidate_pool_id = liquidate_pool_id
+
+    def encode(self):
+        return serialize_uint(self.source_chain_id, 2) + serialize_uint(self.nonce, 8) + \
+            serialize_uint(self.repay_pool_id, 2) + serialize_uint(self.liquidate_user_id, 8) + \
+            serialize_uint(self.liquidate_pool_id, 2) + serialize_uint(LIQUIDATE, 1)
+
+    @classmethod
+    def read(cls, reader):
+        source_chain_id = reader.u16()
+        nonce = reader.u64()
+        repay_pool_id = reader.u16()
+        liquidate_user_id = reader.u64()
+        liquidate_pool_id = reader.u16()
+        reader.call_type(LIQUIDATE)
+        return cls(source_chain_id, nonce, repay_pool_id, liquidate_user_id, liquidate_pool_id)
+
+
+class ManageCollateralPayload(Payload):
+    """As collateral or cancel as collateral"""
+
+    def __init__(self, dola_pool_ids, call_type):
+        self.dola_pool_ids = list(dola_pool_ids)
+        self.call_type = call_type
+
+    def encode(self):
+        payload = serialize_uint(len(self.dola_pool_ids), 2)
+        for dola_pool_id in self.dola_pool_ids:
+            payload += serialize_uint(dola_pool_id, 2)
+        return payload + serialize_uint(self.call_type, 1)
+
+    @classmethod
+    def read(cls, reader):
+        count = reader.u16()
+        dola_pool_ids = [reader.u16() for _ in range(count)]
+        call_type = reader.call_type()
+        return cls(dola_pool_ids, call_type)
+
+
+# === System codec ===
+
+class BindPayload(Payload):
+    """Binding or unbinding"""
+
+    def __init__(self, source_chain_id, nonce, binding: DolaAddress, call_type):
+        self.source_chain_id = source_chain_id
+        self.nonce = nonce
+        self.binding = binding
+        self.call_type = call_type
+
+    def encode(self):
+        return serialize_uint(self.source_chain_id, 2) + serialize_uint(self.nonce, 8) + \
+            serialize_vector(self.binding.encode()) + serialize_uint(self.call_type, 1)
+
+    @classmethod
+    def read(cls, reader):
+        source_chain_id = reader.u16()
+        nonce = reader.u64()
+        binding = reader.dola_address()
+        call_type = reader.call_type(BINDING, UNBINDING)
+        return cls(source_chain_id, nonce, binding, call_type)
+
+
+LENDING_PAYLOADS = {
+    SUPPLY: LendingDepositPayload,
+    WITHDRAW: LendingWithdrawPayload,
+    BORROW: LendingWithdrawPayload,
+    REPAY: LendingDepositPayload,
+    AS_COLLATERAL: ManageCollateralPayload,
+    CANCEL_AS_COLLATERAL: ManageCollateralPayload,
+}
+
+
+def decode_lending_payload(app_payload):
+    app_payload = to_bytes(app_payload)
+    if not app_payload:
+        raise CodecError("Empty lending payload")
+    call_type = app_payload[-1]
+    if call_type == LIQUIDATE:
+        # A v1 payload embeds a DolaAddress of at least 3 bytes, so only v2 is 23 bytes long
+        if len(app_payload) == LendingLiquidatePayloadV2.length:
+            return LendingLiquidatePayloadV2.decode(app_payload)
+        return LendingLiquidatePayload.decode(app_payload)
+    if call_type not in LENDING_PAYLOADS:
+        raise CodecError(f"Unknown lending call type {call_type}")
+    return LENDING_PAYLOADS[call_type].decode(app_payload)
+
+
+def decode_app_payload(app_id, app_payload):
+    """:return: the payload object of the app, system or lending"""
+    if app_id == SYSTEM_APP_ID:
+        return BindPayload.decode(app_payload)
+    if app_id == LENDING_APP_ID:
+        return decode_lending_payload(app_payload)
+    raise CodecError(f"Unknown app id {app_id}")
+
+
+def decode_pool_payload(payload):
+    """
+    Decode a payload sent by a pool to the core (deposit or send message) or by the core to a pool
+    (withdraw or manage pool).
+    """
+    payload = to_bytes(payload)
+    for payload_type in [PoolDepositPayload, PoolSendMessagePayload, PoolWithdrawPayload, ManagePoolPayload]:
+        try:
+            return payload_type.decode(payload)
+        except CodecError:
+            continue
+    raise CodecError(f"Unknown pool payload 0x{payload.hex()}")
+
+
+class DolaMessage:
+    """A message from a pool to the core: the pool payload and the app payload it carries"""
+
+    def __init__(self, pool_payload, app_payload):
+        self.pool_payload = pool_payload
+        self.app_payload = app_payload
+
+    @classmethod
+    def decode(cls, payload):
+        pool_payload = decode_pool_payload(payload)
+        if not isinstance(pool_payload, (PoolDepositPayload, PoolSendMessagePayload)):
+            raise CodecError(f"Pool call type {pool_payload.call_type} is not sent to the core")
+        return cls(pool_payload, decode_app_payload(pool_payload.app_id, pool_payload.app_payload))
+
+    @property
+    def app_id(self):
+        return self.pool_payload.app_id
+
+    @property
+    def call_type(self):
+        return self.app_payload.call_type
+
+    @property
+    def user(self):
+        return self.pool_payload.user
+
+    @property
+    def nonce_key(self):
+        """(source_chain_id, nonce) of the app payload, None for payloads without a nonce"""
+        if hasattr(self.app_payload, "nonce"):
+            return self.app_payload.source_chain_id, self.app_payload.nonce
+        return None
+
+    def __repr__(self):
+        return f"DolaMessage({self.pool_payload!r}, {self.app_payload!r})"
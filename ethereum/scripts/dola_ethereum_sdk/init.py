@@ -1,5 +1,4 @@
 import os
-import time
 
 import brownie
 import requests
@@ -7,9 +6,33 @@ import web3
 from brownie import (
     network,
     config, )
+from eth_abi import decode_abi, encode_abi
 from web3_multi_provider import MultiProvider, FallbackProvider
 
 from dola_ethereum_sdk import load, get_account, set_ethereum_network
+from dola_ethereum_sdk.client import AsyncEthClient
+from dola_ethereum_sdk.log_scanner import LogScanner
+from dola_ethereum_sdk.multicall import Call
+from dola_ethereum_sdk.registry import registry
+from dola_ethereum_sdk.vaa import Vaa
+
+RELAY_EVENT_TOPIC = '0x5ed67fb05a814ff06302127070d306aa25929e34ac0e29ed7dfe3f0212854078'
+
+LOG_MESSAGE_PUBLISHED_TOPIC = web3.Web3.keccak(
+    text="LogMessagePublished(address,uint64,uint32,bytes,uint8)").hex()
+
+PARSE_VM_SELECTOR = web3.Web3.keccak(text="parseVM(bytes)")[:4]
+
+RECEIVE_WITHDRAW_SELECTOR = web3.Web3.keccak(text="receiveWithdraw(bytes)")[:4]
+
+CONSUMED_VAAS_SELECTOR = web3.Web3.keccak(text="consumedVaas(bytes32)")[:4]
+
+# DolaPool emits DepositPool(tx.origin, token, amount) although the event declares (pool, spender, amount)
+DEPOSIT_POOL_TOPIC = web3.Web3.keccak(text="DepositPool(address,address,uint256)").hex()
+
+WITHDRAW_POOL_TOPIC = web3.Web3.keccak(text="WithdrawPool(address,address,uint256)").hex()
+
+WORMHOLE_VM_TYPE = '(uint8,uint32,uint32,uint16,bytes32,uint64,uint8,bytes,uint32,(bytes32,bytes32,uint8,uint8)[],bytes32)'
 
 
 def get_scan_api_key(net="polygon-test"):
@@ -137,22 +160,85 @@ def decode_relay_events(response):
     return events
 
 
-def query_relay_event_by_get_logs(w3_client, lending_portal: str, system_portal: str, start_block=0):
-    log_filter = {'fromBlock': start_block, 'address': [lending_portal, system_portal],
-                  'topics': ['0x5ed67fb05a814ff06302127070d306aa25929e34ac0e29ed7dfe3f0212854078']}
+def relay_log_filter(lending_portal: str, system_portal: str):
+    return {'address': [lending_portal, system_portal], 'topics': [RELAY_EVENT_TOPIC]}
 
-    logs = w3_client.eth.get_logs(log_filter)
+
+def query_relay_event_by_get_logs(w3_client, lending_portal: str, system_portal: str, start_block=0):
+    log_filter = dict(relay_log_filter(lending_portal, system_portal), fromBlock=start_block)
+
+    logs = [dict(log) for log in w3_client.eth.get_logs(log_filter)]
+    timestamps = {}
+    for log in logs:
+        if log['blockNumber'] not in timestamps:
+            timestamps[log['blockNumber']] = w3_client.eth.get_block(log['blockNumber'])['timestamp']
+        log['blockTimestamp'] = timestamps[log['blockNumber']]
     return decode_relay_logs(logs)
 
 
+def message_log_filter(wormhole: str, sender: str):
+    """LogMessagePublished logs of the wormhole core contract, sender is indexed"""
+    return {'address': wormhole, 'topics': [LOG_MESSAGE_PUBLISHED_TOPIC, f"0x{sender[2:].lower().zfill(64)}"]}
+
+
+def relay_log_scanner(client: AsyncEthClient, lending_portal: str, system_portal: str, wormhole: str,
+                      wormhole_adapter_pool: str, **kwargs):
+    """Scanner of the relay events and of the wormhole messages published by the pool in the same chunks"""
+    log_filters = [relay_log_filter(lending_portal, system_portal),
+                   message_log_filter(wormhole, wormhole_adapter_pool)]
+    return LogScanner(client, log_filters, **kwargs)
+
+
+def decode_message_log(log):
+    """:return: (sequence, payload hex) of a LogMessagePublished log"""
+    (sequence, _, payload, _) = decode_abi(['uint64', 'uint32', 'bytes', 'uint8'], bytes.fromhex(log['data'][2:]))
+    return sequence, f"0x{payload.hex()}"
+
+
+def pool_log_filter(dola_pool: str):
+    return {'address': dola_pool, 'topics': [[DEPOSIT_POOL_TOPIC, WITHDRAW_POOL_TOPIC]]}
+
+
+def decode_pool_log(log):
+    """:return: (token, signed amount) moved in or out of the pool by a DepositPool or WithdrawPool log"""
+    (first, second, amount) = decode_abi(['address', 'address', 'uint256'], bytes.fromhex(log['data'][2:]))
+    if log['topics'][0] == DEPOSIT_POOL_TOPIC:
+        return second.lower(), amount
+    return first.lower(), -amount
+
+
+async def async_scan_relay_events(scanner: LogScanner, from_block, to_block):
+    """
+    Scan one round of relay events from from_block towards to_block. Each event gets the payload of the wormhole
+    message published by its transaction, joined by transaction hash and sequence.
+    :return: (relay events, last block scanned)
+    """
+    logs, scanned_to = await scanner.scan(from_block, to_block)
+
+    relay_logs = []
+    payloads = {}
+    for log in logs:
+        if log['topics'][0] == LOG_MESSAGE_PUBLISHED_TOPIC:
+            sequence, payload = decode_message_log(log)
+            payloads[(log['transactionHash'], sequence)] = payload
+        else:
+            relay_logs.append(log)
+
+    events = decode_relay_logs(relay_logs)
+    for event in events:
+        event['payload'] = payloads.get((event['transactionHash'], event['sequence']), "")
+    return events, scanned_to
+
+
 def decode_relay_logs(logs):
     events = []
 
     if logs:
         for log in logs:
             block_number = int(log['blockNumber'])
-            tx_hash = log['transactionHash'].hex()
-            timestamp = int(time.time())
+            tx_hash = log['transactionHash']
+            tx_hash = tx_hash if isinstance(tx_hash, str) else tx_hash.hex()
+            timestamp = int(log['blockTimestamp'])
             data = log['data']
             index = 2
             sequence = int(data[index:index + 64], 16)
@@ -186,30 +272,89 @@ def get_payload_from_chain(tx_id):
     return tx.events['LogMessagePublished']['payload']
 
 
+async def async_get_payload_from_chain(client: AsyncEthClient, tx_id):
+    receipt = await client.get_transaction_receipt(tx_id)
+    for log in receipt['logs']:
+        if log['topics'] and log['topics'][0] == LOG_MESSAGE_PUBLISHED_TOPIC:
+            return decode_message_log(log)[1]
+    return ""
+
+
+async def async_parse_vm_payload(client: AsyncEthClient, wormhole: str, vaa: str):
+    """
+    function parseVM(bytes memory encodedVM) external pure returns (Structs.VM memory vm)
+    :return: vm payload
+    """
+    data = PARSE_VM_SELECTOR + encode_abi(['bytes'], [bytes.fromhex(vaa.replace('0x', ''))])
+    result = await client.call(wormhole, f"0x{data.hex()}")
+    (vm,) = decode_abi([WORMHOLE_VM_TYPE], bytes.fromhex(result[2:]))
+    return f"0x{vm[7].hex()}"
+
+
+def receive_withdraw_data(vaa):
+    """
+    function receiveWithdraw(bytes memory encodedVm) public onlyRelayer
+    :return: calldata hex
+    """
+    if isinstance(vaa, str):
+        vaa = bytes.fromhex(vaa.replace('0x', ''))
+    data = RECEIVE_WITHDRAW_SELECTOR + encode_abi(['bytes'], [bytes(vaa)])
+    return f"0x{data.hex()}"
+
+
+async def async_is_vaa_consumed(client: AsyncEthClient, wormhole_adapter_pool: str, vaa):
+    """
+    mapping(bytes32 => bool) public consumedVaas, keyed by the vm hash: keccak256(keccak256(body))
+    :return: whether a receiveWithdraw of vaa was executed
+    """
+    data = CONSUMED_VAAS_SELECTOR + Vaa.parse(vaa).digest
+    result = await client.call(wormhole_adapter_pool, f"0x{data.hex()}")
+    return int(result, 16) != 0
+
+
 def get_dola_pool():
     return config["networks"][network.show_active()]["dola_pool"]
 
 
-def get_dola_contract():
-    network = brownie.network.show_active()
-    wormhole_adapter = load.wormhole_adapter_pool_package(network)
-    return wormhole_adapter.getDolaContract()
+ERC20_DECIMALS_SELECTOR = '0x313ce567'
+
+ERC20_BALANCE_OF_SELECTOR = '0x70a08231'
+
 
+async def async_erc20_decimals(client: AsyncEthClient, token):
+    result = await client.call(token, ERC20_DECIMALS_SELECTOR)
+    return int(result, 16)
 
-def get_all_spenders():
-    dola_pool = load.dola_pool_package(brownie.network.show_active())
+
+async def async_erc20_balance(client: AsyncEthClient, token, owner):
+    data = ERC20_BALANCE_OF_SELECTOR + owner.lower().replace('0x', '').zfill(64)
+    result = await client.call(token, data)
+    return int(result, 16)
+
+
+def get_dola_contract(network=None):
+    """:param network: defaults to the connected brownie network"""
+    network = network or brownie.network.show_active()
+    wormhole_adapter = registry.contract(network, "WormholeAdapterPool")
+    return wormhole_adapter.functions.getDolaContract().call()
+
+
+def get_all_spenders(network=None, batch_size=16):
+    """
+    Read allSpenders(i) in multicall batches until an index is out of range.
+    :param network: defaults to the connected brownie network
+    """
+    network = network or brownie.network.show_active()
+    dola_pool = registry.address(network, "DolaPool")
+    multicall = registry.multicall(network)
     all_spenders = []
-    i = 0
     while True:
-        try:
-            result = dola_pool.allSpenders(i)
-        except:
-            break
-        if str(result)[:2] != "0x":
-            break
-        all_spenders.append(result)
-        i += 1
-    return all_spenders
+        calls = [Call(dola_pool, "allSpenders(uint256)", [i], ['address'])
+                 for i in range(len(all_spenders), len(all_spenders) + batch_size)]
+        for result in multicall.aggregate(calls):
+            if result is None:
+                return all_spenders
+            all_spenders.append(result)
 
 
 def multi_endpoints_web3(network, external_endpoint=None):
@@ -228,6 +373,14 @@ def fallback_endpoints_web3(network, external_endpoint=None):
     return web3.Web3(FallbackProvider(endpoints))
 
 
+def async_endpoints_client(network, external_endpoint=None):
+    if external_endpoint is None:
+        external_endpoint = []
+
+    endpoints = external_endpoint + web3_endpoints(network)
+    return AsyncEthClient(endpoints)
+
+
 if __name__ == "__main__":
     net = "polygon-main"
     set_ethereum_network(net)
@@ -0,0 +1,114 @@
+import asyncio
+from collections import OrderedDict
+
+import httpx
+
+from dola_ethereum_sdk.client import AsyncEthClient, RpcError
+
+
+class LogScanner:
+    """
+    eth_getLogs over a block range split into chunks fetched in parallel, one chunk per rpc endpoint.
+    Every filter is queried for each chunk in the same batched request, so logs of several contracts come from
+    one scan.
+
+    The chunk size adapts to the provider limits: it is halved when a chunk fails (range or result size limit,
+    timeout) and grows again after rounds without errors. Logs come back with the timestamp of their block,
+    read through batched eth_getBlockByNumber calls.
+    """
+
+    def __init__(self, client: AsyncEthClient, log_filters, chunk_size=2000, min_chunk_size=10,
+                 max_chunk_size=10000, max_timestamps=10000):
+        """
+        :param log_filters: eth_getLogs filters without fromBlock/toBlock
+        """
+        self.log_filters = log_filters
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        # Each client starts on a different endpoint and falls back to the others
+        endpoints = client.endpoints
+        self.clients = [AsyncEthClient(endpoints[i:] + endpoints[:i], client.timeout, client.max_attempts)
+                        for i in range(len(endpoints))]
+        self.timestamps = OrderedDict()
+        self.max_timestamps = max_timestamps
+
+    async def close(self):
+        for client in self.clients:
+            await client.close()
+
+    async def get_logs(self, client, from_block, to_block):
+        results = await client.batch_request([
+            ("eth_getLogs", [dict(log_filter, fromBlock=hex(from_block), toBlock=hex(to_block))])
+            for log_filter in self.log_filters
+        ])
+        logs = []
+        for result in results:
+            if isinstance(result, RpcError):
+                raise result
+            logs.extend(result)
+        return sorted(logs, key=lambda log: (int(log['blockNumber'], 16), int(log['logIndex'], 16)))
+
+    async def fill_timestamps(self, logs):
+        """Set blockNumber to int and blockTimestamp from the block header"""
+        for log in logs:
+            if isinstance(log['blockNumber'], str):
+                log['blockNumber'] = int(log['blockNumber'], 16)
+
+        missing = sorted({log['blockNumber'] for log in logs} - set(self.timestamps))
+        if missing:
+            blocks = await self.clients[0].batch_request(
+                [("eth_getBlockByNumber", [hex(block_number), False]) for block_number in missing])
+            for block_number, block in zip(missing, blocks):
+                if isinstance(block, RpcError) or block is None:
+                    raise RpcError(f"Get block {block_number} failed: {block}")
+                self.timestamps[block_number] = int(block['timestamp'], 16)
+            while len(self.timestamps) > self.max_timestamps:
+                self.timestamps.popitem(last=False)
+
+        for log in logs:
+            log['blockTimestamp'] = self.timestamps[log['blockNumber']]
+        return logs
+
+    async def scan(self, from_block, to_block):
+        """
+        Fetch one round of chunks, as many as there are endpoints, starting at from_block.
+
+        :return: (logs in block order, last block scanned). The last block is from_block - 1 when nothing
+            could be fetched, to_block once the range is complete.
+        """
+        if from_block > to_block:
+            return [], to_block
+
+        chunks = []
+        start = from_block
+        while start <= to_block and len(chunks) < len(self.clients):
+            end = min(start + self.chunk_size - 1, to_block)
+            chunks.append((start, end))
+            start = end + 1
+
+        results = await asyncio.gather(
+            *(self.get_logs(client, start, end) for client, (start, end) in zip(self.clients, chunks)),
+            return_exceptions=True)
+
+        # Keep the chunks fetched before the first failure so that the scanned range stays contiguous
+        logs = []
+        scanned_to = from_block - 1
+        failure = None
+        for (_, end), result in zip(chunks, results):
+            if isinstance(result, (RpcError, httpx.HTTPError, asyncio.TimeoutError)):
+                failure = result
+                break
+            if isinstance(result, BaseException):
+                raise result
+            logs.extend(result)
+            scanned_to = end
+
+        if failure is None:
+            self.chunk_size = min(self.chunk_size * 2, self.max_chunk_size)
+        elif self.chunk_size > self.min_chunk_size:
+            self.chunk_size = max(self.chunk_size // 2, self.min_chunk_size)
+        elif scanned_to < from_block:
+            raise failure
+
+        return await self.fill_timestamps(logs), scanned_to
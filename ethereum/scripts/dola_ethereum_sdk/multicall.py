@@ -0,0 +1,140 @@
+"""
+Batch contract reads through Multicall3, deployed at the same address on every evm chain we support.
+"""
+import threading
+
+import web3
+from eth_abi import decode_abi, encode_abi
+
+from dola_ethereum_sdk.client import AsyncEthClient
+
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+# function tryBlockAndAggregate(bool requireSuccess, Call[] calldata calls)
+#     returns (uint256 blockNumber, bytes32 blockHash, Result[] memory returnData)
+TRY_BLOCK_AND_AGGREGATE_SELECTOR = web3.Web3.keccak(text="tryBlockAndAggregate(bool,(address,bytes)[])")[:4]
+
+# Keep the calldata and the gas of one eth_call within what public nodes accept
+MAX_CALLS_PER_BATCH = 500
+
+
+class Call:
+    """
+    One read only contract call.
+
+    :param signature: function signature, e.g. "balanceOf(address)"
+    :param output_types: abi types of the return values
+    :param immutable: the result never changes (decimals, immutable variables) and is read only once
+    """
+
+    def __init__(self, target, signature, args=(), output_types=('uint256',), immutable=False):
+        self.target = web3.Web3.toChecksumAddress(target)
+        self.signature = signature
+        self.args = tuple(args)
+        self.output_types = list(output_types)
+        self.immutable = immutable
+
+    @property
+    def input_types(self):
+        types = self.signature[self.signature.index("(") + 1:-1]
+        return types.split(",") if types else []
+
+    @property
+    def data(self):
+        return web3.Web3.keccak(text=self.signature)[:4] + encode_abi(self.input_types, self.args)
+
+    @property
+    def key(self):
+        return self.target, self.data
+
+    def decode(self, return_data):
+        result = decode_abi(self.output_types, return_data)
+        return result[0] if len(result) == 1 else result
+
+
+def erc20_decimals(token):
+    return Call(token, "decimals()", output_types=['uint8'], immutable=True)
+
+
+def erc20_balance(token, owner):
+    return Call(token, "balanceOf(address)", [web3.Web3.toChecksumAddress(owner)])
+
+
+def eth_balance(owner):
+    # function getEthBalance(address addr) public view returns (uint256 balance)
+    return Call(MULTICALL3_ADDRESS, "getEthBalance(address)", [web3.Web3.toChecksumAddress(owner)])
+
+
+class Multicall:
+    """
+    Executes a list of calls in a single eth_call, so every result is read from the same block.
+
+    Results of immutable calls are cached and skipped in later batches. A failed call returns None instead of
+    reverting the whole batch.
+    """
+
+    def __init__(self, w3: web3.Web3, address=MULTICALL3_ADDRESS, max_calls=MAX_CALLS_PER_BATCH):
+        self.w3 = w3
+        self.address = web3.Web3.toChecksumAddress(address)
+        self.max_calls = max_calls
+        self.block_number = None
+        self._immutable = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def encode(calls):
+        return TRY_BLOCK_AND_AGGREGATE_SELECTOR + encode_abi(
+            ['bool', '(address,bytes)[]'], [False, [(call.target, call.data) for call in calls]])
+
+    @staticmethod
+    def decode(result):
+        """:return: (block number, [(success, return data)])"""
+        (block_number, _, return_data) = decode_abi(['uint256', 'bytes32', '(bool,bytes)[]'], bytes(result))
+        return block_number, return_data
+
+    def _pending(self, calls):
+        """Results known from the cache and the indexes of the calls still to be made"""
+        with self._lock:
+            results = [self._immutable.get(call.key) for call in calls]
+        pending = [i for i, call in enumerate(calls) if not (call.immutable and results[i] is not None)]
+        return results, [pending[i:i + self.max_calls] for i in range(0, len(pending), self.max_calls)]
+
+    def _store(self, calls, indexes, return_data, results):
+        for i, (success, data) in zip(indexes, return_data):
+            call = calls[i]
+            try:
+                results[i] = call.decode(data) if success else None
+            except Exception:
+                # An address without code answers successfully with empty data
+                results[i] = None
+            if call.immutable and results[i] is not None:
+                with self._lock:
+                    self._immutable[call.key] = results[i]
+
+    def aggregate(self, calls, block_identifier="latest"):
+        """
+        :return: decoded results in the order of calls, None for the calls that failed
+        """
+        results, batches = self._pending(calls)
+        for indexes in batches:
+            result = self.w3.eth.call({'to': self.address, 'data': self.encode([calls[i] for i in indexes])},
+                                      block_identifier)
+            block_number, return_data = self.decode(result)
+            # Pin the following batches to the block of the first one
+            block_identifier = block_number
+            self.block_number = block_number
+            self._store(calls, indexes, return_data, results)
+        return results
+
+    async def async_aggregate(self, client: AsyncEthClient, calls, block_identifier="latest"):
+        """aggregate through an async client, sharing the cache of immutable results"""
+        results, batches = self._pending(calls)
+        for indexes in batches:
+            data = self.encode([calls[i] for i in indexes])
+            block = hex(block_identifier) if isinstance(block_identifier, int) else block_identifier
+            result = await client.call(self.address, f"0x{data.hex()}", block)
+            block_number, return_data = self.decode(bytes.fromhex(result[2:]))
+            block_identifier = block_number
+            self.block_number = block_number
+            self._store(calls, indexes, return_data, results)
+        return results
@@ -0,0 +1,115 @@
+"""
+Per network web3 clients and contract objects kept warm for the whole process.
+
+Unlike set_ethereum_network, nothing is switched globally: every network has its own client, so threads and
+coroutines can read several chains at once. Only deploy scripts need a connected brownie network.
+"""
+import json
+import threading
+
+import web3
+from web3_multi_provider import FallbackProvider
+
+from dola_ethereum_sdk import DOLA_CONFIG, config
+from dola_ethereum_sdk.client import AsyncEthClient
+from dola_ethereum_sdk.multicall import Multicall
+
+# Contract name -> config key of its address
+CONTRACT_ADDRESS_KEYS = {
+    "IWormhole": "wormhole",
+    "WormholeAdapterPool": "wormhole_adapter_pool",
+    "DolaPool": "dola_pool",
+    "LendingPortal": "lending_portal",
+    "SystemPortal": "system_portal",
+}
+
+
+def load_abi(name):
+    """Abi of a contract or interface from the brownie build artifacts, no project loading"""
+    build_path = DOLA_CONFIG["DOLA_ETHEREUM_PATH"].joinpath("build")
+    for folder in ["contracts", "interfaces"]:
+        artifact = build_path.joinpath(folder, f"{name}.json")
+        if artifact.exists():
+            with open(artifact) as f:
+                return json.load(f)["abi"]
+    raise FileNotFoundError(f"No build artifact of {name} under {build_path}, run brownie compile")
+
+
+class Web3Registry:
+    """Thread safe cache of web3 clients, async clients, multicalls, abis and contracts per network"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._external_endpoints = {}
+        self._web3 = {}
+        self._async_clients = {}
+        self._multicalls = {}
+        self._abis = {}
+        self._contracts = {}
+
+    def endpoints(self, network):
+        return self._external_endpoints.get(network, []) + config["networks"][network]["endpoints"]
+
+    def configure(self, network, external_endpoint=None):
+        """Put extra endpoints in front of the configured ones, before the network is first used"""
+        with self._lock:
+            self._external_endpoints[network] = list(external_endpoint or [])
+            self._web3.pop(network, None)
+            self._multicalls.pop(network, None)
+            self._contracts = {key: value for key, value in self._contracts.items() if key[0] != network}
+
+    def web3(self, network) -> web3.Web3:
+        with self._lock:
+            if network not in self._web3:
+                self._web3[network] = web3.Web3(FallbackProvider(self.endpoints(network)))
+            return self._web3[network]
+
+    def multicall(self, network) -> Multicall:
+        """Shared per network, so immutable results are read once per process"""
+        with self._lock:
+            if network not in self._multicalls:
+                self._multicalls[network] = Multicall(self.web3(network))
+            return self._multicalls[network]
+
+    def async_client(self, network) -> AsyncEthClient:
+        with self._lock:
+            if network not in self._async_clients:
+                self._async_clients[network] = AsyncEthClient(self.endpoints(network))
+            return self._async_clients[network]
+
+    async def close(self):
+        clients = list(self._async_clients.values())
+        self._async_clients.clear()
+        for client in clients:
+            await client.close()
+
+    def abi(self, name):
+        with self._lock:
+            if name not in self._abis:
+                self._abis[name] = load_abi(name)
+            return self._abis[name]
+
+    def address(self, network, name):
+        address = config["networks"][network][CONTRACT_ADDRESS_KEYS[name]]
+        # Upgradable contracts keep every deployment, the latest is in use
+        return address["latest"] if isinstance(address, dict) else address
+
+    def contract(self, network, name, address=None):
+        """
+        :param name: contract name in the build artifacts, e.g. WormholeAdapterPool, DolaPool, ERC20
+        :param address: defaults to the configured deployment of the contract on the network
+        """
+        if address is None:
+            address = self.address(network, name)
+        address = web3.Web3.toChecksumAddress(address)
+        key = (network, name, address)
+        with self._lock:
+            if key not in self._contracts:
+                self._contracts[key] = self.web3(network).eth.contract(address, abi=self.abi(name))
+            return self._contracts[key]
+
+    def erc20(self, network, token):
+        return self.contract(network, "ERC20", token)
+
+
+registry = Web3Registry()
@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+from eth_account import Account
+
+from dola_ethereum_sdk.client import AsyncEthClient, RpcError
+
+# Nodes only accept a replacement paying at least 10% more
+GAS_PRICE_BUMP = 1.125
+
+
+class PendingTx:
+    """A nonce of the sender and every transaction hash sent for it, the latest last"""
+
+    def __init__(self, nonce, tx, tx_hash):
+        self.nonce = nonce
+        self.tx = tx
+        self.tx_hashes = [tx_hash]
+        self.sent_at = time.time()
+
+    @property
+    def tx_hash(self):
+        return self.tx_hashes[-1]
+
+    @property
+    def gas_price(self):
+        return self.tx['gasPrice']
+
+    def to_record(self):
+        return {'nonce': self.nonce, 'tx': self.tx, 'tx_hashes': list(self.tx_hashes), 'sent_at': self.sent_at}
+
+    @classmethod
+    def from_record(cls, record):
+        pending = cls(record['nonce'], record['tx'], record['tx_hashes'][0])
+        pending.tx_hashes = list(record['tx_hashes'])
+        pending.sent_at = record['sent_at']
+        return pending
+
+
+class AsyncTxSender:
+    """
+    Signs and sends the transactions of one account on one chain.
+
+    Nonces are assigned locally so that up to max_in_flight transactions wait for their receipts at the same
+    time. A transaction still pending after replace_after seconds is sent again with the same nonce and a
+    higher gas price.
+    """
+
+    def __init__(self, client: AsyncEthClient, private_key, max_in_flight=4, replace_after=60,
+                 max_replacements=3, receipt_interval=2):
+        self.client = client
+        self.account = Account.from_key(private_key)
+        self.max_in_flight = max_in_flight
+        self.replace_after = replace_after
+        self.max_replacements = max_replacements
+        self.receipt_interval = receipt_interval
+        self.chain_id = None
+        self.nonce = None
+        self._nonce_lock = asyncio.Lock()
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+
+    @property
+    def address(self):
+        return self.account.address
+
+    async def sync_nonce(self):
+        self.nonce = await self.client.get_transaction_count(self.address, "pending")
+
+    async def _sign_and_send(self, tx):
+        signed = self.account.sign_transaction(tx)
+        return await self.client.send_raw_transaction(signed.rawTransaction)
+
+    async def send(self, to, data, gas, gas_price=None, value=0) -> PendingTx:
+        """Send a legacy transaction with the next local nonce"""
+        if gas_price is None:
+            gas_price = await self.client.gas_price()
+        async with self._nonce_lock:
+            if self.chain_id is None:
+                self.chain_id = int(await self.client.request("eth_chainId"), 16)
+            if self.nonce is None:
+                await self.sync_nonce()
+            tx = {'nonce': self.nonce, 'gasPrice': gas_price, 'gas': gas, 'to': to, 'value': value, 'data': data,
+                  'chainId': self.chain_id}
+            try:
+                tx_hash = await self._sign_and_send(tx)
+            except RpcError:
+                # The nonce was not used, read it again in case another process sent with this account
+                await self.sync_nonce()
+                raise
+            self.nonce += 1
+        return PendingTx(tx['nonce'], tx, tx_hash)
+
+    async def replace(self, pending: PendingTx):
+        """
+        Send the same transaction again with a bumped gas price.
+        :return: whether the replacement was sent
+        """
+        gas_price = max(int(pending.gas_price * GAS_PRICE_BUMP), await self.client.gas_price())
+        tx = dict(pending.tx, gasPrice=gas_price)
+        pending.sent_at = time.time()
+        try:
+            tx_hash = await self._sign_and_send(tx)
+        except RpcError:
+            # Most often one of the sent transactions got mined meanwhile, the receipt poll tells
+            return False
+        pending.tx = tx
+        pending.tx_hashes.append(tx_hash)
+        return True
+
+    async def receipt(self, tx_hashes):
+        """:return: the receipt of the first of tx_hashes that was mined, or None"""
+        receipts = await self.client.batch_request(
+            [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in tx_hashes])
+        for receipt in receipts:
+            if receipt and not isinstance(receipt, RpcError):
+                return receipt
+        return None
+
+    async def wait(self, pending: PendingTx, timeout=None, on_sent=None):
+        """
+        Poll the receipts of every hash sent for the nonce.
+        :param on_sent: awaited with pending after every replacement
+        :return: the receipt of the mined transaction
+        """
+        start = time.time()
+        while timeout is None or time.time() - start < timeout:
+            receipt = await self.receipt(pending.tx_hashes)
+            if receipt is not None:
+                return receipt
+
+            if time.time() - pending.sent_at > self.replace_after and \
+                    len(pending.tx_hashes) <= self.max_replacements:
+                if await self.replace(pending) and on_sent is not None:
+                    await on_sent(pending)
+            await asyncio.sleep(self.receipt_interval)
+        raise asyncio.TimeoutError(f"Transaction {pending.tx_hash} not mined in {timeout}s")
+
+    async def is_pending(self, pending: PendingTx):
+        """Whether the nonce of pending is not used by a mined transaction yet"""
+        return await self.client.get_transaction_count(self.address, "latest") <= pending.nonce
+
+    async def resume(self, pending: PendingTx, timeout=None, on_sent=None):
+        """Wait for a transaction sent earlier, holding one in-flight slot"""
+        async with self._in_flight:
+            return await self.wait(pending, timeout, on_sent)
+
+    async def transact(self, to, data, gas, gas_price=None, timeout=None, on_sent=None):
+        """
+        Send and wait for the receipt, holding one in-flight slot.
+        :param on_sent: awaited with the pending tx once it is sent and after every replacement, before waiting
+        :return: (receipt, pending tx)
+        """
+        async with self._in_flight:
+            pending = await self.send(to, data, gas, gas_price)
+            if on_sent is not None:
+                await on_sent(pending)
+            return await self.wait(pending, timeout, on_sent), pending
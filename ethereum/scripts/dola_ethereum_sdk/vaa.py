@@ -0,0 +1,185 @@
+"""
+Wormhole vaa decoding and guardian signature verification without rpc calls.
+
+Layout of a signed vaa:
+    version u8 | guardian_set_index u32 | signature count u8 | signatures (guardian_index u8, r, s, v) * n
+    body: timestamp u32 | nonce u32 | emitter_chain u16 | emitter_address bytes32 | sequence u64
+          | consistency_level u8 | payload
+All integers are big endian. The guardians sign keccak256(keccak256(body)).
+"""
+import asyncio
+import time
+
+from eth_abi import decode_abi
+from eth_keys import keys
+from eth_keys.exceptions import BadSignature
+from eth_utils import keccak
+
+from dola_ethereum_sdk.client import AsyncEthClient
+
+SIGNATURE_LENGTH = 66
+
+# function getGuardianSet(uint32 index) external view returns (Structs.GuardianSet memory)
+GET_GUARDIAN_SET_SELECTOR = keccak(text="getGuardianSet(uint32)")[:4]
+
+# function getCurrentGuardianSetIndex() external view returns (uint32)
+GET_CURRENT_GUARDIAN_SET_INDEX_SELECTOR = keccak(text="getCurrentGuardianSetIndex()")[:4]
+
+# How often the current guardian set index is read again
+GUARDIAN_SET_INDEX_TTL = 60
+
+
+class VaaError(ValueError):
+    """Malformed vaa or invalid guardian signatures"""
+
+
+class GuardianSignature:
+    def __init__(self, guardian_index, r, s, v):
+        self.guardian_index = guardian_index
+        self.r = r
+        self.s = s
+        self.v = v
+
+    def recover_address(self, digest):
+        """:return: 20 bytes address of the guardian key that produced the signature"""
+        try:
+            signature = keys.Signature(vrs=(self.v, self.r, self.s))
+            return signature.recover_public_key_from_msg_hash(digest).to_canonical_address()
+        except (BadSignature, ValueError) as e:
+            raise VaaError(f"Bad signature of guardian {self.guardian_index}: {e}") from e
+
+
+class Vaa:
+    def __init__(self, version, guardian_set_index, signatures, body):
+        self.version = version
+        self.guardian_set_index = guardian_set_index
+        self.signatures = signatures
+        self.body = body
+
+        if len(body) < 51:
+            raise VaaError("Vaa body too short")
+        self.timestamp = int.from_bytes(body[0:4], "big")
+        self.nonce = int.from_bytes(body[4:8], "big")
+        self.emitter_chain = int.from_bytes(body[8:10], "big")
+        self.emitter_address = body[10:42]
+        self.sequence = int.from_bytes(body[42:50], "big")
+        self.consistency_level = body[50]
+        self.payload = body[51:]
+
+    @classmethod
+    def parse(cls, vaa):
+        """:param vaa: hex string or bytes"""
+        if isinstance(vaa, str):
+            vaa = bytes.fromhex(vaa.replace("0x", ""))
+        if len(vaa) < 6:
+            raise VaaError("Vaa header too short")
+        version = vaa[0]
+        if version != 1:
+            raise VaaError(f"Unsupported vaa version {version}")
+        guardian_set_index = int.from_bytes(vaa[1:5], "big")
+        signature_count = vaa[5]
+
+        body_offset = 6 + signature_count * SIGNATURE_LENGTH
+        if len(vaa) < body_offset:
+            raise VaaError("Vaa signatures truncated")
+        signatures = []
+        for offset in range(6, body_offset, SIGNATURE_LENGTH):
+            signatures.append(GuardianSignature(
+                vaa[offset],
+                int.from_bytes(vaa[offset + 1:offset + 33], "big"),
+                int.from_bytes(vaa[offset + 33:offset + 65], "big"),
+                vaa[offset + 65],
+            ))
+        return cls(version, guardian_set_index, signatures, vaa[body_offset:])
+
+    @property
+    def digest(self):
+        return keccak(keccak(self.body))
+
+    @property
+    def emitter(self):
+        return f"0x{self.emitter_address.hex()}"
+
+    def verify(self, guardian_keys):
+        """
+        Check the signatures against the guardian set the vaa names, like wormhole's verifyVM.
+        :param guardian_keys: guardian addresses, 20 bytes each, in guardian set order
+        """
+        quorum = len(guardian_keys) * 2 // 3 + 1
+        if len(self.signatures) < quorum:
+            raise VaaError(f"Vaa has {len(self.signatures)} signatures, quorum is {quorum}")
+
+        digest = self.digest
+        last_index = -1
+        for signature in self.signatures:
+            # Strictly ascending indexes rule out a guardian signing twice
+            if signature.guardian_index <= last_index:
+                raise VaaError("Guardian signatures not in ascending order")
+            last_index = signature.guardian_index
+            if signature.guardian_index >= len(guardian_keys):
+                raise VaaError(f"Guardian index {signature.guardian_index} out of range")
+            if signature.recover_address(digest) != guardian_keys[signature.guardian_index]:
+                raise VaaError(f"Invalid signature of guardian {signature.guardian_index}")
+        return self
+
+
+def verify_signatures(vaa: Vaa, guardian_keys):
+    """Vaa.verify as a module function, for process pools"""
+    return vaa.verify(guardian_keys)
+
+
+class GuardianSetCache:
+    """
+    Guardian sets read from a wormhole core contract through eth_call and kept in memory.
+
+    As in verifyVM, only the current set never expires. The current index is read again every index_ttl
+    seconds, or at once for a vaa naming a newer set, and a replaced set is read again until its expiration
+    time is known. Signatures are checked in executor, the default thread pool when None.
+    """
+
+    def __init__(self, client: AsyncEthClient, wormhole: str, executor=None, index_ttl=GUARDIAN_SET_INDEX_TTL):
+        self.client = client
+        self.wormhole = wormhole
+        self.executor = executor
+        self.index_ttl = index_ttl
+        self.guardian_sets = {}
+        self.current_index = None
+        self.current_index_at = 0
+
+    async def get_current_index(self, refresh=False):
+        if refresh or self.current_index is None or time.time() - self.current_index_at > self.index_ttl:
+            result = await self.client.call(self.wormhole, f"0x{GET_CURRENT_GUARDIAN_SET_INDEX_SELECTOR.hex()}")
+            self.current_index = int(result, 16)
+            self.current_index_at = time.time()
+        return self.current_index
+
+    async def get(self, index, refresh=False):
+        """:return: (guardian addresses, expiration time)"""
+        if index not in self.guardian_sets or refresh:
+            data = GET_GUARDIAN_SET_SELECTOR + index.to_bytes(32, "big")
+            result = await self.client.call(self.wormhole, f"0x{data.hex()}")
+            ((addresses, expiration_time),) = decode_abi(["(address[],uint32)"], bytes.fromhex(result[2:]))
+            if not addresses:
+                raise VaaError(f"Unknown guardian set {index}")
+            self.guardian_sets[index] = ([bytes.fromhex(address[2:]) for address in addresses], expiration_time)
+        return self.guardian_sets[index]
+
+    async def verify(self, vaa):
+        """
+        Decode vaa and verify its guardian signatures.
+        :return: the verified Vaa
+        """
+        vaa = Vaa.parse(vaa)
+        index = vaa.guardian_set_index
+        # A vaa of a newer set means the guardians were rotated since the index was read
+        refresh = self.current_index is not None and index > self.current_index
+        current_index = await self.get_current_index(refresh)
+        guardian_keys, expiration_time = await self.get(index)
+        if index != current_index:
+            # A set cached while it was current has no expiration time yet
+            if expiration_time == 0:
+                guardian_keys, expiration_time = await self.get(index, refresh=True)
+            if expiration_time < time.time():
+                raise VaaError(f"Guardian set {index} expired")
+        return await asyncio.get_running_loop().run_in_executor(self.executor, verify_signatures, vaa,
+                                                                guardian_keys)
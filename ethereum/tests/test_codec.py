@@ -0,0 +1,77 @@
+from brownie import EncodeDecode, accounts
+from pytest import fixture
+
+from scripts.dola_ethereum_sdk import codec
+from scripts.dola_ethereum_sdk.codec import DolaAddress
+
+
+@fixture
+def encode_decode():
+    return EncodeDecode.deploy({'from': accounts[0]})
+
+
+def test_python_codec(encode_decode):
+    pool_address = "0x" + "1".zfill(40)
+    user_address = "0x" + "2".zfill(40)
+    amount = int(1e8)
+    app_payload = b"test"
+    dola_chain_id = 1
+    pool = DolaAddress(dola_chain_id, pool_address)
+    user = DolaAddress(dola_chain_id, user_address)
+
+    # test pool codec
+    payload = codec.PoolDepositPayload(pool, user, amount, codec.SYSTEM_APP_ID, app_payload)
+    assert encode_decode.encodeDepositPayload(
+        [dola_chain_id, pool_address], [dola_chain_id, user_address], amount, 0, app_payload) == payload.to_hex()
+    assert codec.PoolDepositPayload.decode(payload.encode()) == payload
+
+    payload = codec.PoolWithdrawPayload(0, 0, pool, user, amount)
+    assert encode_decode.encodeWithdrawPayload(
+        0, 0, [dola_chain_id, pool_address], [dola_chain_id, user_address], amount) == payload.to_hex()
+    assert codec.PoolWithdrawPayload.decode(payload.encode()) == payload
+
+    payload = codec.PoolSendMessagePayload(user, codec.SYSTEM_APP_ID, app_payload)
+    assert encode_decode.encodeSendMessagePayload(
+        [dola_chain_id, user_address], 0, app_payload) == payload.to_hex()
+    assert codec.PoolSendMessagePayload.decode(payload.encode()) == payload
+
+    payload = codec.ManagePoolPayload(dola_chain_id, 1, codec.POOL_REGISTER_SPENDER)
+    assert codec.decode_pool_payload(payload.encode()) == payload
+
+    # test lending codec
+    payload = codec.LendingDepositPayload(0, 0, user, codec.SUPPLY)
+    assert encode_decode.encodeLendingDepositPayload(
+        0, 0, [dola_chain_id, user_address], codec.SUPPLY) == payload.to_hex()
+    assert codec.decode_lending_payload(payload.encode()) == payload
+
+    payload = codec.LendingWithdrawPayload(dola_chain_id, 0, amount, pool, user, codec.WITHDRAW)
+    assert encode_decode.encodeLendingWithdrawPayload(
+        dola_chain_id, 0, amount, [dola_chain_id, pool_address], [dola_chain_id, user_address],
+        codec.WITHDRAW) == payload.to_hex()
+    assert codec.decode_lending_payload(payload.encode()) == payload
+
+    payload = codec.LendingLiquidatePayloadV2(dola_chain_id, 0, 1, 2, 3)
+    assert encode_decode.encodeLendingLiquidatePayloadV2(dola_chain_id, 0, 1, 2, 3) == payload.to_hex()
+    assert codec.decode_lending_payload(payload.encode()) == payload
+
+    payload = codec.LendingLiquidatePayload(dola_chain_id, 0, pool, 0)
+    assert codec.decode_lending_payload(payload.encode()) == payload
+
+    payload = codec.ManageCollateralPayload([1, 2], codec.AS_COLLATERAL)
+    assert encode_decode.encodeManageCollateralPayload([1, 2], codec.AS_COLLATERAL) == payload.to_hex()
+    assert codec.decode_lending_payload(payload.encode()) == payload
+
+    # test system codec
+    payload = codec.BindPayload(dola_chain_id, 0, user, codec.BINDING)
+    assert encode_decode.encodeBindPayload(
+        dola_chain_id, 0, [dola_chain_id, user_address], codec.BINDING) == payload.to_hex()
+    assert codec.BindPayload.decode(payload.encode()) == payload
+
+    # test a message from a pool to the core
+    lending_payload = codec.LendingWithdrawPayload(dola_chain_id, 7, amount, pool, user, codec.BORROW)
+    message = codec.DolaMessage.decode(
+        codec.PoolSendMessagePayload(user, codec.LENDING_APP_ID, lending_payload.encode()).encode())
+    assert message.app_id == codec.LENDING_APP_ID
+    assert message.call_type == codec.BORROW
+    assert message.app_payload == lending_payload
+    assert message.nonce_key == (dola_chain_id, 7)
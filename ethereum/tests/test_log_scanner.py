@@ -0,0 +1,96 @@
+import asyncio
+import unittest
+
+from dola_ethereum_sdk.client import AsyncEthClient, RpcError
+from dola_ethereum_sdk.log_scanner import LogScanner
+
+WORMHOLE_FILTER = {"address": "0x" + "11" * 20, "topics": []}
+POOL_FILTER = {"address": "0x" + "22" * 20, "topics": []}
+
+
+class FakeClient:
+    """One endpoint. A log per filter at the first block of each range, ranges over max_range fail."""
+
+    def __init__(self, max_range=None, fail=False):
+        self.max_range = max_range
+        self.fail = fail
+        self.ranges = []
+
+    async def batch_request(self, requests):
+        method = requests[0][0]
+        if method == "eth_getBlockByNumber":
+            return [{"timestamp": hex(1000 + int(params[0], 16))} for _, params in requests]
+        results = []
+        for _, (log_filter,) in requests:
+            from_block, to_block = int(log_filter["fromBlock"], 16), int(log_filter["toBlock"], 16)
+            self.ranges.append((from_block, to_block))
+            if self.fail or (self.max_range is not None and to_block - from_block + 1 > self.max_range):
+                results.append(RpcError("query returned more than 10000 results"))
+                continue
+            results.append([{"address": log_filter["address"], "blockNumber": hex(from_block),
+                             "logIndex": "0x1" if log_filter is requests[0][1][0] else "0x0"}])
+        return results
+
+
+class TestLogScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def scanner(self, clients, chunk_size):
+        scanner = LogScanner(AsyncEthClient([f"http://rpc{i}" for i in range(len(clients))]),
+                             [WORMHOLE_FILTER, POOL_FILTER], chunk_size=chunk_size, min_chunk_size=10,
+                             max_chunk_size=400)
+        scanner.clients = clients
+        return scanner
+
+    def test_one_chunk_per_endpoint(self):
+        clients = [FakeClient(), FakeClient(), FakeClient()]
+        scanner = self.scanner(clients, chunk_size=100)
+        logs, scanned_to = self.loop.run_until_complete(scanner.scan(1000, 1249))
+        self.assertEqual(scanned_to, 1249)
+        # Every filter of a chunk in the batch of its endpoint, the last chunk cut at to_block
+        self.assertEqual([client.ranges for client in clients],
+                         [[(1000, 1099)] * 2, [(1100, 1199)] * 2, [(1200, 1249)] * 2])
+        self.assertEqual([(log["blockNumber"], log["address"]) for log in logs], [
+            (1000, POOL_FILTER["address"]), (1000, WORMHOLE_FILTER["address"]),
+            (1100, POOL_FILTER["address"]), (1100, WORMHOLE_FILTER["address"]),
+            (1200, POOL_FILTER["address"]), (1200, WORMHOLE_FILTER["address"])])
+        self.assertEqual({log["blockTimestamp"] for log in logs}, {2000, 2100, 2200})
+        # No error, the chunks grow
+        self.assertEqual(scanner.chunk_size, 200)
+
+    def test_round_stops_at_the_endpoints(self):
+        scanner = self.scanner([FakeClient(), FakeClient()], chunk_size=100)
+        logs, scanned_to = self.loop.run_until_complete(scanner.scan(0, 10000))
+        self.assertEqual(scanned_to, 199)
+        self.assertEqual(self.loop.run_until_complete(scanner.scan(10001, 10000)), ([], 10000))
+
+    def test_failed_chunk_keeps_the_range_contiguous(self):
+        clients = [FakeClient(), FakeClient(fail=True), FakeClient()]
+        scanner = self.scanner(clients, chunk_size=100)
+        logs, scanned_to = self.loop.run_until_complete(scanner.scan(1000, 2000))
+        # The third chunk is fetched but dropped after the failure of the second
+        self.assertEqual(scanned_to, 1099)
+        self.assertEqual({log["blockNumber"] for log in logs}, {1000})
+        self.assertEqual(scanner.chunk_size, 50)
+
+    def test_chunks_shrink_to_the_provider_limit(self):
+        scanner = self.scanner([FakeClient(max_range=30)], chunk_size=100)
+        for chunk_size in [50, 25]:
+            logs, scanned_to = self.loop.run_until_complete(scanner.scan(0, 1000))
+            self.assertEqual((logs, scanned_to), ([], -1))
+            self.assertEqual(scanner.chunk_size, chunk_size)
+        logs, scanned_to = self.loop.run_until_complete(scanner.scan(0, 1000))
+        self.assertEqual(scanned_to, 24)
+        self.assertEqual(scanner.chunk_size, 50)
+
+    def test_failure_at_the_min_chunk_size(self):
+        scanner = self.scanner([FakeClient(fail=True)], chunk_size=10)
+        with self.assertRaises(RpcError):
+            self.loop.run_until_complete(scanner.scan(0, 1000))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from eth_abi import decode_abi, encode_abi
+
+from dola_ethereum_sdk.multicall import (Multicall, MULTICALL3_ADDRESS, TRY_BLOCK_AND_AGGREGATE_SELECTOR,
+                                         erc20_balance, erc20_decimals, eth_balance)
+
+TOKEN = "0x" + "aa" * 20
+NO_CODE = "0x" + "bb" * 20
+OWNER = "0x" + "cc" * 20
+
+
+class FakeChain:
+    """Answers tryBlockAndAggregate: decimals 6, balances 10 ** 9, empty data at NO_CODE, fails everything else"""
+
+    def __init__(self, block_number=1234):
+        self.block_number = block_number
+        self.calls = []
+
+    def answer(self, data, block_identifier):
+        assert data[:4] == TRY_BLOCK_AND_AGGREGATE_SELECTOR
+        require_success, calls = decode_abi(['bool', '(address,bytes)[]'], data[4:])
+        self.calls.append((block_identifier, calls))
+        results = []
+        for target, call_data in calls:
+            if target.lower() == NO_CODE:
+                results.append((True, b""))
+            elif call_data == erc20_decimals(TOKEN).data:
+                results.append((True, encode_abi(['uint8'], [6])))
+            elif call_data in [erc20_balance(TOKEN, OWNER).data, eth_balance(OWNER).data]:
+                results.append((True, encode_abi(['uint256'], [10 ** 9])))
+            else:
+                results.append((False, b""))
+        return encode_abi(['uint256', 'bytes32', '(bool,bytes)[]'], [self.block_number, b"\x01" * 32, results])
+
+    def eth_call(self, transaction, block_identifier):
+        assert transaction['to'] == MULTICALL3_ADDRESS
+        return self.answer(transaction['data'], block_identifier)
+
+
+class FakeAsyncClient:
+
+    def __init__(self, chain):
+        self.chain = chain
+
+    async def call(self, to, data, block):
+        return "0x" + self.chain.answer(bytes.fromhex(data[2:]), block).hex()
+
+
+class TestMulticall(unittest.TestCase):
+
+    def setUp(self):
+        self.chain = FakeChain()
+        self.multicall = Multicall(SimpleNamespace(eth=SimpleNamespace(call=self.chain.eth_call)), max_calls=2)
+
+    def calls(self):
+        return [erc20_decimals(TOKEN), erc20_balance(TOKEN, OWNER), erc20_decimals(NO_CODE),
+                erc20_balance(OWNER, TOKEN), eth_balance(OWNER)]
+
+    def test_decode(self):
+        data = encode_abi(['uint256', 'bytes32', '(bool,bytes)[]'], [7, b"\x00" * 32, [(True, b"\x01"), (False, b"")]])
+        self.assertEqual(Multicall.decode(data), (7, ((True, b"\x01"), (False, b""))))
+
+    def test_aggregate(self):
+        # Failed calls and empty data of an address without code decode to None
+        self.assertEqual(self.multicall.aggregate(self.calls()), [6, 10 ** 9, None, None, 10 ** 9])
+        self.assertEqual(self.multicall.block_number, 1234)
+        # Batches of max_calls, the later ones pinned to the block of the first
+        self.assertEqual([(block, len(calls)) for block, calls in self.chain.calls],
+                         [("latest", 2), (1234, 2), (1234, 1)])
+
+    def test_immutable_results_are_read_once(self):
+        self.multicall.aggregate(self.calls())
+        self.chain.calls.clear()
+        self.assertEqual(self.multicall.aggregate(self.calls()), [6, 10 ** 9, None, None, 10 ** 9])
+        # decimals of TOKEN is cached, the failed decimals of NO_CODE is read again
+        self.assertEqual(sum(len(calls) for _, calls in self.chain.calls), 4)
+
+    def test_async_aggregate(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        results = loop.run_until_complete(self.multicall.async_aggregate(FakeAsyncClient(self.chain), self.calls()))
+        self.assertEqual(results, [6, 10 ** 9, None, None, 10 ** 9])
+        self.assertEqual([block for block, _ in self.chain.calls], ["latest", hex(1234), hex(1234)])
+
+
+if __name__ == "__main__":
+    unittest.main()
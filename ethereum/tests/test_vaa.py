@@ -0,0 +1,182 @@
+import asyncio
+import time
+import unittest
+
+from eth_abi import encode_abi
+
+from dola_ethereum_sdk.vaa import (Vaa, VaaError, GuardianSetCache, GET_GUARDIAN_SET_SELECTOR,
+                                   GET_CURRENT_GUARDIAN_SET_INDEX_SELECTOR, SIGNATURE_LENGTH)
+
+# Mainnet vaa of the polygon pool adapter signed by guardian set 3, as in relayer.test_validate_vaa
+MAINNET_VAA = (
+    "0x01000000030d00e4250bd74bc4145c6a396ae0667819bbaa2ca889b83680c68c258f96e48d89147430ec530a929c1e3184"
+    "f3f96481c953277db7b33256d6581353251bb4aa8a3e0001e7993e81630a7ac1801972ec4f58f732055b3453d80e10061ca5"
+    "adf681628e902d691cbd9631adedb4254f892a87fb55422106f666a4b8925244c50060a26d920002bc7361cf8d697b69b722"
+    "6f6238958ca9b5ad96db28cb38fab9ceb4f6df76b9c0309e97a7d540c6a1d0f790e60347092151b0b779bbad25d7b0d1face"
+    "9f84647f00038c66ab82608a92c859bdf82dda154a469583f4b4f3ada5db666ad8401745306a5953f7c88cadbb133caac0ce"
+    "1fadef67f82d270e3cc5b50c77a60d22a2d5ddc301057662ac6f5df310447a35ef6a4333927a86d2eebb816dfbb5ce282212"
+    "c156efb867e8f8ec02747026bba1d6352cfcf12bf06d009493c89d956834ead4fa6f147c0006acabd409b05fa6e8b29115e0"
+    "1ab656f96c39666d974718a548afd1af95f43a1c1942adc456af7f87dcec8aa9e6cf9417ea44152b113e07028a0f88c6385d"
+    "c806010a7a85703f541e8c56d472cae26eb032fbfdbb03a147f269340c5feb5c525f4960506006dccf5ccf7274e65a50008a"
+    "e73b7c05817344d00c7f624fd3dce0017494010cd318c54e79396eb74b3f3aa0369458de5441988fa1f20814a2d90e50a4df"
+    "dcb300194e3d442f443d5335f67991d4b6bdba5e77a9fe8be5369e950a3ff7b9b7cd000d02cf15b8a8f37388d4b9dc5e8064"
+    "168e0d4e7fd7f3cb772737f8849fa6dc42c23a317747266267157161a1858a1d44f5c2322db96b1f9edf62e2b6dff7e3eef5"
+    "000ece5943716128c953f6e669424eeb246a80ea7567d56c3b68f1584e99eaec37f73c6045c4f01b0c840e3038c2896248e3"
+    "57570f519a50d9e5b13dc4ba4cae81940010729dff4d8a5ff5b6944cf4390ec7e59357c531e3977541c3cead905cc60bd4d5"
+    "70db6f42cbd97c68ca96c9ee8a0310710b97b52d9c62864dce67bc553c0016520011febd4b93f1512ca809160d72e5c681b2"
+    "2c4def184c20c927249bb74913862eb90e94b6e31fbcc8fa5127e6f9c8fa4f264c3fbfd3a70f99495d395f863e99c3760012"
+    "ac6fba04b170b8dbc8e7a33cef85ede1e25771efffc03024c241fc5986f1dad464d5c1a3ffbe3271a8164644bcca301b78a7"
+    "277011dcc99fdd9d59be7e0af6b90064b6cbd90000000000050000000000000000000000004445c48e9b70f78506e886880a"
+    "9e09b501ed1e1300000000000003e9c80001001600050617f40c0bcc0b8bdce45e73b2c19803525d3fbb0200430005000000"
+    "00000004780000000003938700001600052791bca1f2de4661ed88a30c99a7a9449aa84174001600050617f40c0bcc0b8bdc"
+    "e45e73b2c19803525d3fbb02"
+)
+
+# Wormhole mainnet guardian set 3
+GUARDIAN_SET_3 = [
+    "0x58CC3AE5C097b213cE3c81979e1B9f9570746AA5",
+    "0xfF6CB952589BDE862c25Ef4392132fb9D4A42157",
+    "0x114De8460193bdf3A2fCf81f86a09765F4762fD1",
+    "0x107A0086b32d7A0977926A205131d8731D39cbEB",
+    "0x8C82B2fd82FaeD2711d59AF0F2499D16e726f6b2",
+    "0x11b39756C042441BE6D8650b69b54EbE715E2343",
+    "0x54Ce5B4D348fb74B958e8966e2ec3dBd4958a7cd",
+    "0x15e7cAF07C4e3DC8e7C469f92C8Cd88FB8005a20",
+    "0x74a3bf913953D695260D88BC1aA25A4eeE363ef0",
+    "0x000aC0076727b35FBea2dAc28fEE5cCB0fEA768e",
+    "0xAF45Ced136b9D9e24903464AE889F5C8a723FC14",
+    "0xf93124b7c738843CBB89E864c862c38cddCccF95",
+    "0xD2CC37A4dc036a8D232b48f62cDD4731412f4890",
+    "0xDA798F6896A3331F64b48c12D1D57Fd9cbe70811",
+    "0x71AA1BE1D36CaFE3867910F99C09e347899C19C3",
+    "0x8192b6E7387CCd768277c17DAb1b7a5027c0b3Cf",
+    "0x178e21ad2E77AE06711549CFBB1f9c7a9d8096e8",
+    "0x5E1487F35515d02A92753504a8D75471b9f49EdB",
+    "0x6FbEBc898F403E4773E95feB15E80C9A99c8348d",
+]
+
+GUARDIAN_KEYS = [bytes.fromhex(address[2:]) for address in GUARDIAN_SET_3]
+
+
+def signed_vaa(signatures, body):
+    vaa = bytes.fromhex(MAINNET_VAA[2:])
+    header = vaa[:5] + bytes([len(signatures)])
+    return header + b"".join(signatures) + body
+
+
+def split_vaa():
+    vaa = bytes.fromhex(MAINNET_VAA[2:])
+    count = vaa[5]
+    signatures = [vaa[6 + i * SIGNATURE_LENGTH:6 + (i + 1) * SIGNATURE_LENGTH] for i in range(count)]
+    return signatures, vaa[6 + count * SIGNATURE_LENGTH:]
+
+
+class TestVaa(unittest.TestCase):
+
+    def test_parse(self):
+        vaa = Vaa.parse(MAINNET_VAA)
+        self.assertEqual(vaa.version, 1)
+        self.assertEqual(vaa.guardian_set_index, 3)
+        self.assertEqual([signature.guardian_index for signature in vaa.signatures],
+                         [0, 1, 2, 3, 5, 6, 10, 12, 13, 14, 16, 17, 18])
+        self.assertEqual(vaa.timestamp, 1689701337)
+        self.assertEqual(vaa.nonce, 0)
+        self.assertEqual(vaa.emitter_chain, 5)
+        self.assertEqual(vaa.emitter, "0x0000000000000000000000004445c48e9b70f78506e886880a9e09b501ed1e13")
+        self.assertEqual(vaa.sequence, 1001)
+        self.assertEqual(vaa.consistency_level, 200)
+        self.assertEqual(vaa.payload.hex(), MAINNET_VAA[-len(vaa.payload) * 2:])
+        self.assertEqual(Vaa.parse(bytes.fromhex(MAINNET_VAA[2:])).body, vaa.body)
+
+    def test_verify(self):
+        self.assertEqual(Vaa.parse(MAINNET_VAA).verify(GUARDIAN_KEYS).sequence, 1001)
+
+    def test_tampered_body(self):
+        signatures, body = split_vaa()
+        body = body[:-1] + bytes([body[-1] ^ 1])
+        with self.assertRaises(VaaError):
+            Vaa.parse(signed_vaa(signatures, body)).verify(GUARDIAN_KEYS)
+
+    def test_wrong_guardian_set(self):
+        keys = list(GUARDIAN_KEYS)
+        keys[0], keys[1] = keys[1], keys[0]
+        with self.assertRaises(VaaError):
+            Vaa.parse(MAINNET_VAA).verify(keys)
+
+    def test_duplicated_signature(self):
+        signatures, body = split_vaa()
+        with self.assertRaises(VaaError):
+            Vaa.parse(signed_vaa(signatures[:1] + signatures[:-1], body)).verify(GUARDIAN_KEYS)
+
+    def test_below_quorum(self):
+        signatures, body = split_vaa()
+        with self.assertRaises(VaaError):
+            Vaa.parse(signed_vaa(signatures[:-1], body)).verify(GUARDIAN_KEYS)
+
+    def test_malformed(self):
+        with self.assertRaises(VaaError):
+            Vaa.parse(MAINNET_VAA[:100])
+        with self.assertRaises(VaaError):
+            Vaa.parse("0x02" + MAINNET_VAA[4:])
+
+
+class FakeWormhole:
+    """eth_call of getGuardianSet and getCurrentGuardianSetIndex"""
+
+    def __init__(self, current_index, guardian_sets):
+        self.current_index = current_index
+        self.guardian_sets = guardian_sets
+        self.calls = []
+
+    async def call(self, to, data, block="latest"):
+        data = bytes.fromhex(data[2:])
+        self.calls.append(data[:4])
+        if data[:4] == GET_CURRENT_GUARDIAN_SET_INDEX_SELECTOR:
+            return "0x" + self.current_index.to_bytes(32, "big").hex()
+        assert data[:4] == GET_GUARDIAN_SET_SELECTOR
+        addresses, expiration_time = self.guardian_sets.get(int.from_bytes(data[4:], "big"), ([], 0))
+        return "0x" + encode_abi(["(address[],uint32)"], [(addresses, expiration_time)]).hex()
+
+
+class TestGuardianSetCache(unittest.TestCase):
+
+    def test_current_set(self):
+        wormhole = FakeWormhole(3, {3: (GUARDIAN_SET_3, 0)})
+        guardian_sets = GuardianSetCache(wormhole, "0x0")
+        self.assertEqual(asyncio.run(guardian_sets.verify(MAINNET_VAA)).sequence, 1001)
+        asyncio.run(guardian_sets.verify(MAINNET_VAA))
+        # Both reads are cached
+        self.assertEqual(len(wormhole.calls), 2)
+
+    def test_rotated_set_expires(self):
+        wormhole = FakeWormhole(3, {3: (GUARDIAN_SET_3, 0)})
+        guardian_sets = GuardianSetCache(wormhole, "0x0", index_ttl=0)
+        asyncio.run(guardian_sets.verify(MAINNET_VAA))
+
+        # Rotation gives the old set an expiration time, the cached copy still has none
+        wormhole.current_index = 4
+        wormhole.guardian_sets = {3: (GUARDIAN_SET_3, int(time.time()) + 3600), 4: (GUARDIAN_SET_3[::-1], 0)}
+        asyncio.run(guardian_sets.verify(MAINNET_VAA))
+        self.assertNotEqual(guardian_sets.guardian_sets[3][1], 0)
+
+        wormhole.guardian_sets[3] = (GUARDIAN_SET_3, int(time.time()) - 1)
+        guardian_sets.guardian_sets[3] = (GUARDIAN_KEYS, 0)
+        with self.assertRaises(VaaError):
+            asyncio.run(guardian_sets.verify(MAINNET_VAA))
+
+    def test_newer_set_refreshes_current_index(self):
+        wormhole = FakeWormhole(2, {2: (GUARDIAN_SET_3[::-1], 0), 3: (GUARDIAN_SET_3, 0)})
+        guardian_sets = GuardianSetCache(wormhole, "0x0")
+        asyncio.run(guardian_sets.get_current_index())
+        wormhole.current_index = 3
+        asyncio.run(guardian_sets.verify(MAINNET_VAA))
+        self.assertEqual(guardian_sets.current_index, 3)
+
+    def test_unknown_set(self):
+        guardian_sets = GuardianSetCache(FakeWormhole(3, {}), "0x0")
+        with self.assertRaises(VaaError):
+            asyncio.run(guardian_sets.verify(MAINNET_VAA))
+
+
+if __name__ == "__main__":
+    unittest.main()
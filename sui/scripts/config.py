@@ -190,6 +190,14 @@ DOLA_POOL_ID_TO_PRICE_INFO_OBJECT = {
     8: "0x1db46472aa29f5a41dd4dc41867fdcbc1594f761e607293c40bdb66d7cd5278f"
 }
 
+# network -> blocks a relay event must be buried under before the scan checkpoint moves past it
+NETWORK_TO_CONFIRMATIONS = {
+    "polygon-main": 64,
+    "arbitrum-main": 20,
+    "optimism-main": 20,
+    "base-main": 20,
+}
+
 # monitor rpc
 NETWORK_TO_MONITOR_RPC = {
     "polygon-main": os.getenv('POLYGON_MAIN_MONITOR_RPC'),
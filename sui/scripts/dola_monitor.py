@@ -1,4 +1,5 @@
 # dola protocol monitor
+import asyncio
 import functools
 import logging
 import queue
@@ -12,8 +13,11 @@ from sui_brownie.parallelism import ProcessExecutor
 import config
 import dola_ethereum_sdk
 import dola_sui_sdk
-from dola_ethereum_sdk import load as dola_ethereum_load, init as dola_ethereum_init
-from dola_sui_sdk import load as dola_sui_load, sui_project, interfaces
+from dola_ethereum_sdk import load as dola_ethereum_load, init as dola_ethereum_init, multicall
+from dola_ethereum_sdk.log_scanner import LogScanner
+from dola_ethereum_sdk.registry import registry as dola_ethereum_registry
+from dola_sui_sdk import load as dola_sui_load, sui_project, interfaces, lending as dola_sui_lending, \
+    init as dola_sui_init
 
 
 def parse_u256(data: list):
@@ -30,30 +34,30 @@ def convert_dola_decimal(amount: int, decimal: int):
         return amount // 10 ** (decimal - config.DOLA_DECIMAL)
 
 
-def get_otoken_total_supply(dola_pool_id):
+def get_total_supplies(dola_pool_ids):
+    """
+    total_otoken_supply and total_dtoken_supply of every pool, read in one devInspect.
+    :return: {dola_pool_id: (total_supply, total_debt)}
+    """
     dola_protocol = dola_sui_load.dola_protocol_package()
 
-    lending_storage = sui_project.network_config['objects']['LendingStorage']
-
-    result = dola_protocol.lending_logic.total_otoken_supply.inspect(
-        lending_storage,
-        dola_pool_id
-    )
-
-    return parse_u256(result['results'][0]['returnValues'][0][0])
-
-
-def get_dtoken_total_supply(dola_pool_id):
-    dola_protocol = dola_sui_load.dola_protocol_package()
-
-    lending_storage = sui_project.network_config['objects']['LendingStorage']
+    inputs = dola_sui_lending.BatchInputs()
+    lending_storage = inputs.argument("LendingStorage", sui_project.network_config['objects']['LendingStorage'])
+    transactions = []
+    for dola_pool_id in dola_pool_ids:
+        pool_id = inputs.argument(("dola_pool_id", dola_pool_id), dola_pool_id)
+        transactions.append([dola_protocol.lending_logic.total_otoken_supply, [lending_storage, pool_id], []])
+        transactions.append([dola_protocol.lending_logic.total_dtoken_supply, [lending_storage, pool_id], []])
 
-    result = dola_protocol.lending_logic.total_dtoken_supply.inspect(
-        lending_storage,
-        dola_pool_id
-    )
+    result = sui_project.batch_transaction_inspect(actual_params=inputs.actual_params, transactions=transactions)
+    if 'results' not in result:
+        raise ValueError(f"Inspect total supplies fail: {result.get('error', result['effects']['status'])}")
 
-    return parse_u256(result['results'][0]['returnValues'][0][0])
+    return {
+        dola_pool_id: (parse_u256(result['results'][2 * i]['returnValues'][0][0]),
+                       parse_u256(result['results'][2 * i + 1]['returnValues'][0][0]))
+        for i, dola_pool_id in enumerate(dola_pool_ids)
+    }
 
 
 def get_sui_pool_balance(pool_address):
@@ -96,88 +100,269 @@ def get_w3_eth_balance(w3_eth, dola_pool):
     return convert_dola_decimal(balance, decimal)
 
 
+async def async_get_multicall_pool_balances(client, network, dola_pool, tokens, block="latest"):
+    """
+    Raw balances of the dola pool for every token read in one multicall, decimals are only read once.
+    :return: ({token: balance}, {token: decimal}, block number read)
+    """
+    erc20_tokens = [token for token in tokens if token != config.ETH_ZERO_ADDRESS]
+    calls = [multicall.eth_balance(dola_pool)]
+    calls += [multicall.erc20_decimals(token) for token in erc20_tokens]
+    calls += [multicall.erc20_balance(token, dola_pool) for token in erc20_tokens]
+    eth_multicall = dola_ethereum_registry.multicall(network)
+    results = await eth_multicall.async_aggregate(client, calls, block)
+    if None in results:
+        raise ValueError(f"Multicall on {network} failed: {dict(zip([call.signature for call in calls], results))}")
+
+    balances = {config.ETH_ZERO_ADDRESS: results[0]}
+    decimals = {config.ETH_ZERO_ADDRESS: config.ETH_DECIMAL}
+    for i, token in enumerate(erc20_tokens):
+        decimals[token] = results[1 + i]
+        balances[token] = results[1 + len(erc20_tokens) + i]
+    return balances, decimals, eth_multicall.block_number
+
+
+class PoolLiquidity:
+    """
+    Raw token balances of the dola pools on one chain, moved by the deposit and withdraw events and replaced by
+    the periodic reconciliation read. Every change of a pool is put on the queue in dola decimals.
+    """
+
+    def __init__(self, local_logger: logging.Logger, dola_chain_id, network, pool_infos, q):
+        self.local_logger = local_logger
+        self.dola_chain_id = dola_chain_id
+        self.network = network
+        self.token_to_pool_id = {token: dola_pool_id for (dola_pool_id, token) in pool_infos}
+        self.balances = {}
+        self.decimals = {}
+        self.q = q
+
+    def apply(self, token, amount):
+        # Balances are only known after the first reconciliation
+        if token in self.balances:
+            self.balances[token] += amount
+            self.publish(token, amount)
+
+    def reconcile(self, balances, decimals):
+        self.decimals.update(decimals)
+        for token, balance in balances.items():
+            if token not in self.token_to_pool_id:
+                continue
+            old_balance = self.balances.get(token)
+            if old_balance != balance:
+                if old_balance is not None:
+                    self.local_logger.warning(
+                        f"dola pool {token} on chain {self.network} drift from events: {balance - old_balance}")
+                self.balances[token] = balance
+                self.publish(token, balance - (old_balance or 0))
+
+    def publish(self, token, change):
+        dola_pool_id = self.token_to_pool_id[token]
+        pool_balance = sum(
+            convert_dola_decimal(self.balances[pool_token], self.decimals[pool_token])
+            for pool_token in self.balances if self.token_to_pool_id[pool_token] == dola_pool_id
+        )
+        self.local_logger.info(
+            f"dola pool {config.DOLA_POOL_ID_TO_SYMBOL[dola_pool_id]} on chain {self.network} balance: {pool_balance}"
+            f" change: {convert_dola_decimal(change, self.decimals[token])}")
+        self.q.put_nowait((self.dola_chain_id, dola_pool_id, pool_balance))
+
+
 # get dola pool liquidity
 def eth_pool_monitor(local_logger: logging.Logger, dola_chain_id, pool_infos, q):
     dola_ethereum_sdk.set_dola_project_path(Path("../.."))
+    asyncio.run(async_eth_pool_monitor(local_logger, dola_chain_id, pool_infos, q))
+
+
+def sui_pool_monitor(local_logger: logging.Logger, pool_infos, q):
+    dola_sui_sdk.set_dola_project_path(Path("../.."))
+    asyncio.run(async_sui_pool_monitor(local_logger, pool_infos, q))
+
+
+async def async_eth_pool_monitor(local_logger: logging.Logger, dola_chain_id, pool_infos, q: asyncio.Queue,
+                                 interval=3, reconcile_interval=60):
+    """
+    Follow the DepositPool and WithdrawPool logs of the dola pool, and reconcile with a multicall read pinned
+    to the last scanned block, so no log is counted twice or missed.
+    """
     local_logger.info("start monitor dola eth pool...")
 
     network = config.DOLA_CHAIN_ID_TO_NETWORK[dola_chain_id]
-    dola_ethereum_sdk.set_ethereum_network(network)
     if network in config.NETWORK_TO_MONITOR_RPC:
         rpc_url = config.NETWORK_TO_MONITOR_RPC[network]
         external_endpoint = [rpc_url] if rpc_url else []
     else:
         external_endpoint = []
-    w3_client = dola_ethereum_init.multi_endpoints_web3(network, external_endpoint)
+    client = dola_ethereum_init.async_endpoints_client(network, external_endpoint)
+
+    dola_pool = dola_ethereum_registry.address(network, "DolaPool")
+    scanner = LogScanner(client, [dola_ethereum_init.pool_log_filter(dola_pool)])
+    tokens = [token for (_, token) in pool_infos]
+
+    liquidity = PoolLiquidity(local_logger, dola_chain_id, network, pool_infos, q)
+    scanned_block = None
+    last_reconcile = 0
+
+    try:
+        while True:
+            try:
+                if time.time() - last_reconcile >= reconcile_interval:
+                    balances, decimals, scanned_block = await async_get_multicall_pool_balances(
+                        client, network, dola_pool, tokens, "latest" if scanned_block is None else scanned_block)
+                    liquidity.reconcile(balances, decimals)
+                    last_reconcile = time.time()
+
+                head = await client.block_number()
+                logs, scanned_to = await scanner.scan(scanned_block + 1, head)
+                for log in logs:
+                    token, amount = dola_ethereum_init.decode_pool_log(log)
+                    liquidity.apply(token, amount)
+                # A lagging endpoint may report an older head
+                scanned_block = max(scanned_block, scanned_to)
+                if scanned_to < head:
+                    continue
+            except Exception as e:
+                local_logger.error(e)
+
+            await asyncio.sleep(interval)
+    finally:
+        await scanner.close()
+        await client.close()
+
+
+async def async_sui_pool_monitor(local_logger: logging.Logger, pool_infos, q: asyncio.Queue,
+                                 interval=1, reconcile_interval=60):
+    """
+    Follow the DepositPool and WithdrawPool events of the sui pools, and reconcile with one sui_multiGetObjects.
+
+    The previous transaction of a pool object tells whether the read already includes events not applied yet:
+    they are skipped up to that transaction.
+    """
+    local_logger.info("start monitor dola sui pool...")
 
-    dola_pool = dola_ethereum_init.get_dola_pool()
+    pool_objects = {config.SUI_TOKEN_TO_POOL[token]: token for (_, token) in pool_infos}
+    event_filter = dola_sui_init.dola_pool_event_filter()
 
-    pool_info = {}
+    liquidity = PoolLiquidity(local_logger, 0, "sui", pool_infos, q)
+    cursor = await dola_sui_init.async_latest_event_cursor(event_filter)
+    # Digest of the last transaction applied per token
+    applied_digests = {}
+    # token -> [digest included in the read, whether its events were reached]
+    skip_through = {}
+    last_reconcile = 0
 
     while True:
         try:
-            for (dola_pool_id, token) in pool_infos:
-                if token == config.ETH_ZERO_ADDRESS:
-                    balance = get_w3_eth_balance(w3_client.eth, dola_pool)
-                else:
-                    balance = get_w3_erc20_balance(w3_client.eth, dola_pool, token)
-
-                if dola_pool_id not in pool_info:
-                    pool_info[dola_pool_id] = {}
-
-                if token not in pool_info[dola_pool_id]:
-                    pool_info[dola_pool_id][token] = 0
-
-                if pool_info[dola_pool_id][token] != balance:
-                    change = balance - pool_info[dola_pool_id][token]
-                    local_logger.info(
-                        f"dola pool {config.DOLA_POOL_ID_TO_SYMBOL[dola_pool_id]} on chain {network} balance: {balance} change: {change}")
-                    pool_info[dola_pool_id][token] = balance
-                    pool_balance = sum(pool_info[dola_pool_id][token] for token in pool_info[dola_pool_id])
-                    q.put((dola_chain_id, dola_pool_id, pool_balance))
-
+            if time.time() - last_reconcile >= reconcile_interval:
+                objects = await sui_project.async_client.sui_multiGetObjects(
+                    list(pool_objects), {"showContent": True, "showPreviousTransaction": True})
+                balances = {}
+                decimals = {}
+                for obj in objects:
+                    token = pool_objects[obj['data']['objectId']]
+                    fields = obj['data']['content']['fields']
+                    balances[token] = int(fields['balance'])
+                    decimals[token] = int(fields['decimal'])
+                    previous_transaction = obj['data']['previousTransaction']
+                    if token not in applied_digests or token in skip_through and not skip_through[token][1]:
+                        # First read, or the transaction to skip through had no pool event
+                        applied_digests[token] = previous_transaction
+                        skip_through.pop(token, None)
+                    elif previous_transaction != applied_digests[token]:
+                        skip_through[token] = [previous_transaction, False]
+                liquidity.reconcile(balances, decimals)
+                last_reconcile = time.time()
+
+            page = await dola_sui_init.async_query_event_filter(event_filter, cursor)
+            for event in page['data']:
+                if not event['type'].endswith(("::DepositPool", "::WithdrawPool")):
+                    continue
+                token, amount = dola_sui_init.decode_dola_pool_event(event)
+                digest = event['id']['txDigest']
+                if token in skip_through:
+                    if digest == skip_through[token][0]:
+                        skip_through[token][1] = True
+                        applied_digests[token] = digest
+                        continue
+                    if not skip_through[token][1]:
+                        continue
+                    del skip_through[token]
+                applied_digests[token] = digest
+                liquidity.apply(token, amount)
+            if page['data']:
+                cursor = page['nextCursor']
+            if page['hasNextPage']:
+                continue
         except Exception as e:
             local_logger.error(e)
 
-        time.sleep(10)
+        await asyncio.sleep(interval)
 
 
-def sui_pool_monitor(local_logger: logging.Logger, pool_infos, q):
-    dola_sui_sdk.set_dola_project_path(Path("../.."))
-    local_logger.info("start monitor dola sui pool...")
+def check_pool_health(pool_info, total_supply, total_debt):
+    liquidity = sum(pool_info[dola_chain_id] for dola_chain_id in pool_info)
+    return liquidity + total_debt + config.DOLA_RESERVES_COUNT >= total_supply
 
-    pool_info = {}
 
-    while True:
-        try:
-            for (dola_pool_id, token) in pool_infos:
-                pool_address = config.SUI_TOKEN_TO_POOL[token]
-                balance = get_sui_pool_balance(pool_address)
-                if dola_pool_id not in pool_info or pool_info[dola_pool_id] != balance:
-                    change = balance - pool_info[dola_pool_id] if dola_pool_id in pool_info else balance
-                    local_logger.info(
-                        f"dola pool {config.DOLA_POOL_ID_TO_SYMBOL[dola_pool_id]} on chain sui balance: {balance} change: {change}")
-                    pool_info[dola_pool_id] = balance
-                    q.put((0, dola_pool_id, balance))
-        except Exception as e:
-            local_logger.error(e)
+class PoolSolvency:
+    """
+    Liquidity of every pool per chain and the health found by its last check.
+
+    Balance updates are coalesced, and only pools whose liquidity changed, pools found unhealthy and, every
+    full_check_interval seconds, all pools are checked again. Supplies grow with interest even without
+    liquidity changes, hence the full check.
+    """
+
+    def __init__(self, full_check_interval=60):
+        self.pool_infos = {}
+        self.health = {}
+        self.changed = set()
+        self.full_check_interval = full_check_interval
+        self.last_full_check = 0
+
+    def update(self, dola_chain_id, dola_pool_id, balance):
+        pool_info = self.pool_infos.setdefault(dola_pool_id, {})
+        if pool_info.get(dola_chain_id) != balance:
+            pool_info[dola_chain_id] = balance
+            self.changed.add(dola_pool_id)
+
+    def check(self):
+        full_check = time.time() - self.last_full_check >= self.full_check_interval
+        if full_check:
+            dola_pool_ids = set(self.pool_infos)
+        else:
+            dola_pool_ids = self.changed | {dola_pool_id for dola_pool_id in self.health if not self.health[dola_pool_id]}
 
-        time.sleep(5)
+        if dola_pool_ids:
+            dola_pool_ids = sorted(dola_pool_ids)
+            supplies = get_total_supplies(dola_pool_ids)
+            for dola_pool_id in dola_pool_ids:
+                self.health[dola_pool_id] = check_pool_health(self.pool_infos[dola_pool_id], *supplies[dola_pool_id])
+        self.changed.clear()
+        if full_check:
+            self.last_full_check = time.time()
+        return all(self.health.values())
 
+    def unhealthy_pools(self):
+        return [config.DOLA_POOL_ID_TO_SYMBOL[dola_pool_id] for dola_pool_id in self.health
+                if not self.health[dola_pool_id]]
 
-def check_pool_health(dola_pool_id, pool_info):
-    total_supply = get_otoken_total_supply(dola_pool_id)
-    total_debt = get_dtoken_total_supply(dola_pool_id)
 
-    liquidity = sum(pool_info[dola_chain_id] for dola_chain_id in pool_info)
-    return liquidity + total_debt + config.DOLA_RESERVES_COUNT >= total_supply
+# Seconds between checks, an unhealthy protocol is checked more often but still at a bounded rate
+HEALTHY_CHECK_INTERVAL = 10
+UNHEALTHY_CHECK_INTERVAL = 2
 
 
-def check_dola_health(pool_infos):
-    return all(
-        check_pool_health(dola_pool_id, pool_infos[dola_pool_id])
-        for dola_pool_id in pool_infos
-    )
+def drain_balance_queue(q, solvency: PoolSolvency):
+    """Take every queued balance change, the latest balance of a pool on a chain wins"""
+    count = 0
+    try:
+        while True:
+            solvency.update(*q.get_nowait())
+            count += 1
+    except (queue.Empty, asyncio.QueueEmpty):
+        pass
+    return count
 
 
 # check pool liquidity + total_debt > total_supply
@@ -185,30 +370,51 @@ def dola_monitor(local_logger: logging.Logger, q, value, lock):
     dola_sui_sdk.set_dola_project_path(Path("../.."))
     local_logger.info("start monitor dola protocol...")
 
-    pool_infos = {}
+    solvency = PoolSolvency()
     while True:
-        try:
-            (dola_chain_id, dola_pool_id, balance) = q.get_nowait()
-            if dola_pool_id not in pool_infos:
-                pool_infos[dola_pool_id] = {}
-
-            if dola_chain_id not in pool_infos[dola_pool_id] or pool_infos[dola_pool_id][dola_chain_id] != balance:
-                pool_infos[dola_pool_id][dola_chain_id] = balance
-        except queue.Empty:
+        if not drain_balance_queue(q, solvency):
             local_logger.info("No new balance change!")
+
+        try:
+            health = solvency.check()
         except Exception as e:
             local_logger.error(e)
-
-        health = check_dola_health(pool_infos)
+            time.sleep(UNHEALTHY_CHECK_INTERVAL)
+            continue
 
         lock.acquire()
         value.value = health
         lock.release()
         if health:
             local_logger.info(f"dola protocol health: {health}")
-            time.sleep(10)
+            time.sleep(HEALTHY_CHECK_INTERVAL)
+        else:
+            local_logger.warning(f"dola protocol health: {health}, unhealthy pools: {solvency.unhealthy_pools()}")
+            time.sleep(UNHEALTHY_CHECK_INTERVAL)
+
+
+# Event loop variant of dola_monitor, health is any object with a `value` attribute
+async def async_dola_monitor(local_logger: logging.Logger, q: asyncio.Queue, health):
+    local_logger.info("start monitor dola protocol...")
+
+    solvency = PoolSolvency()
+    while True:
+        if not drain_balance_queue(q, solvency):
+            local_logger.info("No new balance change!")
+
+        try:
+            health.value = await asyncio.to_thread(solvency.check)
+        except Exception as e:
+            local_logger.error(e)
+            await asyncio.sleep(UNHEALTHY_CHECK_INTERVAL)
+            continue
+
+        if health.value:
+            local_logger.info(f"dola protocol health: {health.value}")
+            await asyncio.sleep(HEALTHY_CHECK_INTERVAL)
         else:
-            local_logger.warning(f"dola protocol health: {health}")
+            local_logger.warning(f"dola protocol health: {health.value}, unhealthy pools: {solvency.unhealthy_pools()}")
+            await asyncio.sleep(UNHEALTHY_CHECK_INTERVAL)
 
 
 def get_all_pools():
@@ -0,0 +1,326 @@
+"""
+Health factors of every user computed locally, the same way as lending_logic in logic.move.
+
+Values stay u256 ray integers: numpy arrays of python ints (dtype object) give vectorized expressions with
+exact integer arithmetic, so the results agree bit for bit with the chain for the same state.
+"""
+import numpy as np
+
+from dola_sui_sdk import load, sui_project
+from dola_sui_sdk.lending import BatchInputs, parse_u256
+from dola_sui_sdk.lending_state import LendingMirror, MAX_INSPECT_CALLS
+
+RAY = 10 ** 27
+
+HALF_RAY = RAY // 2
+
+U256_MAX = 2 ** 256 - 1
+
+# 20%
+MAX_DISCOUNT = 200000000000000000000000000
+
+# HF 1.25
+TARGET_HEALTH_FACTOR = 1250000000000000000000000000
+
+ALL_ROWS = slice(None)
+
+
+def ray_mul(a, b):
+    """Rounding multiplication, on ints or object arrays"""
+    return (a * b + HALF_RAY) // RAY
+
+
+def ray_div(a, b):
+    """Rounding division, on ints or object arrays"""
+    return (a * RAY + b // 2) // b
+
+
+def object_zeros(shape):
+    return np.zeros(shape, dtype=object)
+
+
+class HealthSnapshot:
+    """
+    Dense tables of the lending state, one row per user and one column per reserve:
+
+    - otoken / dtoken: scaled balances
+    - collateral_mask / loan_mask: the pool is in the collaterals / loans of the user
+    """
+
+    def __init__(self, mirror: LendingMirror, dola_user_ids=None):
+        if dola_user_ids is None:
+            dola_user_ids = sorted(mirror.user_infos)
+        self.dola_pool_ids = sorted(mirror.reserves)
+        self.dola_user_ids = list(dola_user_ids)
+        self.pool_index = {dola_pool_id: i for i, dola_pool_id in enumerate(self.dola_pool_ids)}
+        self.user_index = {dola_user_id: i for i, dola_user_id in enumerate(self.dola_user_ids)}
+
+        shape = (len(self.dola_user_ids), len(self.dola_pool_ids))
+        self.otoken = object_zeros(shape)
+        self.dtoken = object_zeros(shape)
+        self.collateral_mask = np.zeros(shape, dtype=bool)
+        self.loan_mask = np.zeros(shape, dtype=bool)
+
+        pools = len(self.dola_pool_ids)
+        self.liquidity_index = object_zeros(pools)
+        self.borrow_index = object_zeros(pools)
+        self.collateral_coefficient = object_zeros(pools)
+        self.borrow_coefficient = object_zeros(pools)
+        self.is_isolated_asset = np.zeros(pools, dtype=bool)
+        self.treasury_factor = object_zeros(pools)
+        self.price = object_zeros(pools)
+        self.price_scale = np.ones(pools, dtype=object)
+
+        for dola_pool_id in self.dola_pool_ids:
+            self.load_reserve(mirror, dola_pool_id)
+            if dola_pool_id in mirror.prices:
+                self.load_price(mirror, dola_pool_id)
+
+        for i, dola_user_id in enumerate(self.dola_user_ids):
+            self.load_user(mirror, i, dola_user_id)
+
+    def load_user(self, mirror: LendingMirror, i, dola_user_id):
+        """Copy one user from the mirror into row i"""
+        self.collateral_mask[i] = False
+        self.loan_mask[i] = False
+        user_info = mirror.user_infos.get(dola_user_id)
+        if user_info is not None:
+            for dola_pool_id in user_info.collaterals:
+                self.collateral_mask[i, self.pool_index[dola_pool_id]] = True
+            for dola_pool_id in user_info.loans:
+                self.loan_mask[i, self.pool_index[dola_pool_id]] = True
+        for j, dola_pool_id in enumerate(self.dola_pool_ids):
+            self.otoken[i, j] = mirror.otoken_scaled[dola_pool_id].get(dola_user_id, 0)
+            self.dtoken[i, j] = mirror.dtoken_scaled[dola_pool_id].get(dola_user_id, 0)
+
+    def add_users(self, mirror: LendingMirror, dola_user_ids):
+        """Append rows for users not in the snapshot yet"""
+        dola_user_ids = [dola_user_id for dola_user_id in dola_user_ids if dola_user_id not in self.user_index]
+        if not dola_user_ids:
+            return
+        shape = (len(dola_user_ids), len(self.dola_pool_ids))
+        self.otoken = np.concatenate([self.otoken, object_zeros(shape)])
+        self.dtoken = np.concatenate([self.dtoken, object_zeros(shape)])
+        self.collateral_mask = np.concatenate([self.collateral_mask, np.zeros(shape, dtype=bool)])
+        self.loan_mask = np.concatenate([self.loan_mask, np.zeros(shape, dtype=bool)])
+        for dola_user_id in dola_user_ids:
+            self.user_index[dola_user_id] = len(self.dola_user_ids)
+            self.dola_user_ids.append(dola_user_id)
+            self.load_user(mirror, self.user_index[dola_user_id], dola_user_id)
+
+    def load_reserve(self, mirror: LendingMirror, dola_pool_id):
+        """Copy the indexes and coefficients of one reserve from the mirror"""
+        j = self.pool_index[dola_pool_id]
+        reserve = mirror.reserves[dola_pool_id]
+        self.liquidity_index[j] = reserve.current_liquidity_index
+        self.borrow_index[j] = reserve.current_borrow_index
+        self.collateral_coefficient[j] = reserve.collateral_coefficient
+        self.borrow_coefficient[j] = reserve.borrow_coefficient
+        self.is_isolated_asset[j] = reserve.is_isolated_asset
+        self.treasury_factor[j] = reserve.treasury_factor
+
+    def load_price(self, mirror: LendingMirror, dola_pool_id):
+        j = self.pool_index[dola_pool_id]
+        price = mirror.prices[dola_pool_id]
+        self.price[j] = price.value
+        self.price_scale[j] = 10 ** price.decimal
+
+    # === Per user and pool, logic::user_collateral_value / user_loan_value ===
+
+    def calculate_value(self, amounts):
+        """amount * price / 10^decimal of every column"""
+        return amounts * self.price // self.price_scale
+
+    def collateral_value(self, rows=ALL_ROWS):
+        return self.calculate_value(ray_mul(self.otoken[rows], self.liquidity_index))
+
+    def loan_value(self, rows=ALL_ROWS):
+        return self.calculate_value(ray_mul(self.dtoken[rows], self.borrow_index))
+
+    def health_collateral_values(self, rows=ALL_ROWS):
+        """ray_mul(value, collateral_coefficient) of the collaterals, 0 elsewhere"""
+        values = ray_mul(self.collateral_value(rows), self.collateral_coefficient)
+        return np.where(self.collateral_mask[rows], values, 0)
+
+    def health_loan_values(self, rows=ALL_ROWS):
+        """ray_mul(value, borrow_coefficient) of the loans, 0 elsewhere"""
+        values = ray_mul(self.loan_value(rows), self.borrow_coefficient)
+        return np.where(self.loan_mask[rows], values, 0)
+
+    # === Per user ===
+
+    def health_collateral_value(self, rows=ALL_ROWS):
+        return self.health_collateral_values(rows).sum(axis=1)
+
+    def health_loan_value(self, rows=ALL_ROWS):
+        return self.health_loan_values(rows).sum(axis=1)
+
+    def total_collateral_value(self, rows=ALL_ROWS):
+        return np.where(self.collateral_mask[rows], self.collateral_value(rows), 0).sum(axis=1)
+
+    def total_loan_value(self, rows=ALL_ROWS):
+        return np.where(self.loan_mask[rows], self.loan_value(rows), 0).sum(axis=1)
+
+    def health_factors(self, rows=ALL_ROWS):
+        """logic::user_health_factor of every user, U256_MAX without loans"""
+        return health_factor(self.health_collateral_value(rows), self.health_loan_value(rows))
+
+    def is_isolation_mode(self, rows=ALL_ROWS):
+        """A single collateral which is an isolated asset"""
+        collateral_mask = self.collateral_mask[rows]
+        single = collateral_mask.sum(axis=1) == 1
+        return single & (collateral_mask & self.is_isolated_asset).any(axis=1)
+
+    def has_deficit(self, rows=ALL_ROWS):
+        return (self.total_collateral_value(rows) == 0) & (self.total_loan_value(rows) > 0)
+
+    def unhealthy_users(self, rows=ALL_ROWS):
+        """Users with logic::is_health false, the ones that can be liquidated, with their health factor"""
+        dola_user_ids = np.asarray(self.dola_user_ids, dtype=object)[rows]
+        factors = self.health_factors(rows)
+        return [(dola_user_ids[i], factors[i]) for i in np.nonzero(factors <= RAY)[0]]
+
+    def user_health_factor(self, dola_user_id):
+        return self.health_factors([self.user_index[dola_user_id]])[0]
+
+    # === Liquidation, for one violator ===
+
+    def calculate_amount(self, j, value):
+        return value * self.price_scale[j] // self.price[j]
+
+    def liquidation_discount(self, average_liquidity, violator):
+        """logic::calculate_liquidation_discount, average_liquidity is the one of the liquidator"""
+        i = self.user_index[violator]
+        health_collateral_value = self.health_collateral_value([i])[0]
+        health_loan_value = self.health_loan_value([i])[0]
+        base_discount = RAY - ray_div(health_collateral_value, health_loan_value)
+        discount_booster = min(ray_div(average_liquidity, 5 * health_loan_value), RAY) + RAY
+        return min(ray_mul(base_discount, discount_booster), MAX_DISCOUNT)
+
+    def max_liquidation(self, average_liquidity, violator, collateral, loan):
+        """
+        logic::calculate_max_liquidation.
+        :return: (max liquidable collateral, max liquidable debt), None where the chain would abort
+        """
+        i = self.user_index[violator]
+        c, d = self.pool_index[collateral], self.pool_index[loan]
+        liquidation_discount = self.liquidation_discount(average_liquidity, violator)
+        health_collateral_value = self.health_collateral_value([i])[0]
+        health_loan_value = self.health_loan_value([i])[0]
+
+        target_health_value = ray_mul(health_loan_value, TARGET_HEALTH_FACTOR) - health_collateral_value
+        target_coefficient = ray_mul(ray_mul(TARGET_HEALTH_FACTOR, RAY - liquidation_discount),
+                                     self.borrow_coefficient[d]) - self.collateral_coefficient[c]
+        if target_health_value <= 0 or target_coefficient <= 0:
+            return None
+
+        max_liquidable_collateral_value = ray_div(target_health_value, target_coefficient)
+        collateral_ratio = ray_div(self.collateral_value([i])[0, c], max_liquidable_collateral_value)
+        max_liquidable_debt_value = ray_mul(max_liquidable_collateral_value, RAY - liquidation_discount)
+        if max_liquidable_debt_value == 0:
+            return None
+        debt_ratio = ray_div(self.loan_value([i])[0, d], max_liquidable_debt_value)
+
+        ratio = min(collateral_ratio, debt_ratio, RAY)
+        return (self.calculate_amount(c, ray_mul(max_liquidable_collateral_value, ratio)),
+                self.calculate_amount(d, ray_mul(max_liquidable_debt_value, ratio)))
+
+    def actual_liquidation(self, collateral, max_liquidable_collateral, loan, max_liquidable_debt, repay_debt):
+        """
+        logic::calculate_actual_liquidation.
+        :return: (actual collateral, actual debt, liquidator acquired collateral, treasury reserved collateral)
+        """
+        c, d = self.pool_index[collateral], self.pool_index[loan]
+        if repay_debt >= max_liquidable_debt:
+            actual_liquidable_debt = max_liquidable_debt
+            actual_liquidable_collateral = max_liquidable_collateral
+        else:
+            actual_liquidable_debt = repay_debt
+            actual_liquidable_collateral = ray_mul(max_liquidable_collateral,
+                                                   ray_div(actual_liquidable_debt, max_liquidable_debt))
+
+        collateral_value = actual_liquidable_collateral * self.price[c] // self.price_scale[c]
+        loan_value = actual_liquidable_debt * self.price[d] // self.price_scale[d]
+        reward = self.calculate_amount(c, collateral_value - loan_value)
+        treasury_reserved_collateral = ray_mul(reward, self.treasury_factor[c])
+        return (actual_liquidable_collateral, actual_liquidable_debt,
+                actual_liquidable_collateral - treasury_reserved_collateral, treasury_reserved_collateral)
+
+    def liquidation_profit(self, average_liquidity, liquidator, violator, collateral, loan, repay_debt=None):
+        """
+        Value the liquidator gains liquidating loan against collateral: the acquired collateral minus the repaid
+        debt. The repaid debt is taken from the collateral of the liquidator in the loan pool unless given.
+
+        Indexes are the stored ones, while the chain accrues interest first, so this ranks rather than predicts.
+        :return: (profit, actual collateral, actual debt), None when the liquidation would abort
+        """
+        c, d = self.pool_index[collateral], self.pool_index[loan]
+        if repay_debt is None:
+            if liquidator not in self.user_index:
+                return None
+            repay_debt = self.collateral_balance_of(liquidator, loan)
+        if repay_debt == 0 or self.price[c] == 0 or self.price[d] == 0:
+            return None
+        max_liquidation = self.max_liquidation(average_liquidity, violator, collateral, loan)
+        if max_liquidation is None or max_liquidation[1] == 0:
+            return None
+        actual_collateral, actual_debt, acquired_collateral, _ = self.actual_liquidation(
+            collateral, max_liquidation[0], loan, max_liquidation[1], repay_debt)
+        profit = acquired_collateral * self.price[c] // self.price_scale[c] - \
+            actual_debt * self.price[d] // self.price_scale[d]
+        return profit, actual_collateral, actual_debt
+
+    def collateral_balance_of(self, dola_user_id, dola_pool_id):
+        """logic::user_collateral_balance with the stored liquidity index"""
+        j = self.pool_index[dola_pool_id]
+        return ray_mul(self.otoken[self.user_index[dola_user_id], j], self.liquidity_index[j])
+
+
+def health_factor(health_collateral_value, health_loan_value):
+    """ray_div of the two, U256_MAX where there is no loan"""
+    has_loan = health_loan_value > 0
+    factors = ray_div(health_collateral_value, np.where(has_loan, health_loan_value, 1))
+    return np.where(has_loan, factors, U256_MAX)
+
+
+def inspect_health_factors(dola_user_ids):
+    """
+    logic::user_health_factor of users read from the chain with batched devInspects.
+    :return: {dola_user_id: health factor}
+    """
+    dola_protocol = load.dola_protocol_package()
+    objects = sui_project.network_config['objects']
+
+    factors = {}
+    dola_user_ids = list(dola_user_ids)
+    for i in range(0, len(dola_user_ids), MAX_INSPECT_CALLS):
+        batch = dola_user_ids[i:i + MAX_INSPECT_CALLS]
+        inputs = BatchInputs()
+        storage = inputs.argument("LendingStorage", objects['LendingStorage'])
+        oracle = inputs.argument("PriceOracle", objects['PriceOracle'])
+        transactions = [
+            [dola_protocol.lending_logic.user_health_factor,
+             [storage, oracle, inputs.argument(("dola_user_id", dola_user_id), dola_user_id)],
+             []]
+            for dola_user_id in batch
+        ]
+        result = sui_project.batch_transaction_inspect(actual_params=inputs.actual_params, transactions=transactions)
+        if 'results' not in result:
+            raise ValueError(f"Inspect health factors fail: {result.get('error', result['effects']['status'])}")
+        for dola_user_id, call_result in zip(batch, result['results']):
+            factors[dola_user_id] = parse_u256(call_result['returnValues'][0][0])
+    return factors
+
+
+def verify_health_factors(snapshot: HealthSnapshot, dola_user_ids):
+    """
+    Compare local health factors with devInspect for sampled users. Blocking.
+    :return: [(dola_user_id, local, chain)] of the mismatches
+    """
+    chain_factors = inspect_health_factors(dola_user_ids)
+    local_factors = snapshot.health_factors()
+    return [
+        (dola_user_id, local_factors[snapshot.user_index[dola_user_id]], chain_factors[dola_user_id])
+        for dola_user_id in dola_user_ids
+        if local_factors[snapshot.user_index[dola_user_id]] != chain_factors[dola_user_id]
+    ]
@@ -181,6 +181,57 @@ def get_reserve_proposal():
            f"::reserve_proposal::Certificate>"
 
 
+# Max events of one suix_queryEvents page
+SUI_EVENT_PAGE_LIMIT = 50
+
+
+def pool_relay_event_type():
+    # Use the version when the event was added
+    # v 1.0.3
+    dola_protocol = sui_project.network_config['packages']['dola_protocol']['v_1_0_3']
+    return f"{dola_protocol}::wormhole_adapter_pool::RelayEvent"
+
+
+def core_relay_event_type():
+    dola_protocol = sui_project.network_config['packages']['dola_protocol']['origin']
+    return f"{dola_protocol}::lending_core_wormhole_adapter::RelayEvent"
+
+
+async def async_query_events(event_type, cursor=None, limit=SUI_EVENT_PAGE_LIMIT):
+    """
+    One page of events of a move event type in ascending order, after cursor.
+    :return: {"data": events, "nextCursor": EventID, "hasNextPage": bool}
+    """
+    return await async_query_event_filter({"MoveEventType": event_type}, cursor, limit)
+
+
+async def async_query_event_filter(event_filter, cursor=None, limit=SUI_EVENT_PAGE_LIMIT):
+    return await sui_project.async_client.suix_queryEvents(
+        event_filter, limit=limit, cursor=cursor, descending_order=False)
+
+
+async def async_latest_event_cursor(event_filter):
+    """Cursor of the latest event matching event_filter, None if there is none"""
+    result = await sui_project.async_client.suix_queryEvents(
+        event_filter, limit=1, cursor=None, descending_order=True)
+    return result['data'][0]['id'] if result['data'] else None
+
+
+def dola_pool_event_filter():
+    """DepositPool and WithdrawPool events of every dola pool"""
+    dola_protocol = sui_project.network_config['packages']['dola_protocol']['origin']
+    return {"MoveEventModule": {"package": dola_protocol, "module": "dola_pool"}}
+
+
+def decode_dola_pool_event(event):
+    """:return: (coin type with 0x prefix, signed amount) moved in or out of the pool"""
+    fields = event['parsedJson']
+    amount = int(fields['amount'])
+    if event['type'].endswith("::WithdrawPool"):
+        amount = -amount
+    return f"0x{fields['pool']}", amount
+
+
 def query_pool_relay_event(tx_digest, limit=10):
     """
     note: eventSeq may have impact on the result
@@ -218,6 +269,29 @@ def query_core_relay_event(tx_digest, limit=10):
         cursor=cursor, descending_order=False)['data']
 
 
+async def async_query_pool_relay_event(tx_digest, limit=10):
+    dola_protocol = sui_project.network_config['packages']['dola_protocol']['v_1_0_3']
+
+    cursor = None if tx_digest == "" else {"txDigest": tx_digest, "eventSeq": "1"}
+
+    result = await sui_project.async_client.suix_queryEvents(
+        {"MoveEventType": f"{dola_protocol}::wormhole_adapter_pool::RelayEvent"},
+        limit=limit,
+        cursor=cursor, descending_order=False)
+    return result['data']
+
+
+async def async_query_core_relay_event(tx_digest, limit=10):
+    dola_protocol = sui_project.network_config['packages']['dola_protocol']['origin']
+
+    cursor = None if tx_digest == "" else {"txDigest": tx_digest, "eventSeq": "1"}
+
+    result = await sui_project.async_client.suix_queryEvents(
+        {"MoveEventType": f"{dola_protocol}::lending_core_wormhole_adapter::RelayEvent"}, limit=limit,
+        cursor=cursor, descending_order=False)
+    return result['data']
+
+
 @functools.lru_cache()
 def get_wormhole_adapter_core_emitter() -> List[int]:
     core_state = sui_project.network_config['objects']['CoreState']
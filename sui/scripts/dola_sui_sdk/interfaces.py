@@ -5,12 +5,20 @@ import ccxt
 import config
 import dola_monitor
 from dola_sui_sdk import load, sui_project, init
+from dola_sui_sdk.lending import BatchInputs
+from dola_sui_sdk.view_cache import view_cache
 
 
 # btc -> dola_pool_id 0
 # usdt -> dola_pool_id 1
 # sui -> dola_chain_id 0
 
+# Calls of one batched devInspect, below the protocol limit of 1024 commands
+MAX_BATCH_VIEW_CALLS = 500
+
+# interfaces functions that only return values, every other one emits exactly one event
+NO_EVENT_FUNCTIONS = {"all_pool_liquidity", "get_feed_tokens_for_relayer", "get_user_rewrad", "get_reward_pool_apy"}
+
 def parse_u256(data: list):
     output = 0
     for i in range(32):
@@ -25,7 +33,7 @@ def get_dola_token_liquidity(dola_pool_id):
     """
     external_interfaces = load.external_interfaces_package()
     pool_manager = load.pool_manager_package()
-    result = external_interfaces.interfaces.get_dola_token_liquidity.simulate(
+    result = external_interfaces.interfaces.get_dola_token_liquidity.view(
         pool_manager.pool_manager.PoolManagerInfo[-1],
         dola_pool_id
     )
@@ -44,7 +52,7 @@ def get_dola_user_id(user_address, dola_chain_id=0):
 
     user_manager_info = sui_project.network_config['objects']['UserManagerInfo']
 
-    result = external_interfaces.interfaces.get_dola_user_id.inspect(
+    result = external_interfaces.interfaces.get_dola_user_id.view(
         user_manager_info,
         dola_chain_id,
         list(bytes.fromhex(user_address.replace("0x", "")))
@@ -63,7 +71,7 @@ def get_dola_user_addresses(dola_user_id):
     external_interfaces = load.external_interfaces_package()
 
     user_manager_info = sui_project.network_config['objects']['UserManagerInfo']
-    result = external_interfaces.interfaces.get_dola_user_addresses.inspect(
+    result = external_interfaces.interfaces.get_dola_user_addresses.view(
         user_manager_info,
         dola_user_id
     )
@@ -82,7 +90,7 @@ def get_app_token_liquidity(app_id, dola_pool_id):
     """
     external_interfaces = load.external_interfaces_package()
     pool_manager = load.pool_manager_package()
-    result = external_interfaces.interfaces.get_app_token_liquidity.simulate(
+    result = external_interfaces.interfaces.get_app_token_liquidity.view(
         pool_manager.pool_manager.PoolManagerInfo[-1],
         app_id,
         dola_pool_id
@@ -102,7 +110,7 @@ def get_pool_liquidity(dola_chain_id, pool_address):
     '''
     external_interfaces = load.external_interfaces_package()
     pool_manager = load.pool_manager_package()
-    result = external_interfaces.interfaces.get_pool_liquidity.simulate(
+    result = external_interfaces.interfaces.get_pool_liquidity.view(
         pool_manager.pool_manager.PoolManagerInfo[-1],
         dola_chain_id,
         pool_address
@@ -121,7 +129,8 @@ def get_all_pool_liquidity(dola_pool_id):
     """
     external_interfaces = load.external_interfaces_package()
     pool_manager = sui_project.network_config['objects']['PoolManagerInfo']
-    result = external_interfaces.interfaces.get_all_pool_liquidity.simulate(
+    result = view_cache.view(
+        external_interfaces.interfaces.get_all_pool_liquidity,
         pool_manager,
         dola_pool_id,
     )
@@ -140,7 +149,7 @@ def get_all_reserve_info():
     price_oracle = sui_project.network_config['objects']['PriceOracle']
     lending_storage = sui_project.network_config['objects']['LendingStorage']
 
-    result = external_interfaces.interfaces.get_all_reserve_info.inspect(
+    result = external_interfaces.interfaces.get_all_reserve_info.view(
         pool_manager,
         price_oracle,
         lending_storage
@@ -162,7 +171,7 @@ def get_user_health_factor(dola_user_id):
     lending = load.lending_package()
     oracle = load.oracle_package()
 
-    result = external_interfaces.interfaces.get_user_health_factor.simulate(
+    result = external_interfaces.interfaces.get_user_health_factor.view(
         lending.storage.Storage[-1],
         oracle.oracle.PriceOracle[-1],
         dola_user_id
@@ -178,7 +187,7 @@ def get_user_all_debt(dola_user_id):
     external_interfaces = load.external_interfaces_package()
     lending = load.lending_package()
 
-    result = external_interfaces.interfaces.get_user_all_debt.simulate(
+    result = external_interfaces.interfaces.get_user_all_debt.view(
         lending.storage.Storage[-1],
         dola_user_id
     )
@@ -204,7 +213,7 @@ def get_user_token_debt(user, dola_pool_id):
     lending = load.lending_package()
     oracle = load.oracle_package()
 
-    result = external_interfaces.interfaces.get_user_token_debt.simulate(
+    result = external_interfaces.interfaces.get_user_token_debt.view(
         lending.storage.Storage[-1],
         oracle.oracle.PriceOracle[-1],
         user_manager.user_manager.UserManagerInfo[-1],
@@ -223,7 +232,7 @@ def get_user_all_collateral(dola_user_id):
     external_interfaces = load.external_interfaces_package()
     lending = load.lending_package()
 
-    result = external_interfaces.interfaces.get_user_all_debt.simulate(
+    result = external_interfaces.interfaces.get_user_all_debt.view(
         lending.storage.Storage[-1],
         dola_user_id
     )
@@ -245,7 +254,7 @@ def get_user_collateral(user, dola_pool_id):
     external_interfaces = load.external_interfaces_package()
     lending_storage = sui_project.network_config['objects']['LendingStorage']
     price_oracle = sui_project.network_config['objects']['PriceOracle']
-    result = external_interfaces.interfaces.get_user_collateral.inspect(
+    result = external_interfaces.interfaces.get_user_collateral.view(
         lending_storage,
         price_oracle,
         user,
@@ -268,7 +277,7 @@ def get_user_lending_info(user):
 
     lending_storage = sui_project.network_config['objects']['LendingStorage']
     price_oracle = sui_project.network_config['objects']['PriceOracle']
-    result = external_interfaces.interfaces.get_user_lending_info.simulate(
+    result = external_interfaces.interfaces.get_user_lending_info.view(
         lending_storage,
         price_oracle,
         user,
@@ -292,7 +301,8 @@ def get_reserve_info(dola_pool_id):
     pool_manager_info = sui_project.network_config['objects']['PoolManagerInfo']
     lending_storage = sui_project.network_config['objects']['LendingStorage']
 
-    result = external_interfaces.interfaces.get_reserve_info.inspect(
+    result = view_cache.view(
+        external_interfaces.interfaces.get_reserve_info,
         pool_manager_info,
         lending_storage,
         dola_pool_id
@@ -323,7 +333,7 @@ def get_user_allowed_withdraw(dola_chain_id, dola_pool_address, dola_user_id, do
     lending_storage = sui_project.network_config['objects']['LendingStorage']
     price_oracle = sui_project.network_config['objects']['PriceOracle']
 
-    result = external_interfaces.interfaces.get_user_allowed_withdraw.inspect(
+    result = external_interfaces.interfaces.get_user_allowed_withdraw.view(
         pool_manager_info,
         lending_storage,
         price_oracle,
@@ -355,7 +365,7 @@ def get_user_allowed_borrow(dola_chain_id, dola_user_id, dola_pool_id):
     lending_storage = sui_project.network_config['objects']['LendingStorage']
     price_oracle = sui_project.network_config['objects']['PriceOracle']
 
-    result = external_interfaces.interfaces.get_user_allowed_borrow.inspect(
+    result = external_interfaces.interfaces.get_user_allowed_borrow.view(
         pool_manager_info,
         lending_storage,
         price_oracle,
@@ -381,7 +391,7 @@ def get_user_total_allowed_borrow(dola_user_id):
     pool_manager_info = sui_project.network_config['objects']['PoolManagerInfo']
     lending_storage = sui_project.network_config['objects']['LendingStorage']
     price_oracle = sui_project.network_config['objects']['PriceOracle']
-    result = external_interfaces.interfaces.get_user_total_allowed_borrow.inspect(
+    result = external_interfaces.interfaces.get_user_total_allowed_borrow.view(
         pool_manager_info,
         lending_storage,
         price_oracle,
@@ -396,7 +406,7 @@ def get_eq_fee(dola_chain_id, pool_address, withdraw_amount):
 
     pool_manager_info = sui_project.network_config['objects']['PoolManagerInfo']
 
-    result = external_interface.interfaces.get_equilibrium_fee.inspect(
+    result = external_interface.interfaces.get_equilibrium_fee.view(
         pool_manager_info,
         dola_chain_id,
         list(bytes.fromhex(pool_address.replace('0x', ''))),
@@ -412,7 +422,7 @@ def calculate_changed_health_factor(dola_user_id, dola_pool_id, amount):
     lending_storage = sui_project.network_config['objects']['LendingStorage']
     price_oracle = sui_project.network_config['objects']['PriceOracle']
 
-    result = external_interface.interfaces.calculate_changed_health_factor.inspect(
+    result = external_interface.interfaces.calculate_changed_health_factor.view(
         lending_storage,
         price_oracle,
         dola_user_id,
@@ -440,7 +450,7 @@ def reward_claim_inspect(
     lending_storage = sui_project.network_config['objects']['LendingStorage']
     clock = sui_project.network_config['objects']['Clock']
 
-    result = dola_protocol.lending_portal_v2.claim.inspect(
+    result = dola_protocol.lending_portal_v2.claim.view(
         user_manager_info,
         lending_storage,
         dola_pool_id,
@@ -464,7 +474,7 @@ def get_user_total_reward_info(
     price_oracle = sui_project.network_config['objects']['PriceOracle']
     clock = sui_project.network_config['objects']['Clock']
 
-    result = external_interface.interfaces.get_user_total_reward_info.inspect(
+    result = external_interface.interfaces.get_user_total_reward_info.view(
         lending_storage,
         price_oracle,
         dola_user_id,
@@ -520,7 +530,7 @@ def get_reward_pool_apys(
     price_oracle = sui_project.network_config['objects']['PriceOracle']
     clock = sui_project.network_config['objects']['Clock']
 
-    result = external_interface.interfaces.get_reward_pool_apys.inspect(
+    result = external_interface.interfaces.get_reward_pool_apys.view(
         lending_storage,
         price_oracle,
         reward_tokens,
@@ -536,7 +546,7 @@ def get_otoken_total_supply(dola_pool_id):
 
     lending_storage = sui_project.network_config['objects']['LendingStorage']
 
-    result = dola_protocol.lending_logic.total_otoken_supply.inspect(
+    result = dola_protocol.lending_logic.total_otoken_supply.view(
         lending_storage,
         dola_pool_id
     )
@@ -566,6 +576,66 @@ def get_protocol_total_otoken_value():
     return protocol_total_otoken_value
 
 
+def is_object_param(param_type):
+    return isinstance(param_type, dict) and ("Reference" in param_type or "MutableReference" in param_type)
+
+
+def batch_view(calls, max_calls=MAX_BATCH_VIEW_CALLS):
+    """
+    Run external_interfaces::interfaces calls in as few devInspects as the command limit allows.
+    Events carry no command index: every interfaces function outside NO_EVENT_FUNCTIONS emits exactly one event,
+    so the interfaces events of a batch are those of the emitting calls in call order.
+    :param calls: [(function name, [args])]
+    :return: [(event parsedJson or None, return values)] in the order of calls
+    """
+    external_interfaces = load.external_interfaces_package()
+
+    outputs = []
+    for start in range(0, len(calls), max_calls):
+        batch = calls[start:start + max_calls]
+        inputs = BatchInputs()
+        transactions = []
+        for n, (function_name, args) in enumerate(batch):
+            module_function = getattr(external_interfaces.interfaces, function_name)
+            # Objects are shared between the calls, pure values belong to their call
+            arguments = [
+                inputs.argument(arg if is_object_param(param_type) else (n, k), arg)
+                for k, (param_type, arg) in enumerate(zip(module_function.abi['parameters'], args))
+            ]
+            transactions.append([module_function, arguments, []])
+
+        result = sui_project.batch_transaction_view(actual_params=inputs.actual_params, transactions=transactions)
+        if 'results' not in result:
+            raise ValueError(f"Batch view fail: {result.get('error', result['effects']['status'])}")
+        events = [event['parsedJson'] for event in result.get('events', [])
+                  if event['type'].split("::")[1] == "interfaces"]
+        emitting = [function_name not in NO_EVENT_FUNCTIONS for function_name, _ in batch]
+        if len(events) != sum(emitting):
+            raise ValueError(f"Batch view got {len(events)} interfaces events for {sum(emitting)} calls")
+        events = iter(events)
+        outputs.extend((next(events) if emits else None, call_result.get('returnValues', []))
+                       for emits, call_result in zip(emitting, result['results']))
+    return outputs
+
+
+def batch_get_user_lending_info(dola_user_ids):
+    """get_user_lending_info of every user, {dola_user_id: lending info}"""
+    lending_storage = sui_project.network_config['objects']['LendingStorage']
+    price_oracle = sui_project.network_config['objects']['PriceOracle']
+    outputs = batch_view([("get_user_lending_info", [lending_storage, price_oracle, dola_user_id])
+                          for dola_user_id in dola_user_ids])
+    return {dola_user_id: event for dola_user_id, (event, _) in zip(dola_user_ids, outputs)}
+
+
+def batch_get_reserve_info(dola_pool_ids):
+    """get_reserve_info of every pool, {dola_pool_id: reserve info}"""
+    pool_manager_info = sui_project.network_config['objects']['PoolManagerInfo']
+    lending_storage = sui_project.network_config['objects']['LendingStorage']
+    outputs = batch_view([("get_reserve_info", [pool_manager_info, lending_storage, dola_pool_id])
+                          for dola_pool_id in dola_pool_ids])
+    return {dola_pool_id: event for dola_pool_id, (event, _) in zip(dola_pool_ids, outputs)}
+
+
 if __name__ == "__main__":
     # pprint(get_dola_token_liquidity(1))
     # dola_addresses = get_dola_user_addresses(1)
@@ -11,7 +11,7 @@ from dola_sui_sdk.exchange import ExchangeManager
 from dola_sui_sdk.init import clock
 from dola_sui_sdk.init import pool
 from dola_sui_sdk.load import sui_project
-from dola_sui_sdk.oracle import get_feed_vaa
+from dola_sui_sdk.oracle import get_batch_feed_vaa, price_freshness
 
 U64_MAX = 18446744073709551615
 
@@ -27,116 +27,93 @@ def calculate_sui_gas(gas_used):
         gas_used['storageRebate'])
 
 
-def feed_multi_token_price_with_fee(asset_ids, relay_fee=0, fee_rate=0.8):
-    dola_protocol = load.dola_protocol_package()
+def get_feed_vaas(asset_ids):
+    """Fetch the pyth vaas of all asset_ids with one request"""
+    symbols = list(dict.fromkeys(config.DOLA_POOL_ID_TO_SYMBOL[pool_id] for pool_id in asset_ids))
+    symbol_vaas = dict(zip(symbols, get_batch_feed_vaa(symbols)))
+    return [symbol_vaas[config.DOLA_POOL_ID_TO_SYMBOL[pool_id]] for pool_id in asset_ids]
 
-    governance_genesis = sui_project.network_config['objects']['GovernanceGenesis']
-    wormhole_state = sui_project.network_config['objects']['WormholeState']
-    price_oracle = sui_project.network_config['objects']['PriceOracle']
-    pyth_state = sui_project.network_config['objects']['PythState']
-    pyth_fee_amount = 1
 
-    feed_gas = 0
+def build_feed_transactions(inputs, asset_ids, vaas, read_price=False):
+    """
+    Feed calls of asset_ids, appended to a batch built with inputs.
+    With read_price every feed is followed by get_token_price, each feed takes three commands then:
+    split pyth fee, feed_token_price_by_pyth_v2, get_token_price.
+    """
+    dola_protocol = load.dola_protocol_package()
+    objects = sui_project.network_config['objects']
+    pyth_fee_amount = 1
 
-    symbols = [config.DOLA_POOL_ID_TO_SYMBOL[pool_id] for pool_id in asset_ids]
-    price_info_objects = [config.DOLA_POOL_ID_TO_PRICE_INFO_OBJECT[pool_id] for pool_id in asset_ids]
-    vaas = [get_feed_vaa(symbol) for symbol in symbols]
-    for (pool_id, symbol, price_info_object) in zip(asset_ids, symbols, price_info_objects):
-        vaa = get_feed_vaa(symbol)
-        result = sui_project.batch_transaction_inspect(
-            actual_params=[
-                governance_genesis,
-                wormhole_state,
-                pyth_state,
-                price_info_object,
+    transactions = []
+    for pool_id, vaa in zip(asset_ids, vaas):
+        price_oracle = inputs.argument("PriceOracle", objects['PriceOracle'])
+        dola_pool_id = inputs.argument(("dola_pool_id", pool_id), pool_id)
+        transactions.append([
+            dola_protocol.oracle.feed_token_price_by_pyth_v2,
+            [
+                inputs.argument("GovernanceGenesis", objects['GovernanceGenesis']),
+                inputs.argument("WormholeState", objects['WormholeState']),
+                inputs.argument("PythState", objects['PythState']),
+                inputs.argument(("price_info_object", pool_id), config.DOLA_POOL_ID_TO_PRICE_INFO_OBJECT[pool_id]),
                 price_oracle,
-                pool_id,
-                list(bytes.fromhex(vaa.replace("0x", ""))),
-                init.clock(),
-                pyth_fee_amount
+                dola_pool_id,
+                inputs.argument(("pyth_vaa", pool_id), list(bytes.fromhex(vaa.replace("0x", "")))),
+                inputs.argument("clock", init.clock()),
+                # Every split coin needs its own input
+                inputs.argument(("pyth_fee", pool_id), pyth_fee_amount),
             ],
-            transactions=[
-                [
-                    dola_protocol.oracle.feed_token_price_by_pyth_v2,
-                    [
-                        Argument("Input", U16(0)),
-                        Argument("Input", U16(1)),
-                        Argument("Input", U16(2)),
-                        Argument("Input", U16(3)),
-                        Argument("Input", U16(4)),
-                        Argument("Input", U16(5)),
-                        Argument("Input", U16(6)),
-                        Argument("Input", U16(7)),
-                        Argument("Input", U16(8)),
-                    ],
-                    []
-                ],
-                [
-                    dola_protocol.oracle.get_token_price,
-                    [
-                        Argument("Input", U16(4)),
-                        Argument("Input", U16(5)),
-                    ],
-                    []
-                ]
-            ]
-        )
+            []
+        ])
+        if read_price:
+            transactions.append([dola_protocol.oracle.get_token_price, [price_oracle, dola_pool_id], []])
+    return transactions
 
-        decimal = int(result['results'][2]['returnValues'][1][0][0])
 
-        pyth_price = parse_u256(result['results'][2]['returnValues'][0][0]) / (10 ** decimal)
+def check_price_deviation(symbol, pyth_price):
+    if f"{symbol}T" in config.EXCHANGE_SYMBOLS:
+        exchange_price = exchange_manager.fetch_fastest_ticker(f"{symbol}T")['close']
+    else:
+        exchange_price = 1
 
-        if f"{symbol}T" in config.EXCHANGE_SYMBOLS:
-            exchange_price = exchange_manager.fetch_fastest_ticker(f"{symbol}T")['close']
-        else:
-            exchange_price = 1
+    if pyth_price > exchange_price:
+        deviation = 1 - exchange_price / pyth_price
+    else:
+        deviation = 1 - pyth_price / exchange_price
 
-        if pyth_price > exchange_price:
-            deviation = 1 - exchange_price / pyth_price
-        else:
-            deviation = 1 - pyth_price / exchange_price
+    deviation_threshold = config.SYMBOL_TO_DEVIATION[symbol]
+    if deviation > deviation_threshold:
+        print(f"The oracle price difference is too large! {symbol} deviation {deviation}!")
+        # raise ValueError(f"The oracle price difference is too large! {symbol} deviation {deviation}!")
 
-        deviation_threshold = config.SYMBOL_TO_DEVIATION[symbol]
-        if deviation > deviation_threshold:
-            print(f"The oracle price difference is too large! {symbol} deviation {deviation}!")
-            # raise ValueError(f"The oracle price difference is too large! {symbol} deviation {deviation}!")
 
-        gas = calculate_sui_gas(result['effects']['gasUsed'])
-        feed_gas += gas
+def inspect_feed_prices(asset_ids, vaas):
+    """
+    Feed and read back the prices of all asset_ids in one devInspect and check them against the exchanges.
+    :return: feed gas
+    """
+    inputs = BatchInputs()
+    transactions = build_feed_transactions(inputs, asset_ids, vaas, read_price=True)
+    result = sui_project.batch_transaction_inspect(actual_params=inputs.actual_params, transactions=transactions)
+
+    for i, pool_id in enumerate(asset_ids):
+        return_values = result['results'][3 * i + 2]['returnValues']
+        decimal = int(return_values[1][0][0])
+        pyth_price = parse_u256(return_values[0][0]) / (10 ** decimal)
+        check_price_deviation(config.DOLA_POOL_ID_TO_SYMBOL[pool_id], pyth_price)
+
+    return calculate_sui_gas(result['effects']['gasUsed'])
+
+
+def feed_multi_token_price_with_fee(asset_ids, relay_fee=0, fee_rate=0.8):
+    vaas = get_feed_vaas(asset_ids)
+    feed_gas = inspect_feed_prices(asset_ids, vaas)
 
     if relay_fee >= int(fee_rate * feed_gas):
         relay_fee -= int(fee_rate * feed_gas)
-        for (pool_id, vaa, symbol, price_info_object) in zip(asset_ids, vaas, symbols, price_info_objects):
-            sui_project.batch_transaction(
-                actual_params=[
-                    governance_genesis,
-                    wormhole_state,
-                    pyth_state,
-                    price_info_object,
-                    price_oracle,
-                    pool_id,
-                    list(bytes.fromhex(vaa.replace("0x", ""))),
-                    init.clock(),
-                    pyth_fee_amount
-                ],
-                transactions=[
-                    [
-                        dola_protocol.oracle.feed_token_price_by_pyth_v2,
-                        [
-                            Argument("Input", U16(0)),
-                            Argument("Input", U16(1)),
-                            Argument("Input", U16(2)),
-                            Argument("Input", U16(3)),
-                            Argument("Input", U16(4)),
-                            Argument("Input", U16(5)),
-                            Argument("Input", U16(6)),
-                            Argument("Input", U16(7)),
-                            Argument("Input", U16(8)),
-                        ],
-                        []
-                    ]
-                ]
-            )
+        inputs = BatchInputs()
+        transactions = build_feed_transactions(inputs, asset_ids, vaas)
+        result = sui_project.batch_transaction(actual_params=inputs.actual_params, transactions=transactions)
+        price_freshness.record_feed(asset_ids, result)
     return relay_fee, feed_gas
 
 
@@ -463,8 +440,10 @@ def core_withdraw(vaa, relay_fee=0, fee_rate=0.8):
 
     asset_ids = get_feed_tokens_for_relayer(vaa, is_withdraw=True)
     feed_nums = len(asset_ids)
+    # Relay fees are quoted by feed_nums, only the prices nobody fed moments ago are fed again
+    asset_ids = price_freshness.stale(asset_ids)
 
-    if feed_nums > 0:
+    if asset_ids:
         left_relay_fee, feed_gas = feed_multi_token_price_with_fee(asset_ids, relay_fee, fee_rate)
     else:
         left_relay_fee = relay_fee
@@ -617,8 +596,10 @@ def core_borrow(vaa, relay_fee=0, fee_rate=0.8):
 
     asset_ids = get_feed_tokens_for_relayer(vaa, is_withdraw=True)
     feed_nums = len(asset_ids)
+    # Relay fees are quoted by feed_nums, only the prices nobody fed moments ago are fed again
+    asset_ids = price_freshness.stale(asset_ids)
 
-    if feed_nums > 0:
+    if asset_ids:
         left_relay_fee, feed_gas = feed_multi_token_price_with_fee(asset_ids, relay_fee, fee_rate)
     else:
         left_relay_fee = relay_fee
@@ -836,6 +817,38 @@ def portal_liquidate(repay_pool_id, liquidate_user_id, liquidate_pool_id, bridge
     )
 
 
+def portal_liquidate_with_gas(repay_pool_id, liquidate_user_id, liquidate_pool_id, bridge_fee, gas_coin):
+    """
+    portal_liquidate paid by gas_coin, the bridge fee is split from it. Liquidations paid by different coins do
+    not conflict on owned objects and can be sent at the same time.
+    :return: execution result
+    """
+    dola_protocol = load.dola_protocol_package()
+    objects = sui_project.network_config['objects']
+
+    inputs = BatchInputs()
+    return sui_project.batch_transaction(
+        actual_params=inputs.actual_params,
+        transactions=[
+            [
+                dola_protocol.lending_portal_v2.liquidate,
+                [
+                    inputs.argument("GovernanceGenesis", objects['GovernanceGenesis']),
+                    inputs.argument("PoolState", objects['PoolState']),
+                    inputs.argument("WormholeState", objects['WormholeState']),
+                    inputs.argument("repay_pool_id", repay_pool_id),
+                    inputs.argument("liquidate_user_id", liquidate_user_id),
+                    inputs.argument("liquidate_pool_id", liquidate_pool_id),
+                    inputs.argument("bridge_fee", bridge_fee),
+                    inputs.argument("clock", init.clock()),
+                ],
+                []
+            ]
+        ],
+        gas_coins=[gas_coin]
+    )
+
+
 def core_liquidate(vaa, relay_fee=0, fee_rate=0.8):
     """
     public entry fun liquidate(
@@ -864,8 +877,10 @@ def core_liquidate(vaa, relay_fee=0, fee_rate=0.8):
 
     asset_ids = get_feed_tokens_for_relayer(vaa, is_liquidate=True)
     feed_nums = len(asset_ids)
+    # Relay fees are quoted by feed_nums, only the prices nobody fed moments ago are fed again
+    asset_ids = price_freshness.stale(asset_ids)
 
-    if feed_nums > 0:
+    if asset_ids:
         left_relay_fee, feed_gas = feed_multi_token_price_with_fee(asset_ids, relay_fee, fee_rate)
     else:
         left_relay_fee = relay_fee
@@ -1212,8 +1227,10 @@ def core_cancel_as_collateral(vaa, relay_fee=0, fee_rate=0.8):
 
     asset_ids = get_feed_tokens_for_relayer(vaa, is_cancel_collateral=True)
     feed_nums = len(asset_ids)
+    # Relay fees are quoted by feed_nums, only the prices nobody fed moments ago are fed again
+    asset_ids = price_freshness.stale(asset_ids)
 
-    if feed_nums > 0:
+    if asset_ids:
         left_relay_fee, feed_gas = feed_multi_token_price_with_fee(asset_ids, relay_fee, fee_rate)
     else:
         left_relay_fee = relay_fee
@@ -1255,6 +1272,223 @@ def core_cancel_as_collateral(vaa, relay_fee=0, fee_rate=0.8):
         return gas + feed_gas, executed, status, feed_nums, ""
 
 
+# Move entry of each core call and the inputs it takes, in order. "fee" is the wormhole message fee
+# coin split from gas, "vaa" the call's own vaa, the others are shared objects from the network config.
+LENDING_CORE_PARAMS = ["GovernanceGenesis", "PoolManagerInfo", "UserManagerInfo", "WormholeState", "CoreState",
+                       "PriceOracle", "LendingStorage", "vaa", "clock"]
+LENDING_CORE_FEE_PARAMS = ["GovernanceGenesis", "PoolManagerInfo", "UserManagerInfo", "WormholeState", "CoreState",
+                           "PriceOracle", "LendingStorage", "fee", "vaa", "clock"]
+SYSTEM_CORE_PARAMS = ["GovernanceGenesis", "UserManagerInfo", "WormholeState", "CoreState", "SystemStorage", "vaa",
+                      "clock"]
+CORE_BATCH_CALLS = {
+    "supply": ("lending_core_wormhole_adapter", "supply", LENDING_CORE_PARAMS),
+    "withdraw": ("lending_core_wormhole_adapter", "withdraw", LENDING_CORE_FEE_PARAMS),
+    "borrow": ("lending_core_wormhole_adapter", "borrow", LENDING_CORE_FEE_PARAMS),
+    "repay": ("lending_core_wormhole_adapter", "repay", LENDING_CORE_PARAMS),
+    "as_collateral": ("lending_core_wormhole_adapter", "as_collateral", LENDING_CORE_PARAMS),
+    "cancel_as_collateral": ("lending_core_wormhole_adapter", "cancel_as_collateral", LENDING_CORE_PARAMS),
+    "binding": ("system_core_wormhole_adapter", "bind_user_address", SYSTEM_CORE_PARAMS),
+    "unbinding": ("system_core_wormhole_adapter", "unbind_user_address", SYSTEM_CORE_PARAMS),
+}
+
+
+class BatchInputs:
+    """Inputs of one programmable transaction, shared objects are only added once"""
+
+    def __init__(self):
+        self.actual_params = []
+        self.index = {}
+
+    def argument(self, key, value):
+        if key not in self.index:
+            self.index[key] = len(self.actual_params)
+            self.actual_params.append(value)
+        return Argument("Input", U16(self.index[key]))
+
+
+def build_core_batch(calls, feeds=None):
+    """
+    Build one programmable transaction relaying several core vaas.
+    :param calls: [(call_name, vaa)]
+    :param feeds: (asset_ids, pyth vaas) to feed ahead of the calls
+    :return: actual_params, transactions
+    """
+    dola_protocol = load.dola_protocol_package()
+    objects = sui_project.network_config['objects']
+
+    inputs = BatchInputs()
+    transactions = build_feed_transactions(inputs, *feeds) if feeds else []
+    for i, (call_name, vaa) in enumerate(calls):
+        module, function, params = CORE_BATCH_CALLS[call_name]
+        arguments = []
+        for param in params:
+            if param == "vaa":
+                arguments.append(inputs.argument(("vaa", i), list(bytes.fromhex(vaa.replace('0x', '')))))
+            elif param == "fee":
+                # Every split coin needs its own input
+                arguments.append(inputs.argument(("fee", i), 0))
+            elif param == "clock":
+                arguments.append(inputs.argument(param, init.clock()))
+            else:
+                arguments.append(inputs.argument(param, objects[param]))
+        transactions.append([getattr(getattr(dola_protocol, module), function), arguments, []])
+    return inputs.actual_params, transactions
+
+
+def build_pool_withdraw_batch(withdraws, feeds=None):
+    """
+    Build one programmable transaction receiving several pool withdraw vaas.
+    :param withdraws: [(vaa, coin_type)]
+    :param feeds: (asset_ids, pyth vaas) to feed ahead of the withdraws
+    :return: actual_params, transactions
+    """
+    dola_protocol = load.dola_protocol_package()
+    objects = sui_project.network_config['objects']
+
+    inputs = BatchInputs()
+    transactions = build_feed_transactions(inputs, *feeds) if feeds else []
+    for i, (vaa, coin_type) in enumerate(withdraws):
+        transactions.append([
+            dola_protocol.wormhole_adapter_pool.receive_withdraw,
+            [
+                inputs.argument("GovernanceGenesis", objects['GovernanceGenesis']),
+                inputs.argument("WormholeState", objects['WormholeState']),
+                inputs.argument("PoolState", objects['PoolState']),
+                inputs.argument(("pool", coin_type), init.pool_id(coin_type)),
+                inputs.argument(("vaa", i), list(bytes.fromhex(vaa.replace('0x', '')))),
+                inputs.argument("clock", init.clock()),
+            ],
+            [coin_type]
+        ])
+    return inputs.actual_params, transactions
+
+
+def bisect_batch_simulate(build_batch, items, indexes=None, feeds=None):
+    """
+    Dry run items in one transaction, on failure split the batch in halves until
+    every failing item is isolated.
+    :return: [(indexes, dry run result)], groups in the order of items
+    """
+    if indexes is None:
+        indexes = list(range(len(items)))
+    actual_params, transactions = build_batch([items[i] for i in indexes], feeds)
+    result = sui_project.batch_transaction_simulate(actual_params=actual_params, transactions=transactions)
+    if result['effects']['status']['status'] == 'success' or len(indexes) == 1:
+        return [(indexes, result)]
+    middle = len(indexes) // 2
+    return bisect_batch_simulate(build_batch, items, indexes[:middle], feeds) + \
+        bisect_batch_simulate(build_batch, items, indexes[middle:], feeds)
+
+
+def batch_item_gases(build_batch, items, indexes, item_feeds=None, result=None):
+    """
+    Gas of each item of a batch as if it was relayed alone, the way the single call paths record it: the feeds
+    of its own stale prices and the call. Items are dry run one by one.
+    :param item_feeds: feeds of each item, None when no item needs one
+    :param result: dry run of the batch without feeds, reused for a single item
+    :return: [gas] in the order of indexes
+    """
+    gases = []
+    for i in indexes:
+        feeds = item_feeds[i] if item_feeds else None
+        if result is not None and len(indexes) == 1 and not feeds:
+            item_result = result
+        else:
+            actual_params, transactions = build_batch([items[i]], feeds)
+            item_result = sui_project.batch_transaction_simulate(actual_params=actual_params,
+                                                                 transactions=transactions)
+        gases.append(calculate_sui_gas(item_result['effects']['gasUsed']))
+    return gases
+
+
+def execute_batch(build_batch, items, relay_fees, fee_rate=0.8, feeds=None, item_feeds=None):
+    """
+    Execute items in as few transactions as possible. Each item reports the gas of its own call, measured by
+    batch_item_gases before the batch executes, so the gas records used for quoting keep single-call samples.
+    Feeds go into the first transaction that executes.
+    :param relay_fees: relay fee of each item
+    :param item_feeds: the part of feeds each item needs, see batch_item_gases
+    :return: [(gas, executed, status, digest)] in the order of items
+    """
+    results = [None] * len(items)
+    for indexes, result in bisect_batch_simulate(build_batch, items, feeds=feeds):
+        status = result['effects']['status']['status']
+        gas = calculate_sui_gas(result['effects']['gasUsed'])
+        gases = [gas] * len(indexes)
+        executed = False
+        digest = ""
+        if status == 'success' and sum(relay_fees[i] for i in indexes) >= int(fee_rate * gas):
+            # Measured before execution, the vaas can not be dry run again once they are consumed
+            gases = batch_item_gases(build_batch, items, indexes, item_feeds, None if item_feeds else result)
+            actual_params, transactions = build_batch([items[i] for i in indexes], feeds)
+            try:
+                result = sui_project.batch_transaction(actual_params=actual_params, transactions=transactions)
+                executed = True
+                digest = result['effects']['transactionDigest']
+                if feeds:
+                    price_freshness.record_feed(feeds[0], result)
+                feeds = None
+            except AssertionError as e:
+                # State moved between the dry run and the execution
+                status = str(e)
+        elif status == 'failure':
+            status = result['effects']['status']['error']
+        for i, item_gas in zip(indexes, gases):
+            results[i] = (item_gas, executed, status, digest)
+    return results
+
+
+def core_batch(calls, relay_fees, fee_rate=0.8):
+    """
+    Relay several core vaas in one programmable transaction. Prices needed by any of them are
+    checked with one devInspect and fed inside the same transaction. A failing vaa is isolated
+    by bisection and the rest still go through together.
+
+    Liquidations are not batched, their whitelist check needs the events of the single call.
+    :param calls: [(call_name, vaa)]
+    :param relay_fees: relay fee of each call
+    :return: [(gas, executed, status, feed_nums, digest)] in the order of calls
+    """
+    feed_asset_ids = []
+    for call_name, vaa in calls:
+        assert call_name in CORE_BATCH_CALLS, f"{call_name} can not be batched"
+        if call_name in ["withdraw", "borrow"]:
+            feed_asset_ids.append(get_feed_tokens_for_relayer(vaa, is_withdraw=True))
+        elif call_name == "cancel_as_collateral":
+            feed_asset_ids.append(get_feed_tokens_for_relayer(vaa, is_cancel_collateral=True))
+        else:
+            feed_asset_ids.append([])
+
+    # Another executor or oracle_guard may have fed some of the prices moments ago
+    asset_ids = price_freshness.stale(sorted({asset_id for ids in feed_asset_ids for asset_id in ids}))
+    feeds = None
+    item_feeds = None
+    if asset_ids:
+        vaas = get_feed_vaas(asset_ids)
+        inspect_feed_prices(asset_ids, vaas)
+        feeds = (asset_ids, vaas)
+        asset_vaas = dict(zip(asset_ids, vaas))
+        item_feeds = []
+        for ids in feed_asset_ids:
+            ids = [asset_id for asset_id in ids if asset_id in asset_vaas]
+            item_feeds.append((ids, [asset_vaas[asset_id] for asset_id in ids]) if ids else None)
+
+    results = execute_batch(build_core_batch, calls, relay_fees, fee_rate, feeds, item_feeds)
+    return [
+        (gas, executed, status, len(feed_asset_ids[i]), digest)
+        for i, (gas, executed, status, digest) in enumerate(results)
+    ]
+
+
+def pool_withdraw_batch(withdraws):
+    """
+    Receive several pool withdraw vaas in one programmable transaction.
+    :param withdraws: [(vaa, coin_type)]
+    :return: [(gas, executed, status, digest)] in the order of withdraws
+    """
+    return execute_batch(build_pool_withdraw_batch, withdraws, [0] * len(withdraws), 0)
+
+
 def export_objects():
     # Package id
     dola_protocol = load.dola_protocol_package()
@@ -1428,8 +1662,8 @@ def get_unrelay_txs(src_chian_id, call_name, limit=0):
     return response.json()['result']
 
 
-def get_sui_wormhole_payload(tx_hash):
-    events = sui_project.client.sui_getEvents(tx_hash)
+def wormhole_message_payload(events):
+    """:return: payload hex of the WormholeMessage event among events, empty string when there is none"""
     wormhole = sui_project.network_config['packages']['wormhole']
     return next(
         (
@@ -1443,6 +1677,34 @@ def get_sui_wormhole_payload(tx_hash):
     )
 
 
+def get_sui_wormhole_payload(tx_hash):
+    return wormhole_message_payload(sui_project.client.sui_getEvents(tx_hash))
+
+
+async def async_get_sui_wormhole_payload(tx_hash):
+    return wormhole_message_payload(await sui_project.async_client.sui_getEvents(tx_hash))
+
+
+# Max digests of one sui_multiGetTransactionBlocks
+SUI_MULTI_GET_TX_LIMIT = 50
+
+
+async def async_get_sui_wormhole_payloads(tx_hashes):
+    """
+    Wormhole message payloads of several transactions, read with one sui_multiGetTransactionBlocks per
+    SUI_MULTI_GET_TX_LIMIT digests.
+    :return: {tx_hash: payload hex}
+    """
+    tx_hashes = list(dict.fromkeys(tx_hashes))
+    payloads = {}
+    for i in range(0, len(tx_hashes), SUI_MULTI_GET_TX_LIMIT):
+        txs = await sui_project.async_client.sui_multiGetTransactionBlocks(
+            tx_hashes[i:i + SUI_MULTI_GET_TX_LIMIT], {"showEvents": True})
+        for tx in txs:
+            payloads[tx['digest']] = wormhole_message_payload(tx.get('events', []))
+    return payloads
+
+
 if __name__ == "__main__":
     # portal_binding("a65b84b73c857082b680a148b7b25327306d93cc7862bae0edfa7628b0342392")
     # init.claim_test_coin(usdt())
@@ -0,0 +1,416 @@
+"""
+Local mirror of the lending core state: reserves, user infos, scaled balances and oracle prices.
+
+The mirror is bootstrapped from the dynamic fields of LendingStorage and PriceOracle, then follows the
+transactions that take those objects as input. Scaled balances come from the LendingUserStatsEvent of each
+transaction, and the dynamic fields a transaction created, mutated or deleted (reserves, user infos, prices and
+the scaled balance entries of the otoken/dtoken tables) are read again in one sui_multiGetObjects. Balances
+changed without an event, such as the treasury mints of accrual and liquidation or cover_deficit, are picked up
+that way. Every value is absolute, so a transaction seen twice is harmless.
+"""
+import asyncio
+
+from dola_sui_sdk import load, sui_project
+from dola_sui_sdk.lending import BatchInputs, parse_u256
+
+# Max ids of one sui_multiGetObjects
+SUI_MULTI_GET_OBJECTS_LIMIT = 50
+
+SUI_DYNAMIC_FIELDS_PAGE_LIMIT = 50
+
+SUI_QUERY_TX_PAGE_LIMIT = 50
+
+# Move calls of one integrity devInspect, below the protocol command limit
+MAX_INSPECT_CALLS = 500
+
+
+def table_id(table):
+    return table['fields']['id']['id']
+
+
+class Reserve:
+    """ReserveData of a dola pool, scaled balances are kept in the mirror tables"""
+
+    __slots__ = ("dola_pool_id", "is_isolated_asset", "borrowable_in_isolation", "isolate_debt",
+                 "last_update_timestamp", "treasury", "treasury_factor", "supply_cap_ceiling", "borrow_cap_ceiling",
+                 "current_borrow_rate", "current_liquidity_rate", "current_borrow_index", "current_liquidity_index",
+                 "collateral_coefficient", "borrow_coefficient", "base_borrow_rate", "borrow_rate_slope1",
+                 "borrow_rate_slope2", "optimal_utilization", "otoken_scaled_total", "dtoken_scaled_total",
+                 "otoken_table", "dtoken_table")
+
+    def __init__(self, dola_pool_id, fields):
+        self.dola_pool_id = dola_pool_id
+        self.is_isolated_asset = fields['is_isolated_asset']
+        self.borrowable_in_isolation = fields['borrowable_in_isolation']
+        self.treasury = int(fields['treasury'])
+        for name in ["isolate_debt", "last_update_timestamp", "treasury_factor", "supply_cap_ceiling",
+                     "borrow_cap_ceiling", "current_borrow_rate", "current_liquidity_rate", "current_borrow_index",
+                     "current_liquidity_index", "collateral_coefficient", "borrow_coefficient"]:
+            setattr(self, name, int(fields[name]))
+        factors = fields['borrow_rate_factors']['fields']
+        for name in ["base_borrow_rate", "borrow_rate_slope1", "borrow_rate_slope2", "optimal_utilization"]:
+            setattr(self, name, int(factors[name]))
+        otoken_scaled = fields['otoken_scaled']['fields']
+        dtoken_scaled = fields['dtoken_scaled']['fields']
+        self.otoken_scaled_total = int(otoken_scaled['total_supply'])
+        self.dtoken_scaled_total = int(dtoken_scaled['total_supply'])
+        self.otoken_table = table_id(otoken_scaled['user_state'])
+        self.dtoken_table = table_id(dtoken_scaled['user_state'])
+
+
+class UserInfo:
+    __slots__ = ("dola_user_id", "average_liquidity", "last_average_update", "liquid_assets", "collaterals", "loans")
+
+    def __init__(self, dola_user_id, fields):
+        self.dola_user_id = dola_user_id
+        self.average_liquidity = int(fields['average_liquidity'])
+        self.last_average_update = int(fields['last_average_update'])
+        self.liquid_assets = [int(pool_id) for pool_id in fields['liquid_assets']]
+        self.collaterals = [int(pool_id) for pool_id in fields['collaterals']]
+        self.loans = [int(pool_id) for pool_id in fields['loans']]
+
+
+class Price:
+    __slots__ = ("dola_pool_id", "value", "decimal", "last_update_timestamp")
+
+    def __init__(self, dola_pool_id, fields):
+        self.dola_pool_id = dola_pool_id
+        self.value = int(fields['value'])
+        self.decimal = int(fields['decimal'])
+        self.last_update_timestamp = int(fields['last_update_timestamp'])
+
+
+class LendingMirror:
+    """
+    In memory tables of the lending state:
+
+    - reserves: {dola_pool_id: Reserve}
+    - prices: {dola_pool_id: Price}
+    - user_infos: {dola_user_id: UserInfo}
+    - otoken_scaled / dtoken_scaled: {dola_pool_id: {dola_user_id: scaled balance}}
+
+    Listeners are called with (kind, key) after each change, kind is "reserve", "price" or "user". Stats
+    listeners are called with the set of dola_user_ids of the LendingUserStatsEvent of each transaction.
+    """
+
+    def __init__(self, max_concurrency=8):
+        objects = sui_project.network_config['objects']
+        self.storage_id = objects['LendingStorage']
+        self.oracle_id = objects['PriceOracle']
+        self.reserves = {}
+        self.prices = {}
+        self.user_infos = {}
+        self.otoken_scaled = {}
+        self.dtoken_scaled = {}
+        # Dynamic field object id -> (kind, key), to recognize the fields a transaction mutated
+        self.field_keys = {}
+        # otoken/dtoken table id -> (token, dola_pool_id)
+        self.balance_tables = {}
+        # Scaled balance field object id -> (token, dola_pool_id, dola_user_id)
+        self.balance_fields = {}
+        self.cursors = {}
+        self.listeners = []
+        self.stats_listeners = []
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def client(self):
+        return sui_project.async_client
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def subscribe_stats(self, listener):
+        self.stats_listeners.append(listener)
+
+    def notify(self, kind, key):
+        for listener in self.listeners:
+            listener(kind, key)
+
+    def notify_stats(self, dola_user_ids):
+        for listener in self.stats_listeners:
+            listener(dola_user_ids)
+
+    # === Queries ===
+
+    def user_scaled_balances(self, dola_user_id):
+        """:return: {dola_pool_id: (otoken scaled, dtoken scaled)} of the pools the user has a balance in"""
+        balances = {}
+        for dola_pool_id in self.reserves:
+            otoken = self.otoken_scaled[dola_pool_id].get(dola_user_id, 0)
+            dtoken = self.dtoken_scaled[dola_pool_id].get(dola_user_id, 0)
+            if otoken or dtoken:
+                balances[dola_pool_id] = (otoken, dtoken)
+        return balances
+
+    # === Bootstrap ===
+
+    async def multi_get_objects(self, object_ids):
+        async def get(ids):
+            async with self._semaphore:
+                return await self.client.sui_multiGetObjects(ids, {"showContent": True})
+
+        pages = await asyncio.gather(*[
+            get(object_ids[i:i + SUI_MULTI_GET_OBJECTS_LIMIT])
+            for i in range(0, len(object_ids), SUI_MULTI_GET_OBJECTS_LIMIT)
+        ])
+        return [obj['data'] for page in pages for obj in page if 'data' in obj]
+
+    async def dynamic_field_ids(self, parent_id):
+        object_ids = []
+        cursor = None
+        while True:
+            async with self._semaphore:
+                page = await self.client.suix_getDynamicFields(parent_id, cursor, SUI_DYNAMIC_FIELDS_PAGE_LIMIT)
+            object_ids.extend(field['objectId'] for field in page['data'])
+            if not page['hasNextPage']:
+                return object_ids
+            cursor = page['nextCursor']
+
+    async def read_table(self, parent_id):
+        """:return: [(key, value, field object id)] of every entry of a table"""
+        objects = await self.multi_get_objects(await self.dynamic_field_ids(parent_id))
+        return [(int(obj['content']['fields']['name']), obj['content']['fields']['value'], obj['objectId'])
+                for obj in objects]
+
+    async def latest_digest(self, object_id):
+        page = await self.client.suix_queryTransactionBlocks(
+            {"filter": {"InputObject": object_id}}, None, 1, True)
+        return page['data'][0]['digest'] if page['data'] else None
+
+    def scaled_table(self, token):
+        return self.otoken_scaled if token == "otoken" else self.dtoken_scaled
+
+    async def read_scaled_balances(self, reserve: Reserve):
+        otoken_entries, dtoken_entries = await asyncio.gather(
+            self.read_table(reserve.otoken_table), self.read_table(reserve.dtoken_table))
+        for token, entries in [("otoken", otoken_entries), ("dtoken", dtoken_entries)]:
+            self.scaled_table(token)[reserve.dola_pool_id] = {key: int(value) for key, value, _ in entries}
+            for key, _, object_id in entries:
+                self.balance_fields[object_id] = (token, reserve.dola_pool_id, key)
+
+    async def bootstrap(self):
+        """Snapshot every table, transactions from the latest one at the start are applied by sync"""
+        for object_id in [self.storage_id, self.oracle_id]:
+            self.cursors[object_id] = await self.latest_digest(object_id)
+
+        storage, oracle = await self.multi_get_objects([self.storage_id, self.oracle_id])
+        storage_fields = storage['content']['fields']
+        oracle_fields = oracle['content']['fields']
+
+        reserve_entries, user_entries, price_entries = await asyncio.gather(
+            self.read_table(table_id(storage_fields['reserves'])),
+            self.read_table(table_id(storage_fields['user_infos'])),
+            self.read_table(table_id(oracle_fields['price_oracles'])),
+        )
+        for dola_pool_id, value, object_id in reserve_entries:
+            self.set_reserve(dola_pool_id, value['fields'], object_id)
+        for dola_user_id, value, object_id in user_entries:
+            self.set_user_info(dola_user_id, value['fields'], object_id)
+        for dola_pool_id, value, object_id in price_entries:
+            self.set_price(dola_pool_id, value['fields'], object_id)
+
+        await asyncio.gather(*[self.read_scaled_balances(reserve) for reserve in self.reserves.values()])
+
+    # === Updates ===
+
+    def set_reserve(self, dola_pool_id, fields, object_id):
+        reserve = Reserve(dola_pool_id, fields)
+        self.reserves[dola_pool_id] = reserve
+        self.otoken_scaled.setdefault(dola_pool_id, {})
+        self.dtoken_scaled.setdefault(dola_pool_id, {})
+        self.field_keys[object_id] = ("reserve", dola_pool_id)
+        self.balance_tables[reserve.otoken_table] = ("otoken", dola_pool_id)
+        self.balance_tables[reserve.dtoken_table] = ("dtoken", dola_pool_id)
+
+    def set_scaled_balance(self, token, dola_pool_id, dola_user_id, scaled):
+        table = self.scaled_table(token).setdefault(dola_pool_id, {})
+        if scaled:
+            table[dola_user_id] = scaled
+        else:
+            table.pop(dola_user_id, None)
+
+    def set_user_info(self, dola_user_id, fields, object_id):
+        self.user_infos[dola_user_id] = UserInfo(dola_user_id, fields)
+        self.field_keys[object_id] = ("user", dola_user_id)
+
+    def set_price(self, dola_pool_id, fields, object_id):
+        self.prices[dola_pool_id] = Price(dola_pool_id, fields)
+        self.field_keys[object_id] = ("price", dola_pool_id)
+
+    def apply_events(self, events):
+        """:param events: the events of one transaction"""
+        dola_user_ids = set()
+        for event in events:
+            if not event['type'].endswith("::lending_logic::LendingUserStatsEvent"):
+                continue
+            fields = event['parsedJson']
+            dola_pool_id = int(fields['pool_id'])
+            dola_user_id = int(fields['user_id'])
+            self.set_scaled_balance("otoken", dola_pool_id, dola_user_id, int(fields['otoken_scaled_amount']))
+            self.set_scaled_balance("dtoken", dola_pool_id, dola_user_id, int(fields['dtoken_scaled_amount']))
+            self.notify("user", dola_user_id)
+            dola_user_ids.add(dola_user_id)
+        if dola_user_ids:
+            self.notify_stats(dola_user_ids)
+
+    def changed_fields(self, object_changes):
+        """
+        The known dynamic fields a transaction mutated or deleted, and the new reserve, user, price and scaled
+        balance fields.
+        :return: {object id: whether it still exists}, in the order of the changes
+        """
+        changes = {}
+        for change in object_changes:
+            object_id = change.get('objectId')
+            if change['type'] == "deleted":
+                if object_id in self.balance_fields:
+                    changes[object_id] = False
+                continue
+            if change['type'] not in ["mutated", "created"]:
+                continue
+            owner = change.get('owner')
+            parent_id = owner.get('ObjectOwner') if isinstance(owner, dict) else None
+            if parent_id in self.balance_tables:
+                token, dola_pool_id = self.balance_tables[parent_id]
+                self.balance_fields.setdefault(object_id, (token, dola_pool_id, None))
+                changes[object_id] = True
+            elif object_id in self.field_keys or object_id in self.balance_fields or \
+                    change.get('objectType', '').endswith(("::lending_core_storage::ReserveData>",
+                                                           "::lending_core_storage::UserInfo>", "::oracle::Price>")):
+                changes[object_id] = True
+        return changes
+
+    def delete_balance_field(self, object_id):
+        token, dola_pool_id, dola_user_id = self.balance_fields.pop(object_id)
+        if dola_user_id is not None:
+            self.set_scaled_balance(token, dola_pool_id, dola_user_id, 0)
+            self.notify("user", dola_user_id)
+
+    async def refresh_fields(self, changes):
+        """:param changes: see changed_fields"""
+        for object_id, exists in changes.items():
+            if not exists:
+                self.delete_balance_field(object_id)
+        object_ids = [object_id for object_id, exists in changes.items() if exists]
+        objects = await self.multi_get_objects(object_ids)
+        # Deleted by a transaction after the ones applied
+        for object_id in set(object_ids) - {obj['objectId'] for obj in objects}:
+            if object_id in self.balance_fields:
+                self.delete_balance_field(object_id)
+
+        for obj in objects:
+            content = obj['content']
+            key = int(content['fields']['name'])
+            value = content['fields']['value']
+            if obj['objectId'] in self.balance_fields:
+                token, dola_pool_id, _ = self.balance_fields[obj['objectId']]
+                self.balance_fields[obj['objectId']] = (token, dola_pool_id, key)
+                self.set_scaled_balance(token, dola_pool_id, key, int(value))
+                self.notify("user", key)
+                continue
+            value = value['fields']
+            if content['type'].endswith("::lending_core_storage::ReserveData>"):
+                is_new = key not in self.reserves
+                self.set_reserve(key, value, obj['objectId'])
+                if is_new:
+                    await self.read_scaled_balances(self.reserves[key])
+                self.notify("reserve", key)
+            elif content['type'].endswith("::lending_core_storage::UserInfo>"):
+                self.set_user_info(key, value, obj['objectId'])
+                self.notify("user", key)
+            elif content['type'].endswith("::oracle::Price>"):
+                self.set_price(key, value, obj['objectId'])
+                self.notify("price", key)
+
+    async def sync(self):
+        """
+        Apply the transactions on LendingStorage and PriceOracle since the last sync. The cursors only move once
+        the changed fields are read, so a sync that fails is replayed whole by the next one.
+        :return: number of transactions applied
+        """
+        cursors = dict(self.cursors)
+        changed = {}
+        count = 0
+        for parent_id in [self.storage_id, self.oracle_id]:
+            while True:
+                page = await self.client.suix_queryTransactionBlocks(
+                    {"filter": {"InputObject": parent_id},
+                     "options": {"showEvents": True, "showObjectChanges": True}},
+                    cursors.get(parent_id), SUI_QUERY_TX_PAGE_LIMIT, False)
+                for tx in page['data']:
+                    self.apply_events(tx.get('events', []))
+                    for object_id, exists in self.changed_fields(tx.get('objectChanges', [])).items():
+                        # The latest change of a field wins
+                        changed.pop(object_id, None)
+                        changed[object_id] = exists
+                count += len(page['data'])
+                if page['data']:
+                    cursors[parent_id] = page['nextCursor']
+                if not page['hasNextPage']:
+                    break
+        if changed:
+            await self.refresh_fields(changed)
+        self.cursors = cursors
+        return count
+
+    async def run(self, interval=1):
+        await self.bootstrap()
+        while True:
+            if not await self.sync():
+                await asyncio.sleep(interval)
+
+    # === Integrity checks ===
+
+    def check_totals(self):
+        """
+        The scaled balances of all users add up to the total scaled supply of each reserve.
+        Only meaningful right after a sync, when reserves and balances come from the same transactions.
+        :return: [(dola_pool_id, token, sum of user balances, reserve total)] of the mismatches
+        """
+        mismatches = []
+        for dola_pool_id, reserve in self.reserves.items():
+            for token, table, total in [("otoken", self.otoken_scaled, reserve.otoken_scaled_total),
+                                        ("dtoken", self.dtoken_scaled, reserve.dtoken_scaled_total)]:
+                local_total = sum(table[dola_pool_id].values())
+                if local_total != total:
+                    mismatches.append((dola_pool_id, token, local_total, total))
+        return mismatches
+
+    def verify_users(self, dola_user_ids):
+        """
+        Compare the scaled balances of users with get_user_scaled_otoken/dtoken on chain, in as few devInspects
+        as the command limit allows. Blocking, run it in a thread from the event loop.
+        :return: [(dola_user_id, dola_pool_id, token, local, chain)] of the mismatches
+        """
+        dola_protocol = load.dola_protocol_package()
+        checks = [(dola_user_id, dola_pool_id, token)
+                  for dola_user_id in dola_user_ids
+                  for dola_pool_id in sorted(self.reserves)
+                  for token in ["otoken", "dtoken"]]
+
+        mismatches = []
+        for i in range(0, len(checks), MAX_INSPECT_CALLS):
+            batch = checks[i:i + MAX_INSPECT_CALLS]
+            inputs = BatchInputs()
+            storage = inputs.argument("LendingStorage", self.storage_id)
+            transactions = [
+                [getattr(dola_protocol.lending_core_storage, f"get_user_scaled_{token}"),
+                 [storage,
+                  inputs.argument(("dola_user_id", dola_user_id), dola_user_id),
+                  inputs.argument(("dola_pool_id", dola_pool_id), dola_pool_id)],
+                 []]
+                for dola_user_id, dola_pool_id, token in batch
+            ]
+            result = sui_project.batch_transaction_inspect(
+                actual_params=inputs.actual_params, transactions=transactions)
+            if 'results' not in result:
+                raise ValueError(f"Inspect scaled balances fail: {result.get('error', result['effects']['status'])}")
+
+            for (dola_user_id, dola_pool_id, token), call_result in zip(batch, result['results']):
+                chain = parse_u256(call_result['returnValues'][0][0])
+                table = self.otoken_scaled if token == "otoken" else self.dtoken_scaled
+                local = table[dola_pool_id].get(dola_user_id, 0)
+                if local != chain:
+                    mismatches.append((dola_user_id, dola_pool_id, token, local, chain))
+        return mismatches
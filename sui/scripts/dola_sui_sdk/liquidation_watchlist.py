@@ -0,0 +1,184 @@
+"""
+Index of users by the oracle prices at which their health factor drops to 1.
+
+With every other price fixed, the health collateral and loan values of a user are linear in the price of one
+pool, so the health factor crosses 1 at a single price: below it when the user is net long the asset (more
+weighted collateral than weighted debt in it), above it when net short. Only the users whose trigger price was
+crossed by a price update are scored again.
+
+Triggers are widened by TRIGGER_MARGIN_BPS to absorb rounding, interest accrual and the moves of the other
+prices since the user was indexed, and the whole index is rebuilt every rebuild_interval seconds.
+
+Unhealthy users have no trigger: they are kept apart, scored again and reported on every update until they are
+healthy again.
+"""
+import bisect
+import time
+
+import numpy as np
+
+from dola_sui_sdk.health_engine import HealthSnapshot, health_factor, RAY
+from dola_sui_sdk.lending_state import LendingMirror
+
+# 0.5%
+TRIGGER_MARGIN_BPS = 50
+
+
+class PriceTriggers:
+    """Users sorted by trigger price, for one pool and one direction"""
+
+    def __init__(self):
+        self.entries = []
+
+    def add(self, price, dola_user_id):
+        bisect.insort(self.entries, (price, dola_user_id))
+
+    def remove(self, price, dola_user_id):
+        i = bisect.bisect_left(self.entries, (price, dola_user_id))
+        if i < len(self.entries) and self.entries[i] == (price, dola_user_id):
+            del self.entries[i]
+
+    def at_or_above(self, price):
+        return [dola_user_id for _, dola_user_id in self.entries[bisect.bisect_left(self.entries, (price,)):]]
+
+    def at_or_below(self, price):
+        return [dola_user_id for _, dola_user_id in self.entries[:bisect.bisect_right(self.entries, (price + 1,))]]
+
+
+class LiquidationWatchlist:
+    """
+    Subscribes to a LendingMirror and keeps per pool indexes of trigger prices:
+
+    - falling: the user becomes liquidatable when the price falls to the trigger
+    - rising: the user becomes liquidatable when the price rises to the trigger
+
+    Changes reported by the mirror are applied by process(), after each mirror sync.
+
+    unhealthy: {dola_user_id: health factor} of the users that can be liquidated
+    """
+
+    def __init__(self, mirror: LendingMirror, rebuild_interval=60, margin_bps=TRIGGER_MARGIN_BPS):
+        self.mirror = mirror
+        self.rebuild_interval = rebuild_interval
+        self.margin_bps = margin_bps
+        self.snapshot = None
+        self.falling = {}
+        self.rising = {}
+        # dola_user_id -> [(triggers, price)]
+        self.user_triggers = {}
+        self.unhealthy = {}
+        self.last_rebuild = 0
+        self.dirty_reserves = set()
+        self.dirty_prices = set()
+        self.dirty_users = set()
+        mirror.subscribe(self.on_change)
+
+    def on_change(self, kind, key):
+        if kind == "reserve":
+            self.dirty_reserves.add(key)
+        elif kind == "price":
+            self.dirty_prices.add(key)
+        else:
+            self.dirty_users.add(key)
+
+    # === Index ===
+
+    def rebuild(self):
+        """Score every user and index them again. :return: the unhealthy users"""
+        self.snapshot = HealthSnapshot(self.mirror)
+        self.falling = {dola_pool_id: PriceTriggers() for dola_pool_id in self.snapshot.dola_pool_ids}
+        self.rising = {dola_pool_id: PriceTriggers() for dola_pool_id in self.snapshot.dola_pool_ids}
+        self.user_triggers = {}
+        self.unhealthy = {}
+        self.last_rebuild = time.time()
+        self.dirty_reserves.clear()
+        self.dirty_prices.clear()
+        self.dirty_users.clear()
+        self.index(np.arange(len(self.snapshot.dola_user_ids)))
+        return list(self.unhealthy.items())
+
+    def unindex(self, dola_user_id):
+        for triggers, price in self.user_triggers.pop(dola_user_id, []):
+            triggers.remove(price, dola_user_id)
+
+    def index(self, rows):
+        """
+        Compute the trigger prices of the users in rows.
+        :return: [(dola_user_id, health factor)] of the unhealthy ones
+        """
+        snapshot = self.snapshot
+        collateral_values = snapshot.health_collateral_values(rows)
+        loan_values = snapshot.health_loan_values(rows)
+        # Health loan value - health collateral value, negative while healthy
+        shortfalls = loan_values.sum(axis=1) - collateral_values.sum(axis=1)
+        # Weighted exposure to each price: at price * r the shortfall becomes shortfall - (r - 1) * exposure
+        exposures = collateral_values - loan_values
+        factors = health_factor(collateral_values.sum(axis=1), loan_values.sum(axis=1))
+
+        unhealthy = []
+        for n, i in enumerate(rows):
+            dola_user_id = snapshot.dola_user_ids[i]
+            self.unindex(dola_user_id)
+            if factors[n] <= RAY:
+                self.unhealthy[dola_user_id] = factors[n]
+                unhealthy.append((dola_user_id, factors[n]))
+                continue
+            self.unhealthy.pop(dola_user_id, None)
+            user_triggers = []
+            for j in np.nonzero(exposures[n])[0]:
+                exposure = exposures[n, j]
+                # Zero exactly where shortfall - (r - 1) * exposure = 0
+                remaining = exposure + shortfalls[n]
+                price = snapshot.price[j]
+                dola_pool_id = snapshot.dola_pool_ids[j]
+                if exposure > 0 and remaining > 0:
+                    trigger = price * remaining // exposure
+                    trigger += trigger * self.margin_bps // 10000
+                    user_triggers.append((self.falling[dola_pool_id], trigger))
+                elif exposure < 0 and remaining < 0:
+                    trigger = price * remaining // exposure
+                    trigger -= trigger * self.margin_bps // 10000
+                    user_triggers.append((self.rising[dola_pool_id], trigger))
+            for triggers, trigger in user_triggers:
+                triggers.add(trigger, dola_user_id)
+            if user_triggers:
+                self.user_triggers[dola_user_id] = user_triggers
+        return unhealthy
+
+    # === Updates ===
+
+    def process(self):
+        """
+        Apply the changes reported since the last call and score the affected users and the unhealthy ones.
+        :return: [(dola_user_id, health factor)] of all the users that can be liquidated
+        """
+        mirror = self.mirror
+        if self.snapshot is None or time.time() - self.last_rebuild > self.rebuild_interval or \
+                any(dola_pool_id not in self.snapshot.pool_index for dola_pool_id in self.dirty_reserves):
+            return self.rebuild()
+
+        snapshot = self.snapshot
+        for dola_pool_id in self.dirty_reserves:
+            snapshot.load_reserve(mirror, dola_pool_id)
+
+        rescore = set()
+        for dola_pool_id in self.dirty_prices:
+            if dola_pool_id not in snapshot.pool_index:
+                continue
+            snapshot.load_price(mirror, dola_pool_id)
+            price = mirror.prices[dola_pool_id].value
+            rescore.update(self.falling[dola_pool_id].at_or_above(price))
+            rescore.update(self.rising[dola_pool_id].at_or_below(price))
+
+        snapshot.add_users(mirror, self.dirty_users)
+        for dola_user_id in self.dirty_users:
+            snapshot.load_user(mirror, snapshot.user_index[dola_user_id], dola_user_id)
+        rescore |= self.dirty_users
+        rescore.update(self.unhealthy)
+
+        self.dirty_reserves.clear()
+        self.dirty_prices.clear()
+        self.dirty_users.clear()
+        if rescore:
+            self.index(np.array(sorted(snapshot.user_index[dola_user_id] for dola_user_id in rescore)))
+        return list(self.unhealthy.items())
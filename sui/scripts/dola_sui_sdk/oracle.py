@@ -1,15 +1,20 @@
 import base64
+import json
 import logging
+import threading
 import time
 from pprint import pprint
 
 import ccxt
 import requests
 import sui_brownie
+from atomicwrites import atomic_write
 from sui_brownie import Argument, U16
+from urllib3.util.retry import Retry
 
 import config
 from dola_sui_sdk import load, sui_project, init
+from dola_sui_sdk.view_cache import view_cache
 
 
 class ColorFormatter(logging.Formatter):
@@ -55,33 +60,98 @@ def pyth_state():
     return sui_project.network_config['objects']['PythState']
 
 
+# Seconds a fetched pyth vaa is served from memory
+PYTH_VAA_TTL = 2
+
+
+class PythClient:
+    """
+    Pyth price service client. Every feed id needed by a call is fetched in one request
+    on a pooled session, the latest vaa of each feed is kept for PYTH_VAA_TTL seconds.
+
+    subscribe keeps the vaas of a set of feeds warm from a background thread, so relays and
+    oracle_guard take a ready-made update from memory.
+    """
+
+    def __init__(self, ttl=PYTH_VAA_TTL, timeout=5, max_attempts=3):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.session = requests.Session()
+        retries = Retry(total=max_attempts, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.vaas = {}
+        self.lock = threading.Lock()
+        self.subscribed = set()
+        self.subscriber = None
+
+    @staticmethod
+    def feed_id(symbol):
+        return sui_project.network_config['oracle']['feed_id'][symbol].replace("0x", "")
+
+    def fetch(self, feed_ids):
+        """Fetch the latest vaas of feed_ids with one request and cache them"""
+        pyth_service_url = sui_project.network_config['pyth_service_url']
+        response = self.session.get(
+            f"{pyth_service_url}/api/latest_price_feeds",
+            params={"ids[]": list(feed_ids), "binary": "true"},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        now = time.time()
+        vaas = {}
+        for price_feed in response.json():
+            vaas[price_feed['id'].replace("0x", "")] = f"0x{base64.b64decode(price_feed['vaa']).hex()}"
+        with self.lock:
+            for feed_id, vaa in vaas.items():
+                self.vaas[feed_id] = (now, vaa)
+        return vaas
+
+    def get_vaas(self, feed_ids):
+        """:return: latest vaas in the order of feed_ids"""
+        feed_ids = [feed_id.replace("0x", "") for feed_id in feed_ids]
+        now = time.time()
+        with self.lock:
+            vaas = {
+                feed_id: self.vaas[feed_id][1]
+                for feed_id in feed_ids
+                if feed_id in self.vaas and now - self.vaas[feed_id][0] < self.ttl
+            }
+        missing = list(dict.fromkeys(feed_id for feed_id in feed_ids if feed_id not in vaas))
+        if missing:
+            vaas.update(self.fetch(missing))
+        return [vaas[feed_id] for feed_id in feed_ids]
+
+    def subscribe(self, feed_ids, interval=1):
+        """Keep feed_ids refreshed in the background, every interval seconds"""
+        self.subscribed.update(feed_id.replace("0x", "") for feed_id in feed_ids)
+        if self.subscriber is not None:
+            return
+
+        def refresh():
+            while True:
+                try:
+                    self.fetch(sorted(self.subscribed))
+                except (requests.RequestException, ValueError) as e:
+                    print(f"Refresh pyth vaas fail, err:{e}")
+                time.sleep(interval)
+
+        self.subscriber = threading.Thread(target=refresh, name="pyth_subscriber", daemon=True)
+        self.subscriber.start()
+
+
+pyth_client = PythClient()
+
+
 def get_feed_vaa(symbol):
-    pyth_service_url = sui_project.network_config['pyth_service_url']
-    feed_id = sui_project.network_config['oracle']['feed_id'][symbol].replace("0x", "")
-    url = f"{pyth_service_url}/api/latest_vaas?ids[]={feed_id}"
-    response = requests.get(url)
-    vaa = list(response.json())[0]
-    return f"0x{base64.b64decode(vaa).hex()}"
+    return pyth_client.get_vaas([PythClient.feed_id(symbol)])[0]
 
 
 def get_batch_feed_vaa(symbols=None):
     if symbols is None:
         symbols = []
-    pyth_service_url = sui_project.network_config['pyth_service_url']
-    feed_ids = []
-
-    url = f"{pyth_service_url}/api/latest_vaas?"
-
-    feed_ids.extend(
-        sui_project.network_config['oracle']['feed_id'][symbol]
-        for symbol in symbols
-    )
-
-    for feed_id in feed_ids:
-        url = f"{url}ids[]={feed_id}&"
-    response = requests.get(url)
-    vaas = response.json()
-    return [f"0x{base64.b64decode(vaa).hex()}" for vaa in vaas]
+    return pyth_client.get_vaas([PythClient.feed_id(symbol) for symbol in symbols])
 
 
 def get_price_info_object(symbol):
@@ -106,6 +176,109 @@ def get_pyth_fee():
     return parse_u64(result['results'][0]['returnValues'][0][0])
 
 
+# Seconds kept in hand so a price seen as fresh is still fresh when the relay transaction lands
+PRICE_FRESH_MARGIN = 10
+
+# How often the oracle periods are read again from PriceOracle
+PRICE_ORACLE_TIMES_TTL = 3600
+
+
+class PriceFreshness:
+    """
+    Last on chain price timestamp of each dola pool together with the oracle's price_fresh_time
+    and price_guard_time. The cache is a file shared by the relay executors and oracle_guard,
+    so a price fed by one process moments ago is not fed again by another.
+
+    Writers merge by keeping the newest timestamp. Two writers racing can lose an update,
+    which only costs a redundant feed.
+    """
+
+    def __init__(self, margin=PRICE_FRESH_MARGIN):
+        self.margin = margin
+
+    @property
+    def cache_file(self):
+        return sui_project.cache_dir.joinpath(f"{sui_project.network}-price-freshness.json")
+
+    def read(self):
+        if not self.cache_file.exists():
+            return {"timestamps": {}}
+        try:
+            with open(str(self.cache_file), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"timestamps": {}}
+
+    def write(self, data):
+        with atomic_write(str(self.cache_file), overwrite=True) as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+
+    @staticmethod
+    def get_oracle_times():
+        price_oracle = sui_project.network_config['objects']['PriceOracle']
+        result = sui_project.client.sui_getObject(price_oracle, {"showContent": True})
+        fields = result['data']['content']['fields']
+        return int(fields['price_fresh_time']), int(fields['price_guard_time'])
+
+    def load(self):
+        data = self.read()
+        if time.time() - data.get("oracle_times_at", 0) > PRICE_ORACLE_TIMES_TTL:
+            data["price_fresh_time"], data["price_guard_time"] = self.get_oracle_times()
+            data["oracle_times_at"] = int(time.time())
+            self.write(data)
+        return data
+
+    def update(self, timestamps):
+        """:param timestamps: dola_pool_id => on chain price timestamp in seconds"""
+        data = self.read()
+        data.setdefault("timestamps", {})
+        for pool_id, timestamp in timestamps.items():
+            data["timestamps"][str(pool_id)] = max(int(timestamp), data["timestamps"].get(str(pool_id), 0))
+        self.write(data)
+
+    def record_feed(self, asset_ids, result):
+        """Fill the cache from an executed feed_token_price_by_pyth_v2 transaction"""
+        if result['effects']['status']['status'] != 'success':
+            return
+        # The oracle stamps prices with the clock of the transaction, as does the pyth update event
+        timestamps = [
+            int(event['parsedJson']['timestamp'])
+            for event in result.get('events', [])
+            if event['type'].endswith('::event::PriceFeedUpdateEvent')
+        ]
+        if timestamps:
+            timestamp = max(timestamps)
+        elif 'timestampMs' in result:
+            timestamp = int(result['timestampMs']) // 1000
+        else:
+            timestamp = int(time.time())
+        self.update({pool_id: timestamp for pool_id in asset_ids})
+
+    def is_fresh(self, pool_id, guard=False, data=None):
+        """
+        Whether the price of pool_id still passes check_fresh_price, or check_guard_price with guard.
+        Like the oracle, usdt and usdc (pools 1 and 2) only need the guard period.
+        """
+        if data is None:
+            data = self.load()
+        timestamp = data["timestamps"].get(str(pool_id))
+        if timestamp is None:
+            return False
+        if guard or pool_id in [1, 2]:
+            period = data["price_guard_time"]
+        else:
+            period = data["price_fresh_time"]
+        return time.time() < timestamp + period - self.margin
+
+    def stale(self, asset_ids):
+        """Keep the asset_ids whose price needs a feed"""
+        data = self.load()
+        return [pool_id for pool_id in asset_ids if not self.is_fresh(pool_id, data=data)]
+
+
+price_freshness = PriceFreshness()
+
+
 def feed_token_price_by_pyth(pool_id, simulate=True, kraken=None):
     dola_protocol = load.dola_protocol_package()
 
@@ -173,7 +346,7 @@ def feed_token_price_by_pyth(pool_id, simulate=True, kraken=None):
         if deviation > deviation_threshold:
             raise ValueError(f"The oracle price difference is too large! {symbol} price deviation: {deviation}")
     else:
-        sui_project.batch_transaction(
+        result = sui_project.batch_transaction(
             actual_params=[
                 governance_genesis,
                 wormhole_state,
@@ -203,6 +376,7 @@ def feed_token_price_by_pyth(pool_id, simulate=True, kraken=None):
                 ]
             ]
         )
+        price_freshness.record_feed([pool_id], result)
 
 
 def build_feed_transaction_block(dola_protocol, basic_param_num, sequence):
@@ -256,6 +430,7 @@ def batch_feed_token_price_by_pyth(symbols):
         transactions=transaction_blocks,
         gas_budget=2000000000
     )
+    price_freshness.record_feed([get_pool_id(symbol) for symbol in symbols], result)
     pprint(result)
 
 
@@ -272,7 +447,8 @@ def check_fresh_price(symbol):
 def get_token_price(symbol):
     dola_protocol = load.dola_protocol_package()
 
-    result = dola_protocol.oracle.get_token_price.inspect(
+    result = view_cache.view(
+        dola_protocol.oracle.get_token_price,
         sui_project.network_config['objects']['PriceOracle'],
         get_pool_id(symbol)
     )
@@ -449,11 +625,15 @@ def oracle_guard(pool_ids=None):
 
     sui_project.active_account("OracleGuard")
     symbols = [config.DOLA_POOL_ID_TO_SYMBOL[pool_id] for pool_id in pool_ids]
+    pyth_client.subscribe([PythClient.feed_id(symbol) for symbol in symbols])
 
     while True:
         try:
             for (pool_id, symbol) in zip(pool_ids, symbols):
 
+                # Fed recently by a relayer
+                if price_freshness.is_fresh(pool_id, guard=True):
+                    continue
                 local_logger.info(f"Check {symbol} price guard time")
                 if check_guard_price(symbol):
                     local_logger.info(f"Update {symbol} price")
@@ -0,0 +1,96 @@
+"""
+Read-through cache of devInspect views, keyed by the versions of the shared objects they read.
+
+The effects of a devInspect list the shared objects of the call with the versions read, so a cached result is
+valid as long as none of those objects moved past these versions. New versions are learned from the effects of
+executed transactions, from the shared objects read by later views, and from a sui_multiGetObjects probe at most
+every probe_interval seconds. The mutated and created objects of a devInspect are never committed, so only its
+shared objects are observed. A cached result is never older than the latest versions observed.
+"""
+import threading
+import time
+
+# Max ids of one sui_multiGetObjects
+SUI_MULTI_GET_OBJECTS_LIMIT = 50
+
+# About one checkpoint
+PROBE_INTERVAL = 0.5
+
+
+class ViewCache:
+    """
+    entries: {(package id, module, function, arguments): ({object_id: version}, devInspect result)}
+    """
+
+    def __init__(self, probe_interval=PROBE_INTERVAL):
+        self.probe_interval = probe_interval
+        self.versions = {}
+        self.probed_at = {}
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._projects = set()
+
+    def observe(self, object_id, version):
+        with self._lock:
+            if version > self.versions.get(object_id, -1):
+                self.versions[object_id] = version
+
+    def observe_effects(self, effects, keys=("sharedObjects", "mutated", "created")):
+        """Versions from the effects of an executed transaction"""
+        for key in keys:
+            for change in effects.get(key, []):
+                reference = change.get("reference", change)
+                self.observe(reference["objectId"], int(reference["version"]))
+
+    def observe_shared(self, effects):
+        """Versions read by a devInspect"""
+        self.observe_effects(effects, keys=("sharedObjects",))
+
+    def probe(self, project, object_ids):
+        """Read the current versions of the objects not probed within probe_interval"""
+        now = time.time()
+        object_ids = [object_id for object_id in object_ids
+                      if now - self.probed_at.get(object_id, 0) > self.probe_interval]
+        for i in range(0, len(object_ids), SUI_MULTI_GET_OBJECTS_LIMIT):
+            batch = object_ids[i:i + SUI_MULTI_GET_OBJECTS_LIMIT]
+            for object_info in project.client.sui_multiGetObjects(batch, {}):
+                if "data" in object_info:
+                    self.observe(object_info["data"]["objectId"], int(object_info["data"]["version"]))
+        for object_id in object_ids:
+            self.probed_at[object_id] = now
+
+    def is_latest(self, versions):
+        return all(self.versions.get(object_id) == version for object_id, version in versions.items())
+
+    def view(self, module_function, *arguments):
+        """module_function.view(*arguments), served from memory while its shared objects are unchanged"""
+        project = module_function.package.project
+        if id(project) not in self._projects:
+            project.effects_listeners.append(self.observe_effects)
+            self._projects.add(id(project))
+
+        abi = module_function.abi
+        key = (module_function.package.package_id, abi["module_name"], abi["func_name"], repr(arguments))
+        entry = self.entries.get(key)
+        if entry is not None:
+            versions, result = entry
+            self.probe(project, list(versions))
+            if self.is_latest(versions):
+                return result
+
+        result = module_function.view(*arguments)
+        if result.get("effects", {}).get("status", {}).get("status") != "success":
+            return result
+        self.observe_shared(result["effects"])
+        versions = {change["objectId"]: int(change["version"])
+                    for change in result["effects"].get("sharedObjects", [])}
+        # Another reader may have seen newer versions meanwhile, keep only results that are current
+        if self.is_latest(versions):
+            self.entries[key] = (versions, result)
+        return result
+
+    def clear(self):
+        self.entries.clear()
+
+
+view_cache = ViewCache()
@@ -1,25 +1,34 @@
+import asyncio
 import time
 from pathlib import Path
 
 import requests
 from retrying import retry
 
+import config
 import dola_ethereum_sdk
 import dola_sui_sdk
 import sms
 from dola_sui_sdk import interfaces, lending, sui_project
-from relayer import init_logger
+from dola_sui_sdk.health_engine import RAY, inspect_health_factors
+from dola_sui_sdk.lending_state import LendingMirror
+from dola_sui_sdk.liquidation_watchlist import LiquidationWatchlist
+from relayer import init_logger, SUPERVISE_MIN_BACKOFF, SUPERVISE_MAX_BACKOFF
 
+SUI_POOL_ID = next(pool_id for pool_id, symbol in config.DOLA_POOL_ID_TO_SYMBOL.items() if symbol == "SUI/USD")
 
-@retry
-def get_user_ids_by_hf(min_hf, max_hf):
-    host = 'https://crossswap.coming.chat'
-    if sui_project.network == 'sui-testnet':
-        host = 'https://crossswap-pre.coming.chat'
-    url = f'{host}/lending/v1/filterUsers?minHealthFactor={min_hf}&maxHealthFactor={max_hf}'
+# Relay fees are in MIST, dola amounts have 8 decimals
+SUI_DECIMAL = 9
 
-    response = requests.get(url)
-    return response.json()['users'] if response.status_code == 200 else []
+DOLA_DECIMAL = 8
+
+RELAY_FEE_TTL = 60
+
+# Coins below it are left out of the gas coins
+MIN_GAS_COIN_BALANCE = int(1e9)
+
+# Seconds to wait for the relayer to execute a liquidation on the core
+SETTLE_TIMEOUT = 300
 
 
 @retry
@@ -44,29 +53,285 @@ def get_pools(pool_id):
     return pools
 
 
-def check_liquidator_liquidity(liquidator_lending_info, pool_id):
-    collateral_infos = liquidator_lending_info['collateral_infos']
-    liquid_asset_infos = liquidator_lending_info['liquid_asset_infos']
-    return (any(collateral_info['dola_pool_id'] == pool_id for collateral_info in collateral_infos) or
-            any(liquid_asset_info['dola_pool_id'] == pool_id for liquid_asset_info in liquid_asset_infos))
+def get_feed_nums(liquidator_info, violator_info):
+    """Prices fed before the liquidation: every collateral and loan of both users"""
+    return len(set(liquidator_info.collaterals + liquidator_info.loans +
+                   violator_info.collaterals + violator_info.loans))
+
+
+class GasCoins:
+    """SUI coins of the account, each paying for at most one transaction at a time"""
+
+    def __init__(self, min_balance=MIN_GAS_COIN_BALANCE):
+        self.min_balance = min_balance
+        self.coins = []
+
+    def load(self):
+        coins = sui_project.client.suix_getCoins(sui_project.account.account_address, "0x2::sui::SUI", None,
+                                                 None)["data"]
+        self.coins = [coin for coin in coins if int(coin['balance']) >= self.min_balance]
+
+    def acquire(self):
+        return self.coins.pop() if self.coins else None
+
+    def release(self, coin, result, spent):
+        """Put the coin back with the reference and the balance left by the transaction"""
+        reference = result['effects']['gasObject']['reference']
+        balance = int(coin['balance']) - lending.calculate_sui_gas(result['effects']['gasUsed']) - spent
+        self.put(dict(coin, version=reference['version'], digest=reference['digest'], balance=str(balance)))
+
+    def reload(self, coin):
+        """The transaction failed somewhere, read the coin again"""
+        data = sui_project.client.sui_getObject(coin['coinObjectId'], {"showContent": True})['data']
+        self.put(dict(coin, version=data['version'], digest=data['digest'],
+                      balance=data['content']['fields']['balance']))
+
+    def put(self, coin):
+        if int(coin['balance']) >= self.min_balance:
+            self.coins.append(coin)
+
+
+class LiquidationPlan:
+    __slots__ = ("violator", "repay_pool_id", "liquidate_pool_id", "repay_debt", "profit", "relay_fee")
+
+    def __init__(self, violator, repay_pool_id, liquidate_pool_id, repay_debt, profit, relay_fee):
+        self.violator = violator
+        self.repay_pool_id = repay_pool_id
+        self.liquidate_pool_id = liquidate_pool_id
+        self.repay_debt = repay_debt
+        self.profit = profit
+        self.relay_fee = relay_fee
+
+
+class LiquidationPipeline:
+    """
+    Liquidates the users reported by the watchlist, the most profitable first.
+
+    Candidates are valued with the local calculate_max_liquidation against the liquidator state in the mirror,
+    net of the relay fee. The portal only sends the liquidation to the core through wormhole, so a violator
+    stays in flight and the collateral repaid with stays reserved until the mirror applies the
+    LendingUserStatsEvent of both users from the core_liquidate of the relayer, or settle_timeout seconds.
+    Liquidations on different gas coins can be sent at the same time.
+    """
+
+    def __init__(self, mirror, watchlist, liquidator_user_id, logger, notify_interval=600,
+                 settle_timeout=SETTLE_TIMEOUT):
+        self.mirror = mirror
+        self.watchlist = watchlist
+        self.liquidator_user_id = liquidator_user_id
+        self.logger = logger
+        self.notify_interval = notify_interval
+        self.settle_timeout = settle_timeout
+        self.last_notify_time = time.time()
+        self.gas_coins = GasCoins()
+        # dola_user_id -> health factor
+        self.candidates = {}
+        self.in_flight = set()
+        # violator -> (plan, deadline) of the liquidations sent to the core
+        self.settling = {}
+        # repay dola_pool_id -> amount repaid by in flight liquidations
+        self.reserved = {}
+        self.relay_fees = {}
+        self.tasks = set()
+        self.wake = asyncio.Event()
+        mirror.subscribe_stats(self.on_stats)
+
+    def spawn(self, coro):
+        """Keep a reference to the task until it is done"""
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    # === Candidates ===
+
+    def collect(self, unhealthy_users):
+        new_user_ids = []
+        for user_id, hf in unhealthy_users:
+            if user_id in self.in_flight or user_id == self.liquidator_user_id:
+                continue
+            if user_id not in self.candidates:
+                new_user_ids.append(user_id)
+            self.candidates[user_id] = hf
+        if new_user_ids:
+            self.spawn(self.verify(new_user_ids))
+        if unhealthy_users:
+            self.wake.set()
+
+    async def verify(self, user_ids):
+        """Compare the local health factors with the chain, off the liquidation path"""
+        try:
+            chain_factors = await asyncio.to_thread(inspect_health_factors, user_ids)
+        except Exception as e:
+            self.logger.warning(f"Inspect health factors fail due to {e}")
+            return
+        snapshot = self.watchlist.snapshot
+        for user_id, chain_hf in chain_factors.items():
+            local_hf = snapshot.user_health_factor(user_id)
+            if local_hf != chain_hf:
+                self.logger.warning(f"User {user_id} health factor local {local_hf} != chain {chain_hf}")
+
+    async def watch(self, interval=1):
+        """
+        Follow the mirror and collect the unhealthy users. Failures of the rpc or of the scoring are logged and
+        retried after SUPERVISE_MIN_BACKOFF doubled after each failure in a row, up to SUPERVISE_MAX_BACKOFF.
+        """
+        bootstrapped = False
+        backoff = SUPERVISE_MIN_BACKOFF
+        while True:
+            try:
+                if not bootstrapped:
+                    await self.mirror.bootstrap()
+                    bootstrapped = True
+                self.expire_settling()
+                self.collect(self.watchlist.process())
+                synced = await self.mirror.sync()
+            except Exception as e:
+                self.logger.warning(f"Watch fail due to {e}, retry in {backoff}s")
+                # The index may be half updated
+                self.watchlist.last_rebuild = 0
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, SUPERVISE_MAX_BACKOFF)
+                continue
+            backoff = SUPERVISE_MIN_BACKOFF
+            if not synced:
+                await asyncio.sleep(interval)
+
+    # === Ranking ===
+
+    async def relay_fee(self, feed_nums):
+        fee, updated_at = self.relay_fees.get(feed_nums, (None, 0))
+        if time.time() - updated_at > RELAY_FEE_TTL:
+            fee = await asyncio.to_thread(get_liquidate_relay_fee, feed_nums)
+            self.relay_fees[feed_nums] = (fee, time.time())
+        return fee
+
+    def relay_fee_value(self, relay_fee):
+        snapshot = self.watchlist.snapshot
+        j = snapshot.pool_index[SUI_POOL_ID]
+        amount = relay_fee // 10 ** (SUI_DECIMAL - DOLA_DECIMAL)
+        return amount * snapshot.price[j] // snapshot.price_scale[j]
+
+    def plan(self, violator, relay_fee):
+        """The most profitable (collateral, loan) pair of the violator, None without one"""
+        snapshot = self.watchlist.snapshot
+        liquidator_info = self.mirror.user_infos[self.liquidator_user_id]
+        violator_info = self.mirror.user_infos[violator]
+        best = None
+        for loan in violator_info.loans:
+            # The liquidator repays with its own collateral in the loan pool
+            if loan not in liquidator_info.collaterals:
+                continue
+            repay_debt = snapshot.collateral_balance_of(self.liquidator_user_id, loan) - self.reserved.get(loan, 0)
+            for collateral in violator_info.collaterals:
+                result = snapshot.liquidation_profit(liquidator_info.average_liquidity, self.liquidator_user_id,
+                                                     violator, collateral, loan, max(repay_debt, 0))
+                if result is None:
+                    continue
+                profit, _, actual_debt = result
+                if best is None or profit > best.profit:
+                    best = LiquidationPlan(violator, loan, collateral, actual_debt, profit, relay_fee)
+        return best
+
+    async def rank(self):
+        """:return: the plans of the candidates, the highest profit net of relay fee first"""
+        snapshot = self.watchlist.snapshot
+        liquidator_info = self.mirror.user_infos.get(self.liquidator_user_id)
+        if liquidator_info is None:
+            self.logger.warning(f"Liquidator {self.liquidator_user_id} has no lending info")
+            return []
+
+        plans = []
+        for violator in list(self.candidates):
+            if violator not in self.mirror.user_infos or snapshot.user_health_factor(violator) > RAY:
+                del self.candidates[violator]
+                continue
+            relay_fee = await self.relay_fee(get_feed_nums(liquidator_info, self.mirror.user_infos[violator]))
+            plan = self.plan(violator, relay_fee)
+            if plan is None:
+                self.notify_no_liquidity(violator)
+                continue
+            plan.profit -= self.relay_fee_value(relay_fee)
+            if plan.profit > 0:
+                plans.append(plan)
+        return sorted(plans, key=lambda x: x.profit, reverse=True)
 
+    def notify_no_liquidity(self, violator):
+        loans = [lending.dola_pool_id_to_symbol(loan) for loan in self.mirror.user_infos[violator].loans]
+        msg = f'liquidator {self.liquidator_user_id} has no liquidity to repay user {violator} {loans} debt'
+        self.logger.info(msg)
+        if self.last_notify_time + self.notify_interval >= time.time():
+            return
+        try:
+            sms.notify(msg)
+            self.last_notify_time = time.time()
+        except Exception as e:
+            self.logger.warning(f"Notify fail due to {e}")
 
-def get_user_feed_tokens(lending_info):
-    collateral_infos = lending_info['collateral_infos']
-    debt_infos = lending_info['debt_infos']
+    # === Submission ===
 
-    collateral_ids = [collateral_info['dola_pool_id'] for collateral_info in collateral_infos]
-    debt_ids = [debt_info['dola_pool_id'] for debt_info in debt_infos]
+    async def liquidate(self, plan: LiquidationPlan, coin):
+        repay_symbol = lending.dola_pool_id_to_symbol(plan.repay_pool_id)
+        liquidate_symbol = lending.dola_pool_id_to_symbol(plan.liquidate_pool_id)
+        self.logger.info(f"Liquidate user {plan.violator} use {repay_symbol} to get {liquidate_symbol}, "
+                         f"expected profit {plan.profit}")
+        try:
+            result = await asyncio.to_thread(lending.portal_liquidate_with_gas, plan.repay_pool_id, plan.violator,
+                                             plan.liquidate_pool_id, plan.relay_fee, coin)
+            self.gas_coins.release(coin, result, plan.relay_fee)
+        except Exception as e:
+            self.logger.warning(f"Liquidate user {plan.violator} fail due to {e}")
+            await asyncio.to_thread(self.gas_coins.reload, coin)
+            self.settle(plan)
+            return
+        self.settling[plan.violator] = (plan, time.time() + self.settle_timeout)
+        self.wake.set()
 
-    return collateral_ids + debt_ids
+    def settle(self, plan: LiquidationPlan):
+        """Release the violator and the reserved collateral"""
+        self.reserved[plan.repay_pool_id] -= plan.repay_debt
+        self.in_flight.discard(plan.violator)
+        self.wake.set()
 
+    def on_stats(self, dola_user_ids):
+        """A transaction of the mirror changed the balances of dola_user_ids"""
+        if self.liquidator_user_id not in dola_user_ids:
+            return
+        for violator in dola_user_ids & set(self.settling):
+            plan, _ = self.settling.pop(violator)
+            self.settle(plan)
 
-def get_liquidate_feed_tokens(liquidator_lending_info, violator_lending_info):
-    liquidator_feed_tokens = get_user_feed_tokens(liquidator_lending_info)
+    def expire_settling(self):
+        now = time.time()
+        for violator, (plan, deadline) in list(self.settling.items()):
+            if deadline < now:
+                self.logger.warning(f"Liquidation of user {violator} not executed by the core "
+                                    f"in {self.settle_timeout}s")
+                del self.settling[violator]
+                self.settle(plan)
 
-    violator_feed_tokens = get_user_feed_tokens(violator_lending_info)
+    async def dispatch(self):
+        """Send the best plans while gas coins are free"""
+        while self.candidates and self.gas_coins.coins:
+            plans = await self.rank()
+            if not plans:
+                return
+            plan = plans[0]
+            coin = self.gas_coins.acquire()
+            del self.candidates[plan.violator]
+            self.in_flight.add(plan.violator)
+            self.reserved[plan.repay_pool_id] = self.reserved.get(plan.repay_pool_id, 0) + plan.repay_debt
+            self.spawn(self.liquidate(plan, coin))
 
-    return list(set(liquidator_feed_tokens + violator_feed_tokens))
+    async def run(self):
+        await asyncio.to_thread(self.gas_coins.load)
+        watch = asyncio.create_task(self.watch())
+        watch.add_done_callback(lambda _: self.wake.set())
+        while not watch.done():
+            await self.wake.wait()
+            self.wake.clear()
+            await self.dispatch()
+        await watch
 
 
 def liquidation_bot(liquidator_user_id):
@@ -76,46 +341,9 @@ def liquidation_bot(liquidator_user_id):
     dola_ethereum_sdk.set_dola_project_path(Path("../.."))
     sui_project.active_account("Liquidator")
 
-    last_notify_time = time.time()
-    interval = 600
-    while True:
-        # get user ids with health factor < 1
-        user_ids = get_user_ids_by_hf(0, 1.0)
-
-        for user_id in user_ids:
-            user_id = user_id['userId']
-            violator_lending_info = interfaces.get_user_lending_info(user_id)
-            debt_infos = violator_lending_info['debt_infos']
-            max_debt_info = max(debt_infos, key=lambda x: x['debt_value'])
-            repay_pool_id = max_debt_info['dola_pool_id']
-            repay_symbol = lending.dola_pool_id_to_symbol(repay_pool_id)
-
-            liquidator_lending_info = interfaces.get_user_lending_info(liquidator_user_id)
-
-            # check whether the liquidator can pay the debt
-            if check_liquidator_liquidity(liquidator_lending_info, repay_pool_id):
-                collateral_infos = violator_lending_info['collateral_infos']
-                max_collateral_info = max(collateral_infos, key=lambda x: x['collateral_value'])
-                liquidate_pool_id = max_collateral_info['dola_pool_id']
-                liquidate_symbol = lending.dola_pool_id_to_symbol(liquidate_pool_id)
-
-                liquidate_feed_tokens = get_liquidate_feed_tokens(liquidator_lending_info, violator_lending_info)
-                feed_nums = len(liquidate_feed_tokens)
-                relay_fee = get_liquidate_relay_fee(feed_nums)
-                logger.info(f"Liquidate use {repay_symbol} to get {liquidate_symbol}")
-                lending.portal_liquidate(repay_pool_id, user_id, liquidate_pool_id, bridge_fee=relay_fee)
-            else:
-                symbol = lending.dola_pool_id_to_symbol(repay_pool_id)
-                msg = f'liquidator {liquidator_user_id} has no liquidity to repay user {user_id} {symbol} debt'
-                logger.info(msg)
-                try:
-                    if last_notify_time + interval >= time.time():
-                        continue
-                    sms.notify(msg)
-                    last_notify_time = time.time()
-                except Exception as e:
-                    logger.warning(f"Notify fail due to {e}")
-        time.sleep(60)
+    mirror = LendingMirror()
+    pipeline = LiquidationPipeline(mirror, LiquidationWatchlist(mirror), liquidator_user_id, logger)
+    asyncio.run(pipeline.run())
 
 
 if __name__ == '__main__':
@@ -1,34 +1,47 @@
-import asyncio.exceptions
+import asyncio
 import base64
+import contextlib
 import datetime
 import functools
+import hashlib
 import json
 import logging
+import os
+import socket
 import time
 import traceback
+from concurrent.futures import ProcessPoolExecutor
 from hmac import compare_digest
-from multiprocessing import Manager
 from pathlib import Path
 
 import brownie
 import ccxt
+import httpx
 import requests
 from dotenv import dotenv_values
 from gql import gql
 from gql.client import log as gql_client_logs
 from gql.transport.aiohttp import log as gql_logs
-from pymongo import MongoClient
+from bson import Binary
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, ReturnDocument, UpdateOne, ReplaceOne, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
 from retrying import retry
-from sui_brownie.parallelism import ProcessExecutor
 
 import config
 import dola_ethereum_sdk
 import dola_ethereum_sdk.init as dola_ethereum_init
 import dola_ethereum_sdk.load as dola_ethereum_load
+from dola_ethereum_sdk.client import RpcError
+from dola_ethereum_sdk.codec import DolaMessage
+from dola_ethereum_sdk.registry import registry as dola_ethereum_registry
+from dola_ethereum_sdk.sender import AsyncTxSender, PendingTx
+from dola_ethereum_sdk.vaa import GuardianSetCache
 import dola_monitor
 import dola_sui_sdk
 import dola_sui_sdk.init as dola_sui_init
 import dola_sui_sdk.lending as dola_sui_lending
+import dola_sui_sdk.oracle as dola_sui_oracle
 from dola_sui_sdk.load import sui_project
 
 
@@ -147,22 +160,88 @@ def execute_sui_core(call_name, vaa, relay_fee, fee_rate=0.8):
     return gas, executed, status, feed_nums, digest
 
 
-class RelayRecord:
+class Health:
+    """Protocol health flag shared by the monitor and the watchers running in one event loop"""
+
+    def __init__(self, value=True):
+        self.value = value
+
+
+def init_sui_worker(relayer_account=None, subscribe_prices=False):
+    dola_sui_sdk.set_dola_project_path(Path("../.."))
+    if relayer_account is not None:
+        sui_project.active_account(relayer_account)
+    if subscribe_prices:
+        # Core relays feed prices, keep every feed's pyth vaa in memory
+        feed_ids = sui_project.network_config['oracle']['feed_id'].values()
+        dola_sui_oracle.pyth_client.subscribe(feed_ids)
+
+
+def sui_worker_pool(relayer_account=None, max_workers=1, subscribe_prices=False):
+    """
+    Process pool used for building, encoding and signing sui transactions.
+    One pool per relayer account keeps its gas coins in a single process.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=init_sui_worker,
+                               initargs=(relayer_account, subscribe_prices))
+
+
+async def run_in_pool(pool, func, *args):
+    return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+
+
+# Relay jobs are claimed with a lease, an executor that dies releases its job once the lease expires
+RELAY_JOB_LEASE_SECONDS = 120
+
+# Upper bound on how long an idle executor sleeps before polling the queue again
+RELAY_JOB_POLL_INTERVAL = 10
+
+# Most vaas relayed in one sui programmable transaction
+SUI_RELAY_BATCH_SIZE = 8
+
+
+class JobNotifier:
+    """Wakes idle executors of this process when a relay record is inserted or changes state"""
 
     def __init__(self):
-        db = mongodb()
+        self._event = asyncio.Event()
+
+    def notify(self):
+        event = self._event
+        self._event = asyncio.Event()
+        event.set()
+
+    async def wait(self, timeout=RELAY_JOB_POLL_INTERVAL):
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+def lease_owner(relayer_account):
+    return f"{socket.gethostname()}:{os.getpid()}:{relayer_account}"
+
+
+class RelayRecord:
+
+    def __init__(self, db, notifier: JobNotifier = None):
         self.db = db['RelayRecord']
+        self.vaa_db = db['RelayVaa']
+        self.notifier = notifier
 
-    def add_other_record(self, src_chain_id, src_tx_id, nonce, call_name, block_number, sequence, vaa, relay_fee,
-                         start_time):
-        record = {
+    def notify(self):
+        if self.notifier is not None:
+            self.notifier.notify()
+
+    @staticmethod
+    def other_record(src_chain_id, src_tx_id, nonce, call_name, block_number, sequence, relay_fee, start_time):
+        return {
             "src_chain_id": src_chain_id,
             "src_tx_id": src_tx_id,
             "nonce": nonce,
             "call_name": call_name,
             "block_number": block_number,
             "sequence": sequence,
-            "vaa": vaa,
             "relay_fee": relay_fee,
             "core_tx_id": "",
             "core_costed_fee": 0,
@@ -171,39 +250,33 @@ class RelayRecord:
             "start_time": start_time,
             "end_time": "",
         }
-        self.db.insert_one(record)
 
-    def add_withdraw_record(self, src_chain_id, src_tx_id, nonce, call_name, block_number, sequence, vaa, relay_fee,
-                            start_time, core_tx_id="", core_costed_fee=0, withdraw_chain_id="",
-                            withdraw_tx_id="",
-                            withdraw_sequence=0, withdraw_vaa="", withdraw_pool="", withdraw_costed_fee=0,
-                            status='false'):
-        record = {
+    @staticmethod
+    def withdraw_record(src_chain_id, src_tx_id, nonce, call_name, block_number, sequence, relay_fee, start_time):
+        return {
             "src_chain_id": src_chain_id,
             "src_tx_id": src_tx_id,
             "nonce": nonce,
             "call_name": call_name,
             "block_number": block_number,
             "sequence": sequence,
-            "vaa": vaa,
             "relay_fee": relay_fee,
-            "core_tx_id": core_tx_id,
-            "core_costed_fee": core_costed_fee,
-            "withdraw_chain_id": withdraw_chain_id,
-            "withdraw_tx_id": withdraw_tx_id,
-            "withdraw_sequence": withdraw_sequence,
-            "withdraw_vaa": withdraw_vaa,
-            "withdraw_pool": withdraw_pool,
-            "withdraw_costed_fee": withdraw_costed_fee,
-            "status": status,
+            "core_tx_id": "",
+            "core_costed_fee": 0,
+            "withdraw_chain_id": "",
+            "withdraw_tx_id": "",
+            "withdraw_sequence": 0,
+            "withdraw_pool": "",
+            "withdraw_costed_fee": 0,
+            "status": "false",
             "reason": "Unknown",
             "start_time": start_time,
             "end_time": "",
         }
-        self.db.insert_one(record)
 
-    def add_wait_record(self, src_chain_id, src_tx_id, nonce, sequence, block_number, relay_fee_value, date):
-        record = {
+    @staticmethod
+    def wait_record(src_chain_id, src_tx_id, nonce, sequence, block_number, relay_fee_value, date):
+        return {
             'src_chain_id': src_chain_id,
             'src_tx_id': src_tx_id,
             'nonce': nonce,
@@ -214,25 +287,219 @@ class RelayRecord:
             'start_time': date,
             'end_time': "",
         }
-        self.db.insert_one(record)
 
-    def update_record(self, filter, update):
-        self.db.update_one(filter, update)
+    @staticmethod
+    def vaa_document(vaa: str):
+        vaa_bytes = bytes.fromhex(vaa.replace('0x', ''))
+        return hashlib.sha256(vaa_bytes).hexdigest(), Binary(vaa_bytes)
+
+    async def save_vaa(self, vaa: str):
+        vaa_hash, vaa_bytes = self.vaa_document(vaa)
+        await self.vaa_db.update_one({'_id': vaa_hash}, {'$setOnInsert': {'vaa': vaa_bytes}}, upsert=True)
+        return vaa_hash
+
+    async def load_vaa(self, record, field='vaa'):
+        # Records written before vaas moved to RelayVaa keep them inline
+        if record.get(field):
+            return record[field]
+        result = await self.vaa_db.find_one({'_id': record[f'{field}_hash']})
+        return f"0x{bytes(result['vaa']).hex()}"
+
+    async def add_records(self, records):
+        """
+        Insert watcher records in one bulk write.
+        :param records: [(record, vaa)], vaa is stored in RelayVaa and may be None for wait records
+        """
+        if not records:
+            return
+        vaa_writes = []
+        for record, vaa in records:
+            if vaa is not None:
+                vaa_hash, vaa_bytes = self.vaa_document(vaa)
+                record['vaa_hash'] = vaa_hash
+                vaa_writes.append(UpdateOne({'_id': vaa_hash}, {'$setOnInsert': {'vaa': vaa_bytes}}, upsert=True))
+        if vaa_writes:
+            await self.vaa_db.bulk_write(vaa_writes, ordered=False)
+        await self.db.insert_many([record for record, _ in records], ordered=False)
+        self.notify()
+
+    async def update_record(self, filter, update):
+        await self.db.update_one(filter, update)
+        self.notify()
+
+    async def find_one(self, filter, projection=None):
+        return await self.db.find_one(filter, projection)
+
+    def find(self, filter, projection=None):
+        return self.db.find(filter, projection)
+
+    async def recorded_nonces(self, src_chain_id, nonces):
+        """(nonce, sequence) pairs of src_chain_id that are already recorded, looked up in one query"""
+        result = await self.db.find(
+            {'src_chain_id': src_chain_id, 'nonce': {'$in': list(nonces)}},
+            {'_id': False, 'nonce': True, 'sequence': True}
+        ).to_list(None)
+        return {(record['nonce'], record.get('sequence')) for record in result}
+
+    async def claim(self, filter, owner, lease_seconds=RELAY_JOB_LEASE_SECONDS):
+        """
+        Atomically take the oldest record matching filter whose lease is free or expired.
+        :return: the leased record or None when the queue is empty
+        """
+        now = time.time()
+        return await self.db.find_one_and_update(
+            {**filter, '$or': [{'lease_expire': {'$exists': False}}, {'lease_expire': {'$lt': now}}]},
+            {'$set': {'lease_owner': owner, 'lease_expire': now + lease_seconds}},
+            sort=[('_id', 1)],
+            return_document=ReturnDocument.AFTER
+        )
 
-    def find_one(self, filter):
-        return self.db.find_one(filter)
+    async def claim_more(self, filter, owner, limit, lease_seconds=RELAY_JOB_LEASE_SECONDS):
+        """Claim up to limit more records to batch with one already claimed, never waits for new ones"""
+        records = []
+        while len(records) < limit:
+            record = await self.claim(filter, owner, lease_seconds)
+            if record is None:
+                break
+            records.append(record)
+        return records
+
+    async def renew(self, record_id, owner, lease_seconds=RELAY_JOB_LEASE_SECONDS):
+        result = await self.db.update_one({'_id': record_id, 'lease_owner': owner},
+                                          {'$set': {'lease_expire': time.time() + lease_seconds}})
+        return result.matched_count > 0
+
+    async def defer(self, record_id, owner, delay=RELAY_JOB_POLL_INTERVAL):
+        """Keep a job that hit an unexpected error out of the queue for a while so it can't starve newer ones"""
+        try:
+            await self.db.update_one({'_id': record_id, 'lease_owner': owner},
+                                     {'$set': {'lease_owner': "", 'lease_expire': time.time() + delay}})
+        except PyMongoError as e:
+            logger.warning(f"Defer relay record {record_id} failed, lease expires on its own: {e}")
 
-    def find(self, filter):
-        return self.db.find(filter)
+    async def release(self, record_id, owner):
+        try:
+            await self.db.update_one({'_id': record_id, 'lease_owner': owner},
+                                     {'$unset': {'lease_owner': "", 'lease_expire': ""}})
+        except PyMongoError as e:
+            logger.warning(f"Release relay record {record_id} failed, lease expires on its own: {e}")
+
+    @contextlib.asynccontextmanager
+    async def lease(self, record, owner, lease_seconds=RELAY_JOB_LEASE_SECONDS):
+        """Keep the lease of a claimed record alive while the job runs, release it afterwards"""
+
+        async def keep_alive():
+            while True:
+                await asyncio.sleep(lease_seconds / 3)
+                try:
+                    renewed = await self.renew(record['_id'], owner, lease_seconds)
+                except PyMongoError as e:
+                    logger.warning(f"Renew lease of relay record {record['_id']} failed: {e}")
+                    continue
+                if not renewed:
+                    logger.warning(f"Lost lease of relay record {record['_id']}")
+                    return
+
+        renew_task = asyncio.create_task(keep_alive())
+        try:
+            yield record
+        finally:
+            renew_task.cancel()
+            await asyncio.gather(renew_task, return_exceptions=True)
+            await self.release(record['_id'], owner)
+
+    @contextlib.asynccontextmanager
+    async def lease_all(self, records, owner, lease_seconds=RELAY_JOB_LEASE_SECONDS):
+        async with contextlib.AsyncExitStack() as stack:
+            for record in records:
+                await stack.enter_async_context(self.lease(record, owner, lease_seconds))
+            yield records
+
+
+async def relay_record_waker(db, notifier: JobNotifier):
+    """
+    Forward RelayRecord changes written by other relayer processes to the local notifier.
+    Change streams need a replica set, without one executors fall back to polling.
+    """
+    local_logger = logger.getChild("[relay_record_waker]")
+    try:
+        async with db['RelayRecord'].watch(
+                [{'$match': {'operationType': {'$in': ['insert', 'update', 'replace']}}}]) as stream:
+            async for _ in stream:
+                notifier.notify()
+    except PyMongoError as e:
+        local_logger.warning(f"Change stream unavailable, executors poll every {RELAY_JOB_POLL_INTERVAL}s: {e}")
+
+
+# Completed records older than this move to RelayRecordArchive
+RELAY_RECORD_RETENTION = datetime.timedelta(days=30)
+
+# Archived records are dropped by a mongodb ttl index after this many seconds
+RELAY_RECORD_ARCHIVE_TTL = 365 * 24 * 3600
+
+
+async def ensure_indexes(db):
+    """Create the indexes every watcher, executor and fee query relies on, no-op when they exist"""
+    relay_record = db['RelayRecord']
+    await relay_record.create_index([('src_chain_id', ASCENDING), ('nonce', ASCENDING), ('sequence', ASCENDING)])
+    await relay_record.create_index([('src_chain_id', ASCENDING), ('block_number', DESCENDING)])
+    await relay_record.create_index([('src_chain_id', ASCENDING), ('start_time', DESCENDING)])
+    await relay_record.create_index([('status', ASCENDING), ('_id', ASCENDING)])
+    await relay_record.create_index([('status', ASCENDING), ('withdraw_chain_id', ASCENDING), ('_id', ASCENDING)])
+    await relay_record.create_index([('status', ASCENDING), ('src_chain_id', ASCENDING), ('block_number', ASCENDING)])
+    await relay_record.create_index([('status', ASCENDING), ('start_time', DESCENDING)])
+    await relay_record.create_index([('src_chain_id', ASCENDING), ('call_name', ASCENDING), ('status', ASCENDING),
+                                     ('reason', ASCENDING)])
+    await relay_record.create_index('completed_at', sparse=True)
+
+    gas_record = db['GasRecord']
+    await gas_record.create_index([('src_chain_id', ASCENDING), ('dst_chain_id', ASCENDING),
+                                   ('call_name', ASCENDING), ('feed_nums', ASCENDING), ('nonce', DESCENDING)])
+    await gas_record.create_index([('src_chain_id', ASCENDING), ('dst_chain_id', ASCENDING),
+                                   ('call_name', ASCENDING), ('core_gas', DESCENDING)])
+    await gas_record.create_index([('src_chain_id', ASCENDING), ('nonce', ASCENDING)])
+
+    await db['RelayRecordArchive'].create_index('archived_at', expireAfterSeconds=RELAY_RECORD_ARCHIVE_TTL)
+    await db['SignedVaa'].create_index('created_at', expireAfterSeconds=int(RELAY_RECORD_RETENTION.total_seconds()))
+
+
+async def archive_relay_records(db, interval=3600, batch_size=1000):
+    """Move completed relay records and their vaas out of the hot collections"""
+    local_logger = logger.getChild("[archive_relay_records]")
+    relay_record = db['RelayRecord']
+
+    while True:
+        try:
+            expire = datetime.datetime.utcnow() - RELAY_RECORD_RETENTION
+            while True:
+                records = await relay_record.find(
+                    {'status': {'$in': ['success', 'dropped']}, 'completed_at': {'$lt': expire}}
+                ).limit(batch_size).to_list(batch_size)
+                if not records:
+                    break
+                archived_at = datetime.datetime.utcnow()
+                for record in records:
+                    record['archived_at'] = archived_at
+                await db['RelayRecordArchive'].bulk_write(
+                    [ReplaceOne({'_id': record['_id']}, record, upsert=True) for record in records], ordered=False)
+                await relay_record.delete_many({'_id': {'$in': [record['_id'] for record in records]}})
+
+                vaa_hashes = [record[field] for record in records for field in ['vaa_hash', 'withdraw_vaa_hash']
+                              if record.get(field)]
+                if vaa_hashes:
+                    await db['RelayVaa'].delete_many({'_id': {'$in': vaa_hashes}})
+                local_logger.info(f"Archived {len(records)} relay records")
+        except PyMongoError as e:
+            local_logger.warning(f"Archive relay records failed: {e}")
+        await asyncio.sleep(interval)
 
 
 class GasRecord:
 
-    def __init__(self):
-        db = mongodb()
+    def __init__(self, db):
         self.db = db['GasRecord']
 
-    def add_gas_record(self, src_chain_id, nonce, dst_chain_id, call_name, core_gas=0, feed_nums=0):
+    async def add_gas_record(self, src_chain_id, nonce, dst_chain_id, call_name, core_gas=0, feed_nums=0):
         record = {
             'src_chain_id': src_chain_id,
             'nonce': nonce,
@@ -242,36 +509,272 @@ class GasRecord:
             'withdraw_gas': 0,
             'feed_nums': feed_nums
         }
-        self.db.insert_one(record)
+        await self.db.insert_one(record)
 
-    def update_record(self, filter, update):
-        self.db.update_one(filter, update)
+    async def update_record(self, filter, update):
+        await self.db.update_one(filter, update)
+
+    async def find_one(self, filter):
+        return await self.db.find_one(filter)
 
     def find(self, filter):
         return self.db.find(filter)
 
 
-def sui_portal_watcher(health):
-    dola_sui_sdk.set_dola_project_path(Path("../.."))
+# Polling interval bounds while the guardians have not signed a vaa yet
+VAA_FETCH_MIN_INTERVAL = 1
+VAA_FETCH_MAX_INTERVAL = 30
+
+
+class VaaNotFound(Exception):
+    """The guardians did not sign the vaa before the deadline"""
+
+
+class ScanCheckpoint:
+    """Position of a chain scan, one document per stream, so a restarted watcher resumes where it stopped"""
+
+    def __init__(self, db):
+        self.db = db['ScanCheckpoint']
+
+    async def get(self, stream):
+        return await self.db.find_one({'_id': stream}, {'_id': False})
+
+    async def set(self, stream, **fields):
+        fields['updated_at'] = datetime.datetime.utcnow()
+        await self.db.update_one({'_id': stream}, {'$set': fields}, upsert=True)
+
+
+class SuiEventStream:
+    """
+    Events of one move event type read page by page from an EventID cursor kept in ScanCheckpoint.
+
+    Pages are read at the max size back to back while the node has more, the watcher only sleeps once it has
+    caught up, longer after each empty poll. The lag behind the chain head is saved with the cursor.
+    """
+
+    def __init__(self, db, name, event_type, idle_interval=1, max_idle_interval=8):
+        self.checkpoint = ScanCheckpoint(db)
+        self.name = name
+        self.event_type = event_type
+        self.cursor = None
+        self.events = []
+        self.has_next = False
+        self.min_idle_interval = idle_interval
+        self.idle_interval = idle_interval
+        self.max_idle_interval = max_idle_interval
+        self.lag_checkpoints = 0
+        self.lag_seconds = 0
+
+    async def load(self, default_cursor=None):
+        """Restore the saved cursor, default_cursor before the first save"""
+        saved = await self.checkpoint.get(self.name)
+        self.cursor = saved['cursor'] if saved and 'cursor' in saved else default_cursor
+
+    async def next_page(self):
+        self.events = []
+        result = await dola_sui_init.async_query_events(self.event_type, self.cursor)
+        self.events = result['data']
+        self.has_next = bool(result['hasNextPage'])
+        return self.events
+
+    @property
+    def page_done(self):
+        return not self.events or self.cursor == self.events[-1]['id']
+
+    async def update_lag(self, event):
+        if not self.has_next and self.page_done:
+            self.lag_checkpoints = 0
+            self.lag_seconds = 0
+            return
+        self.lag_seconds = max(int(time.time()) - int(event['timestampMs']) // 1000, 0)
+        latest, tx = await asyncio.gather(
+            sui_project.async_client.sui_getLatestCheckpointSequenceNumber(),
+            sui_project.async_client.sui_getTransactionBlock(event['id']['txDigest'], {})
+        )
+        self.lag_checkpoints = max(int(latest) - int(tx.get('checkpoint', latest)), 0)
+
+    async def commit(self, event=None):
+        """
+        Move the cursor past event, by default the last event of the page.
+        Events after it are read again on the next poll.
+        """
+        if event is None:
+            if not self.events:
+                return
+            event = self.events[-1]
+        self.cursor = event['id']
+        try:
+            await self.update_lag(event)
+        except Exception as e:
+            logger.warning(f"Update {self.name} lag failed: {e}")
+        await self.checkpoint.set(self.name, cursor=self.cursor, lag_checkpoints=self.lag_checkpoints,
+                                  lag_seconds=self.lag_seconds)
+
+    async def idle(self):
+        """
+        Go on at once while a fully committed page says more events are waiting. Otherwise sleep: briefly after
+        a page left unfinished, backing off while polls come back empty.
+        """
+        interval = self.idle_interval
+        if self.events:
+            self.idle_interval = interval = self.min_idle_interval
+            if self.has_next and self.page_done:
+                return
+        else:
+            self.idle_interval = min(interval * 2, self.max_idle_interval)
+        await asyncio.sleep(interval)
+
+
+class WormholeVaaFetcher:
+    """
+    Signed vaa lookups shared by every watcher of the process.
+
+    Concurrent lookups of one (chain, emitter, sequence) share a single poll, polls back off
+    exponentially until their deadline and move to the next guardian api after every failed
+    attempt. Signed vaas are kept in SignedVaa, so restarts and repeated lookups never fetch
+    them again.
+    """
+
+    def __init__(self, db, http: httpx.AsyncClient, max_concurrency=32):
+        network_config = sui_project.network_config
+        self.endpoints = network_config.get('wormhole_urls') or [network_config['wormhole_url']]
+        self.endpoint = 0
+        self.http = http
+        self.cache = db['SignedVaa']
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.inflight = {}
+
+    @staticmethod
+    def key(emitter, sequence, src_net):
+        return config.NET_TO_WORMHOLE_CHAIN_ID[src_net], dola_sui_init.format_emitter_address(emitter), int(sequence)
+
+    async def load(self, key):
+        try:
+            document = await self.cache.find_one({'_id': "/".join(map(str, key))})
+        except PyMongoError as e:
+            logger.warning(f"Read signed vaa cache failed: {e}")
+            return None
+        return f"0x{bytes(document['vaa']).hex()}" if document else None
+
+    async def save(self, key, vaa):
+        try:
+            await self.cache.update_one(
+                {'_id': "/".join(map(str, key))},
+                {'$setOnInsert': {'vaa': Binary(bytes.fromhex(vaa.replace('0x', ''))),
+                                  'created_at': datetime.datetime.utcnow()}},
+                upsert=True)
+        except PyMongoError as e:
+            logger.warning(f"Write signed vaa cache failed: {e}")
+
+    async def request(self, key):
+        """One attempt against the current guardian api, None while the vaa is not signed"""
+        emitter_chain_id, emitter_address, sequence = key
+        url = f"{self.endpoints[self.endpoint]}/v1/signed_vaa/{emitter_chain_id}/{emitter_address}/{sequence}"
+        try:
+            async with self.semaphore:
+                response = await self.http.get(url)
+            data = response.json()
+            if 'vaaBytes' in data:
+                return f"0x{base64.b64decode(data['vaaBytes']).hex()}"
+        except (httpx.HTTPError, ValueError):
+            pass
+        self.endpoint = (self.endpoint + 1) % len(self.endpoints)
+        return None
+
+    async def poll(self, key, deadline):
+        loop = asyncio.get_running_loop()
+        expire = loop.time() + deadline
+        interval = VAA_FETCH_MIN_INTERVAL
+        while True:
+            vaa = await self.request(key)
+            if vaa is not None:
+                await self.save(key, vaa)
+                return vaa
+            if loop.time() + interval > expire:
+                raise VaaNotFound(f"Signed vaa {'/'.join(map(str, key))} not found")
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, VAA_FETCH_MAX_INTERVAL)
+
+    def spawn(self, key, deadline):
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.poll(key, deadline))
+            self.inflight[key] = task
+
+            def done(finished):
+                self.inflight.pop(key, None)
+                if not finished.cancelled():
+                    # Retrieved here so a prefetch nobody awaits does not log an unhandled error
+                    finished.exception()
+
+            task.add_done_callback(done)
+        return task
+
+    async def get(self, emitter, sequence, src_net, deadline=60):
+        """:return: the signed vaa as hex, raises VaaNotFound after deadline seconds"""
+        key = self.key(emitter, sequence, src_net)
+        vaa = await self.load(key)
+        if vaa is not None:
+            return vaa
+        return await asyncio.shield(self.spawn(key, deadline))
+
+    def prefetch(self, emitter, sequences, src_net, deadline=60):
+        """Start polling sequences in the background, later get calls join the polls"""
+        for sequence in sequences:
+            self.spawn(self.key(emitter, sequence, src_net), deadline)
+
+
+# Also parse every vaa with the wormhole contract of its chain and compare the payloads
+CROSS_CHECK_VAA_ON_CHAIN = False
+
+
+async def verify_vaa_payload(guardian_sets: GuardianSetCache, vaa, parse_on_chain):
+    """
+    Decode vaa and verify its guardian signatures locally, in the executor of guardian_sets.
+    :param parse_on_chain: returns an awaitable of the payload parsed on chain, used by the cross-check
+    :return: payload hex
+    """
+    payload = (await guardian_sets.verify(vaa)).payload.hex()
+    if CROSS_CHECK_VAA_ON_CHAIN:
+        payload_on_chain = str(await parse_on_chain())
+        if not check_payload_hash(payload_on_chain, payload):
+            raise ValueError(f"Vaa payload differs on chain: {payload_on_chain}")
+    return payload
+
+
+async def sui_portal_watcher(db, vaa_fetcher: WormholeVaaFetcher, guardian_sets: GuardianSetCache, reader_pool,
+                             notifier: JobNotifier, health):
     local_logger = logger.getChild("[sui_portal_watcher]")
     local_logger.info("Start to watch sui portal ^-^")
 
-    relay_record = RelayRecord()
+    relay_record = RelayRecord(db, notifier)
 
     src_chain_id = 0
 
     sui_network = sui_project.network
+    emitter = config.NET_TO_WORMHOLE_EMITTER[f'{sui_network}-pool']
 
-    # query latest tx
-    result = list(relay_record.find({'src_chain_id': src_chain_id}).sort("start_time", -1).limit(1))
-    latest_sui_tx = result[0]['src_tx_id'] if 'src_tx_id' in result[0] else ""
+    stream = SuiEventStream(db, f"{sui_network}-pool-relay", dola_sui_init.pool_relay_event_type())
+    # Before the first saved cursor, start from the latest relayed tx
+    result = await relay_record.find({'src_chain_id': src_chain_id}, {'src_tx_id': True}).sort(
+        "start_time", -1).limit(1).to_list(1)
+    latest_sui_tx = result[0]['src_tx_id'] if result and 'src_tx_id' in result[0] else ""
+    await stream.load({"txDigest": latest_sui_tx, "eventSeq": "1"} if latest_sui_tx else None)
 
     while True:
+        new_records = []
+        page_done = False
         try:
-            prev_sui_tx = latest_sui_tx
-            result = list(relay_record.find({'src_chain_id': src_chain_id}).sort("start_time", -1).limit(1))
-            latest_sui_tx = result[0]['src_tx_id'] if 'src_tx_id' in result[0] else prev_sui_tx
-            relay_events = dola_sui_init.query_pool_relay_event(latest_sui_tx)
+            relay_events = await stream.next_page()
+            recorded = await relay_record.recorded_nonces(
+                src_chain_id, [int(event['parsedJson']['nonce']) for event in relay_events])
+            unrecorded = [
+                event for event in relay_events
+                if (int(event['parsedJson']['nonce']), int(event['parsedJson']['sequence'])) not in recorded
+            ]
+            vaa_fetcher.prefetch(emitter, [int(event['parsedJson']['sequence']) for event in unrecorded], sui_network)
+            payloads = await dola_sui_lending.async_get_sui_wormhole_payloads(
+                [event['id']['txDigest'] for event in unrecorded])
 
             for event in relay_events:
                 fields = event['parsedJson']
@@ -286,21 +789,20 @@ def sui_portal_watcher(health):
                     local_logger.error(f"src_chain_nonce: {nonce}, sequence: {sequence}")
                     raise ValueError("Health check failed, sui portal watcher blocked")
 
-                if not relay_record.find_one({'src_chain_id': src_chain_id, 'nonce': nonce, 'sequence': sequence}):
+                if (nonce, sequence) not in recorded:
                     relay_fee_amount = int(fields['fee_amount'])
-                    relay_fee_value = get_fee_value(relay_fee_amount, 'sui')
+                    relay_fee_value = await asyncio.to_thread(get_fee_value, relay_fee_amount, 'sui')
 
                     timestamp_ms = int(event['timestampMs'])
                     timestamp = timestamp_ms // 1000
                     start_time = str(datetime.datetime.utcfromtimestamp(timestamp))
                     src_tx_id = event['id']['txDigest']
 
-                    emitter = config.NET_TO_WORMHOLE_EMITTER[f'{sui_network}-pool']
-                    vaa = get_signed_vaa_by_wormhole(emitter, sequence, sui_network)
-
-                    payload = dola_sui_lending.parse_vaa(vaa)
+                    vaa = await vaa_fetcher.get(emitter, sequence, sui_network)
 
-                    payload_on_chain = dola_sui_lending.get_sui_wormhole_payload(src_tx_id)
+                    payload = await verify_vaa_payload(
+                        guardian_sets, vaa, lambda: run_in_pool(reader_pool, dola_sui_lending.parse_vaa, vaa))
+                    payload_on_chain = payloads[src_tx_id]
 
                     if not check_payload_hash(str(payload), str(payload_on_chain)):
                         local_logger.error(f'payload: {payload}')
@@ -308,126 +810,145 @@ def sui_portal_watcher(health):
                         raise ValueError("The data may have been manipulated!")
 
                     if call_name in ['withdraw', 'borrow']:
-                        relay_record.add_withdraw_record(src_chain_id, src_tx_id, nonce, call_name, timestamp_ms,
-                                                         sequence, vaa, relay_fee_value, start_time)
+                        record = relay_record.withdraw_record(src_chain_id, src_tx_id, nonce, call_name,
+                                                              timestamp_ms, sequence, relay_fee_value, start_time)
                     else:
-                        relay_record.add_other_record(src_chain_id, src_tx_id, nonce, call_name, timestamp_ms,
-                                                      sequence, vaa, relay_fee_value, start_time)
+                        record = relay_record.other_record(src_chain_id, src_tx_id, nonce, call_name, timestamp_ms,
+                                                           sequence, relay_fee_value, start_time)
+                    new_records.append((record, vaa))
 
                     local_logger.info(
                         f"Have a {call_name} transaction from sui, nonce: {nonce}")
+            page_done = True
         except Exception as e:
             local_logger.error(f"Error: {e}")
-        time.sleep(3)
 
+        try:
+            await relay_record.add_records(new_records)
+            if page_done:
+                await stream.commit()
+                if stream.lag_seconds:
+                    local_logger.info(f"Lag {stream.lag_checkpoints} checkpoints, {stream.lag_seconds}s")
+        except Exception as e:
+            local_logger.error(f"Save relay records failed: {e}")
+        await stream.idle()
 
-def wormhole_vaa_guardian(network="polygon-test"):
-    dola_ethereum_sdk.set_dola_project_path(Path("../.."))
-    dola_ethereum_sdk.set_ethereum_network(network)
 
+async def wormhole_vaa_guardian(db, vaa_fetcher: WormholeVaaFetcher, guardian_sets: GuardianSetCache, eth_client,
+                                notifier: JobNotifier, network="polygon-test"):
     local_logger = logger.getChild(f"[{network}_wormhole_vaa_guardian]")
     local_logger.info("Start to wait wormhole vaa ^-^")
 
-    relay_record = RelayRecord()
+    relay_record = RelayRecord(db, notifier)
 
     src_chain_id = config.NET_TO_WORMHOLE_CHAIN_ID[network]
-    emitter_address = dola_ethereum_load.wormhole_adapter_pool_package(network).address
-    wormhole = dola_ethereum_load.womrhole_package(network)
+    emitter_address = dola_ethereum_sdk.config["networks"][network]["wormhole_adapter_pool"]["latest"]
+    wormhole = dola_ethereum_sdk.config["networks"][network]["wormhole"]
+
+    async def recover(tx):
+        try:
+            nonce = tx['nonce']
+            sequence = tx['sequence']
+            block_number = tx['block_number']
+
+            vaa = await vaa_fetcher.get(emitter_address, sequence, network, deadline=10)
+
+            # check that cross-chain data is consistent with on-chain data
+            payload, payload_on_chain = await asyncio.gather(
+                verify_vaa_payload(guardian_sets, vaa,
+                                   lambda: dola_ethereum_init.async_parse_vm_payload(eth_client, wormhole, vaa)),
+                dola_ethereum_init.async_get_payload_from_chain(eth_client, tx['src_tx_id'])
+            )
+            payload = f"0x{payload}"
+            if not check_payload_hash(str(payload), str(payload_on_chain)):
+                local_logger.error(f'payload: {payload}')
+                local_logger.error(f'payload_on_chain: {payload_on_chain}')
+                raise ValueError("The data may have been manipulated!")
+
+            message = DolaMessage.decode(payload)
+            call_name = get_call_name(message.app_id, message.call_type)
+
+            relay_fee = tx['relay_fee']
+
+            if call_name in ['withdraw', 'borrow']:
+                record = relay_record.withdraw_record(src_chain_id, tx['src_tx_id'], nonce, call_name,
+                                                      block_number, sequence, relay_fee, tx['start_time'])
+            else:
+                record = relay_record.other_record(src_chain_id, tx['src_tx_id'], nonce, call_name,
+                                                   block_number, sequence, relay_fee, tx['start_time'])
+            await relay_record.add_records([(record, vaa)])
+
+            current_timestamp = int(time.time())
+            date = str(datetime.datetime.fromtimestamp(current_timestamp))
+            await relay_record.update_record(
+                {'_id': tx['_id']},
+                {'$set': {'status': 'dropped', 'end_time': date, 'completed_at': datetime.datetime.utcnow()}})
+            local_logger.info(
+                f"Have a {call_name} transaction from {network}, sequence: {nonce}")
+        except Exception as e:
+            local_logger.warning(f"Error: {e}")
 
     while True:
         try:
-            wait_vaa_txs = list(relay_record.find({'status': 'waitForVaa', 'src_chain_id': src_chain_id}).sort(
-                "block_number", 1))
+            wait_vaa_txs = await relay_record.find(
+                {'status': 'waitForVaa', 'src_chain_id': src_chain_id},
+                {'nonce': True, 'sequence': True, 'block_number': True, 'src_tx_id': True, 'relay_fee': True,
+                 'start_time': True}
+            ).sort("block_number", 1).to_list(None)
         except Exception as e:
             local_logger.warning(f"relay record find failed! {e}")
+            await asyncio.sleep(5)
             continue
 
-        for tx in wait_vaa_txs:
-            try:
-                nonce = tx['nonce']
-                sequence = tx['sequence']
-                block_number = tx['block_number']
-
-                vaa = get_signed_vaa_by_wormhole(
-                    emitter_address, sequence, network)
-
-                vm = wormhole.parseVM(vaa)
-                # parse payload
-                payload = list(vm)[7]
-
-                # check that cross-chain data is consistent with on-chain data
-                payload_on_chain = dola_ethereum_init.get_payload_from_chain(tx['src_tx_id'])
-                if not check_payload_hash(str(payload), str(payload_on_chain)):
-                    local_logger.error(f'payload: {payload}')
-                    local_logger.error(f'payload_on_chain: {payload_on_chain}')
-                    raise ValueError("The data may have been manipulated!")
-
-                app_id = payload[1]
-                call_type = payload[-1]
-                call_name = get_call_name(app_id, call_type)
-
-                relay_fee = tx['relay_fee']
-
-                if call_name in ['withdraw', 'borrow']:
-                    relay_record.add_withdraw_record(src_chain_id, tx['src_tx_id'], nonce, call_name, block_number,
-                                                     sequence, vaa,
-                                                     relay_fee, tx['start_time'])
-                else:
-                    relay_record.add_other_record(src_chain_id, tx['src_tx_id'], nonce, call_name, block_number,
-                                                  sequence, vaa,
-                                                  relay_fee, tx['start_time'])
-
-                current_timestamp = int(time.time())
-                date = str(datetime.datetime.fromtimestamp(current_timestamp))
-                relay_record.update_record({'status': 'waitForVaa', 'src_chain_id': src_chain_id, 'nonce': nonce},
-                                           {'$set': {'status': 'dropped', 'end_time': date}})
-                local_logger.info(
-                    f"Have a {call_name} transaction from {network}, sequence: {nonce}")
-            except Exception as e:
-                local_logger.warning(f"Error: {e}")
-        time.sleep(5)
-
+        # Wait for all missing vaas at once
+        await asyncio.gather(*(recover(tx) for tx in wait_vaa_txs))
+        await asyncio.sleep(5)
 
-def eth_portal_watcher(health, network="polygon-test"):
-    dola_ethereum_sdk.set_dola_project_path(Path("../.."))
-    dola_ethereum_sdk.set_ethereum_network(network)
 
+async def eth_portal_watcher(db, vaa_fetcher: WormholeVaaFetcher, guardian_sets: GuardianSetCache, eth_client,
+                             notifier: JobNotifier, health, network="polygon-test"):
     local_logger = logger.getChild(f"[{network}_portal_watcher]")
     local_logger.info(f"Start to read {network} pool vaa ^-^")
 
-    relay_record = RelayRecord()
+    relay_record = RelayRecord(db, notifier)
 
+    network_config = dola_ethereum_sdk.config["networks"][network]
     src_chain_id = config.NET_TO_WORMHOLE_CHAIN_ID[network]
-    wormhole = dola_ethereum_load.womrhole_package(network)
-    emitter_address = dola_ethereum_load.wormhole_adapter_pool_package(network).address
-    lending_portal = dola_ethereum_load.lending_portal_package(network).address
-    system_portal = dola_ethereum_load.system_portal_package(network).address
-
-    external_endpoint = brownie.web3.provider.endpoint_uri
-
-    w3_client = dola_ethereum_init.fallback_endpoints_web3(network, [external_endpoint])
-
-    # graphql_url = dola_ethereum_init.graphql_url(network)
-    # transport = AIOHTTPTransport(url=graphql_url)
-    #
-    # # Create a GraphQL client using the defined transport
-    # client = Client(transport=transport, fetch_schema_from_transport=True)
-
-    # query latest block number
-    result = list(relay_record.find({'src_chain_id': src_chain_id}).sort("block_number", -1).limit(1))
-    latest_relay_block_number = result[0]['block_number'] if result else 0
+    wormhole = network_config["wormhole"]
+    emitter_address = network_config["wormhole_adapter_pool"]["latest"]
+    lending_portal = network_config["lending_portal"]
+    system_portal = network_config["system_portal"]
+
+    confirmations = config.NETWORK_TO_CONFIRMATIONS.get(network, 0)
+    scanner = dola_ethereum_init.relay_log_scanner(eth_client, lending_portal, system_portal, wormhole,
+                                                   emitter_address)
+    checkpoint = ScanCheckpoint(db)
+
+    # Resume from the checkpoint, or from the latest relay record before the first checkpoint is saved
+    checkpoint_block = (await checkpoint.get(network) or {}).get('block_number')
+    if checkpoint_block is None:
+        result = await relay_record.find({'src_chain_id': src_chain_id}, {'block_number': True}).sort(
+            "block_number", -1).limit(1).to_list(1)
+        checkpoint_block = result[0]['block_number'] - 1 if result else \
+            await eth_client.block_number() - confirmations
 
     while True:
+        new_records = []
+        scanned = None
+        caught_up = True
         try:
-            result = list(relay_record.find({'src_chain_id': src_chain_id}).sort("block_number", -1).limit(1))
-            latest_relay_block_number = result[0]['block_number'] if result else latest_relay_block_number
-
-            if network == 'base-main':
-                latest_relay_block_number = w3_client.eth.get_block_number() - 500
-
-            # query relay events from latest relay block number + 1 to actual latest block number
-            relay_events = dola_ethereum_init.query_relay_event_by_get_logs(w3_client, lending_portal, system_portal,
-                                                                            latest_relay_block_number)
+            head = await eth_client.block_number()
+
+            # Blocks after the checkpoint are scanned again until they are confirmed, the recorded nonces
+            # filter out the events already relayed and events moved by a reorg are picked up again
+            relay_events, scanned_to = await dola_ethereum_init.async_scan_relay_events(
+                scanner, checkpoint_block + 1, head)
+            recorded = await relay_record.recorded_nonces(
+                src_chain_id, [int(event['nonce']) for event in relay_events])
+            vaa_fetcher.prefetch(emitter_address, [
+                int(event['sequence']) for event in relay_events
+                if (int(event['nonce']), int(event['sequence'])) not in recorded
+            ], network, deadline=30)
 
             for event in relay_events:
                 nonce = int(event['nonce'])
@@ -438,13 +959,7 @@ def eth_portal_watcher(health, network="polygon-test"):
                     raise ValueError(f"health check failed, {network} portal watcher blocked")
 
                 # check if the event has been recorded
-                if not list(relay_record.find(
-                        {
-                            'src_chain_id': src_chain_id,
-                            'nonce': nonce,
-                            "sequence": sequence,
-                        }
-                )):
+                if (nonce, sequence) not in recorded:
                     block_number = int(event['blockNumber'])
                     src_tx_id = event['transactionHash']
                     timestamp = int(event['blockTimestamp'])
@@ -456,97 +971,122 @@ def eth_portal_watcher(health, network="polygon-test"):
                     start_time = str(datetime.datetime.utcfromtimestamp(timestamp))
 
                     gas_token = get_gas_token(network)
-                    relay_fee_value = get_fee_value(relay_fee_amount, gas_token)
+                    relay_fee_value = await asyncio.to_thread(get_fee_value, relay_fee_amount, gas_token)
 
                     # get vaa
                     try:
-                        vaa = get_signed_vaa_by_wormhole(
-                            emitter_address, sequence, network)
+                        vaa = await vaa_fetcher.get(emitter_address, sequence, network, deadline=30)
                     except Exception as e:
-                        relay_record.add_wait_record(src_chain_id, src_tx_id, nonce, sequence, block_number,
-                                                     relay_fee_value,
-                                                     start_time)
+                        new_records.append((relay_record.wait_record(src_chain_id, src_tx_id, nonce, sequence,
+                                                                     block_number, relay_fee_value, start_time),
+                                            None))
                         local_logger.warning(f"Warning: {e}")
                         continue
-                    # parse vaa
-
-                    vm = wormhole.parseVM(vaa)
-                    # parse payload
-                    payload = list(vm)[7]
 
-                    # check that cross-chain data is consistent with on-chain data
-                    payload_on_chain = dola_ethereum_init.get_payload_from_chain(src_tx_id)
+                    # check that cross-chain data is consistent with on-chain data, the message published by
+                    # the transaction comes from the same scan
+                    payload = await verify_vaa_payload(
+                        guardian_sets, vaa, lambda: dola_ethereum_init.async_parse_vm_payload(eth_client, wormhole, vaa))
+                    payload = f"0x{payload}"
+                    payload_on_chain = event['payload'] or \
+                        await dola_ethereum_init.async_get_payload_from_chain(eth_client, src_tx_id)
                     if not check_payload_hash(str(payload), str(payload_on_chain)):
                         local_logger.error(f'payload: {payload}')
                         local_logger.error(f'payload_on_chain: {payload_on_chain}')
                         raise ValueError("The data may have been manipulated!")
 
                     if call_name in ['withdraw', 'borrow']:
-                        relay_record.add_withdraw_record(src_chain_id, src_tx_id, nonce, call_name, block_number,
-                                                         sequence, vaa, relay_fee_value, start_time)
+                        record = relay_record.withdraw_record(src_chain_id, src_tx_id, nonce, call_name,
+                                                              block_number, sequence, relay_fee_value, start_time)
                     else:
-                        relay_record.add_other_record(src_chain_id, src_tx_id, nonce, call_name, block_number,
-                                                      sequence, vaa, relay_fee_value, start_time)
+                        record = relay_record.other_record(src_chain_id, src_tx_id, nonce, call_name, block_number,
+                                                           sequence, relay_fee_value, start_time)
+                    new_records.append((record, vaa))
 
                     local_logger.info(
                         f"Have a {call_name} transaction from {network}, sequence: {sequence}")
-        except asyncio.exceptions.TimeoutError:
-            local_logger.warning("GraphQL request timeout")
+            scanned = min(scanned_to, head - confirmations)
+            caught_up = scanned_to >= head
+        except asyncio.TimeoutError:
+            local_logger.warning("Request timeout")
         except Exception as e:
             local_logger.error(f"Error: {e}")
-        finally:
-            time.sleep(2)
 
+        try:
+            await relay_record.add_records(new_records)
+            # Only move past blocks whose events are all saved
+            if scanned is not None and scanned > checkpoint_block:
+                checkpoint_block = scanned
+                await checkpoint.set(network, block_number=checkpoint_block)
+        except Exception as e:
+            local_logger.error(f"Save relay records failed: {e}")
+        if caught_up:
+            await asyncio.sleep(2)
 
-def pool_withdraw_watcher(health):
-    dola_sui_sdk.set_dola_project_path(Path("../.."))
+
+async def pool_withdraw_watcher(db, vaa_fetcher: WormholeVaaFetcher, guardian_sets: GuardianSetCache, reader_pool,
+                                notifier: JobNotifier, health):
     local_logger = logger.getChild("[pool_withdraw_watcher]")
     local_logger.info("Start to read withdraw vaa ^-^")
 
-    relay_record = RelayRecord()
+    relay_record = RelayRecord(db, notifier)
 
     sui_network = sui_project.network
 
-    # query latest core tx
-    result = list(
-        relay_record.find({"withdraw_tx_id": {"$exists": 1}, 'core_tx_id': {"$ne": ""}, 'status': 'success'})
-        .sort("start_time", -1).limit(1))
-    latest_sui_tx = result[0]['core_tx_id']
+    latest_core_filter = {"withdraw_tx_id": {"$exists": 1}, 'core_tx_id': {"$ne": ""}, 'status': 'success'}
+
+    stream = SuiEventStream(db, f"{sui_network}-core-relay", dola_sui_init.core_relay_event_type())
+    # Before the first saved cursor, start from the latest withdrawn core tx
+    result = await relay_record.find(latest_core_filter, {'core_tx_id': True}).sort(
+        "start_time", -1).limit(1).to_list(1)
+    latest_sui_tx = result[0]['core_tx_id'] if result else ""
+    await stream.load({"txDigest": latest_sui_tx, "eventSeq": "1"} if latest_sui_tx else None)
 
     while True:
         try:
-            prev_sui_tx = latest_sui_tx
-            result = list(
-                relay_record.find({"withdraw_tx_id": {"$exists": 1}, 'core_tx_id': {"$ne": ""}, 'status': 'success'})
-                .sort("start_time", -1).limit(1))
-            latest_sui_tx = result[0]['core_tx_id'] if result else prev_sui_tx
-            relay_events = dola_sui_init.query_core_relay_event(latest_sui_tx)
+            relay_events = await stream.next_page()
 
-            for event in relay_events:
+            # Look up the records and the wormhole payloads of the whole page at once
+            event_keys = [
+                (int(event['parsedJson']['source_chain_id']), int(event['parsedJson']['source_chain_nonce']))
+                for event in relay_events
+            ]
+            records = await relay_record.find(
+                {'status': {'$in': ['false', 'waitForWithdraw']},
+                 '$or': [{'src_chain_id': src_chain_id, 'nonce': nonce} for src_chain_id, nonce in event_keys]},
+                {'src_chain_id': True, 'nonce': True, 'status': True}
+            ).to_list(None) if relay_events else []
+            records = {(record['src_chain_id'], record['nonce']): record for record in records}
+            payloads = await dola_sui_lending.async_get_sui_wormhole_payloads([
+                event['id']['txDigest'] for event, key in zip(relay_events, event_keys)
+                if key in records and records[key]['status'] == 'waitForWithdraw'])
+
+            processed = None
+            for event, (source_chain_id, source_chain_nonce) in zip(relay_events, event_keys):
                 fields = event['parsedJson']
 
-                source_chain_id = int(fields['source_chain_id'])
-                source_chain_nonce = int(fields['source_chain_nonce'])
-
                 if not health.value:
                     local_logger.error(
                         f"Processing src_chain_id: {source_chain_id}, source_chain_nonce: {source_chain_nonce}")
                     raise ValueError("health check failed, withdraw watcher blocked")
 
-                if relay_record.find_one(
-                        {'src_chain_id': source_chain_id, 'nonce': source_chain_nonce, 'status': 'waitForWithdraw'}):
+                wait_record = records.get((source_chain_id, source_chain_nonce))
+                # The core tx landed but its executor has not marked the record yet, keep the cursor before it
+                if wait_record and wait_record['status'] == 'false':
+                    break
+                if wait_record:
                     call_type = fields["call_type"]
                     call_name = get_call_name(1, int(call_type))
                     src_network = get_dola_network(source_chain_id)
                     sequence = int(fields['sequence'])
 
                     emitter = config.NET_TO_WORMHOLE_EMITTER[sui_network]
-                    vaa = get_signed_vaa_by_wormhole(emitter, sequence, sui_network)
+                    vaa = await vaa_fetcher.get(emitter, sequence, sui_network)
 
                     # check that cross-chain data is consistent with on-chain data
-                    payload = dola_sui_lending.parse_vaa(vaa)
-
-                    payload_on_chain = dola_sui_lending.get_sui_wormhole_payload(event['id']['txDigest'])
+                    payload = await verify_vaa_payload(
+                        guardian_sets, vaa, lambda: run_in_pool(reader_pool, dola_sui_lending.parse_vaa, vaa))
+                    payload_on_chain = payloads[event['id']['txDigest']]
 
                     if not check_payload_hash(str(payload), str(payload_on_chain)):
                         local_logger.error(f'payload: {payload}')
@@ -560,231 +1100,293 @@ def pool_withdraw_watcher(health):
                     else:
                         dst_pool_address = f"0x{bytes(dst_pool['dola_address']).hex()}"
 
-                    relay_record.update_record({'src_chain_id': source_chain_id, 'nonce': source_chain_nonce},
-                                               {"$set": {'status': 'withdraw', 'withdraw_vaa': vaa,
-                                                         'withdraw_chain_id': dst_chain_id,
-                                                         'withdraw_sequence': sequence,
-                                                         'withdraw_pool': dst_pool_address}})
+                    withdraw_vaa_hash = await relay_record.save_vaa(vaa)
+                    await relay_record.update_record({'_id': wait_record['_id']},
+                                                     {"$set": {'status': 'withdraw',
+                                                               'withdraw_vaa_hash': withdraw_vaa_hash,
+                                                               'withdraw_chain_id': dst_chain_id,
+                                                               'withdraw_sequence': sequence,
+                                                               'withdraw_pool': dst_pool_address}})
 
                     local_logger.info(
                         f"Have a {call_name} from {src_network} to {get_dola_network(dst_chain_id)}, nonce: {source_chain_nonce}")
+                processed = event
+
+            if processed is not None:
+                await stream.commit(processed)
+                if stream.lag_seconds:
+                    local_logger.info(f"Lag {stream.lag_checkpoints} checkpoints, {stream.lag_seconds}s")
         except Exception as e:
             traceback.print_exc()
             local_logger.error(f"Error: {e}")
-        time.sleep(1)
-
+        await stream.idle()
 
-def sui_core_executor(relayer_account, divisor=1, remainder=0):
-    dola_sui_sdk.set_dola_project_path(Path("../.."))
-    sui_project.active_account(relayer_account)
 
-    local_logger = logger.getChild(f"[sui_core_executor_{remainder}]")
+async def sui_core_executor(db, pool, notifier: JobNotifier, relayer_account):
+    local_logger = logger.getChild(f"[sui_core_executor_{relayer_account}]")
     local_logger.info("Start to relay pool vaa ^-^")
 
-    relay_record = RelayRecord()
-    gas_record = GasRecord()
+    relay_record = RelayRecord(db, notifier)
+    gas_record = GasRecord(db)
+
+    relayer_address = sui_project.accounts[relayer_account].account_address
+    owner = lease_owner(relayer_account)
+    batch_filter = {"status": "false", "call_name": {"$in": list(dola_sui_lending.CORE_BATCH_CALLS)}}
 
     while True:
         try:
-            relay_transactions = relay_record.find({"status": "false", "nonce": {"$mod": [divisor, remainder]}})
+            tx = await relay_record.claim({"status": "false"}, owner)
+            txs = [tx] if tx is not None else []
+            # Relay other pending vaas in the same transaction
+            if tx is not None and tx['call_name'] in dola_sui_lending.CORE_BATCH_CALLS:
+                txs += await relay_record.claim_more(batch_filter, owner, SUI_RELAY_BATCH_SIZE - 1)
         except Exception as e:
-            local_logger.warning(f"relay record find failed! {e}")
+            local_logger.warning(f"relay record claim failed! {e}")
+            await asyncio.sleep(1)
+            continue
+
+        if not txs:
+            await notifier.wait()
             continue
 
-        for tx in relay_transactions:
+        async with relay_record.lease_all(txs, owner):
             try:
-                relay_fee_value = tx['relay_fee']
-                relay_fee = get_fee_amount(relay_fee_value)
-                call_name = tx['call_name']
+                vaas = [await relay_record.load_vaa(tx) for tx in txs]
+                relay_fees = [await asyncio.to_thread(get_fee_amount, tx['relay_fee']) for tx in txs]
 
                 # check relayer balance
-                if sui_total_balance() < int(1e9):
+                if await sui_total_balance(relayer_address) < int(1e9):
                     local_logger.warning(
-                        f"Relayer balance is not enough, need {relay_fee_value} sui")
-                    time.sleep(5)
+                        f"Relayer balance is not enough, need {sum(tx['relay_fee'] for tx in txs)} sui")
+                    await asyncio.sleep(5)
                     continue
 
                 # If no gas record exists, relay once for free.
                 fee_rate = 0
-                if not list(gas_record.find(
-                        {'src_chain_id': tx['src_chain_id'], 'dst_chain_id': 0, 'call_name': call_name})):
-                    fee_rate = 0
-
-                gas, executed, status, feed_nums, digest = execute_sui_core(
-                    call_name, tx['vaa'], relay_fee, fee_rate)
-
-                # Relay not existent feed_num tx for free.
-                if not executed and not list(gas_record.find(
-                        {'src_chain_id': tx['src_chain_id'], 'dst_chain_id': 0, 'call_name': call_name,
-                         'feed_nums': feed_nums})):
-                    fee_rate = 0
-                    gas, executed, status, feed_nums, digest = execute_sui_core(
-                        call_name, tx['vaa'], relay_fee, fee_rate)
-
-                gas_price = int(
-                    sui_project.client.suix_getReferenceGasPrice())
-                gas_limit = int(gas / gas_price)
-
-                gas_record.add_gas_record(tx['src_chain_id'], tx['nonce'], 0, call_name, gas_limit, feed_nums)
-                core_costed_fee = get_fee_value(gas, 'sui')
-
-                if executed and status == 'success':
-                    relay_fee_value = get_fee_value(relay_fee, 'sui')
-
-                    timestamp = int(time.time())
-                    date = str(datetime.datetime.utcfromtimestamp(timestamp))
-                    if call_name in ["withdraw", "borrow"]:
-                        relay_record.update_record({'vaa': tx['vaa']},
-                                                   {"$set": {'relay_fee': relay_fee_value,
-                                                             'status': 'waitForWithdraw',
-                                                             'end_time': date,
-                                                             'core_tx_id': digest,
-                                                             'core_costed_fee': core_costed_fee}})
-                    else:
-                        relay_record.update_record({'vaa': tx['vaa']},
-                                                   {"$set": {'relay_fee': relay_fee_value, 'status': 'success',
-                                                             'core_tx_id': digest,
-                                                             'core_costed_fee': core_costed_fee,
-                                                             'end_time': date}})
-                    local_logger.info("Execute sui core success! ")
-                    local_logger.info(f"relay fee: {relay_fee_value} USD, consumed fee: {core_costed_fee} USD")
+
+                if txs[0]['call_name'] not in dola_sui_lending.CORE_BATCH_CALLS:
+                    tx = txs[0]
+                    call_name = tx['call_name']
+                    results = [await run_in_pool(
+                        pool, execute_sui_core, call_name, vaas[0], relay_fees[0], fee_rate)]
+                    gas, executed, status, feed_nums, digest = results[0]
+
+                    # Relay not existent feed_num tx for free.
+                    if not executed and not await gas_record.find_one(
+                            {'src_chain_id': tx['src_chain_id'], 'dst_chain_id': 0, 'call_name': call_name,
+                             'feed_nums': feed_nums}):
+                        fee_rate = 0
+                        results = [await run_in_pool(
+                            pool, execute_sui_core, call_name, vaas[0], relay_fees[0], fee_rate)]
                 else:
-                    relay_record.update_record({'vaa': tx['vaa']},
-                                               {"$set": {'status': 'fail', 'reason': status}})
-                    local_logger.warning("Execute sui core fail! ")
-                    local_logger.warning(f"relay fee: {relay_fee_value} USD, consumed fee: {core_costed_fee} USD")
-                    local_logger.warning(f"status: {status}")
+                    # Prices are fed inside the relay transaction
+                    local_logger.info(f"Relay {len(txs)} vaas in one transaction")
+                    results = await run_in_pool(
+                        pool, dola_sui_lending.core_batch,
+                        [(tx['call_name'], vaa) for tx, vaa in zip(txs, vaas)], relay_fees, fee_rate)
+
+                gas_price = int(await sui_project.async_client.suix_getReferenceGasPrice())
+                for tx, relay_fee, result in zip(txs, relay_fees, results):
+                    await record_sui_core_result(local_logger, relay_record, gas_record, tx, relay_fee, gas_price,
+                                                 *result)
             except AssertionError as e:
-                # status = eval(str(e))
-                relay_record.update_record({'vaa': tx['vaa']},
-                                           {"$set": {'status': 'fail', 'reason': str(e)}})
+                for tx in txs:
+                    await relay_record.update_record({'_id': tx['_id']},
+                                                     {"$set": {'status': 'fail', 'reason': str(e)}})
                 local_logger.warning("Execute sui core fail! ")
                 local_logger.warning(f"status: {str(e)}")
             except Exception as e:
                 traceback.print_exc()
                 local_logger.error(f"Execute sui core fail\n {e}")
-        time.sleep(1)
+                for tx in txs:
+                    await relay_record.defer(tx['_id'], owner)
+
+
+async def record_sui_core_result(local_logger, relay_record, gas_record, tx, relay_fee, gas_price,
+                                 gas, executed, status, feed_nums, digest):
+    call_name = tx['call_name']
+    relay_fee_value = tx['relay_fee']
+    gas_limit = int(gas / gas_price)
+
+    await gas_record.add_gas_record(tx['src_chain_id'], tx['nonce'], 0, call_name, gas_limit, feed_nums)
+    core_costed_fee = await asyncio.to_thread(get_fee_value, gas, 'sui')
+
+    if executed and status == 'success':
+        relay_fee_value = await asyncio.to_thread(get_fee_value, relay_fee, 'sui')
+
+        timestamp = int(time.time())
+        date = str(datetime.datetime.utcfromtimestamp(timestamp))
+        if call_name in ["withdraw", "borrow"]:
+            await relay_record.update_record({'_id': tx['_id']},
+                                             {"$set": {'relay_fee': relay_fee_value,
+                                                       'status': 'waitForWithdraw',
+                                                       'end_time': date,
+                                                       'core_tx_id': digest,
+                                                       'core_costed_fee': core_costed_fee}})
+        else:
+            await relay_record.update_record({'_id': tx['_id']},
+                                             {"$set": {'relay_fee': relay_fee_value, 'status': 'success',
+                                                       'core_tx_id': digest,
+                                                       'core_costed_fee': core_costed_fee,
+                                                       'end_time': date,
+                                                       'completed_at': datetime.datetime.utcnow()}})
+        local_logger.info("Execute sui core success! ")
+        local_logger.info(f"relay fee: {relay_fee_value} USD, consumed fee: {core_costed_fee} USD")
+    else:
+        await relay_record.update_record({'_id': tx['_id']},
+                                         {"$set": {'status': 'fail', 'reason': status}})
+        local_logger.warning("Execute sui core fail! ")
+        local_logger.warning(f"relay fee: {relay_fee_value} USD, consumed fee: {core_costed_fee} USD")
+        local_logger.warning(f"status: {status}")
 
 
-def sui_pool_executor(relayer_account):
-    dola_sui_sdk.set_dola_project_path(Path("../.."))
-    sui_project.active_account(relayer_account)
-
+async def sui_pool_executor(db, pool, notifier: JobNotifier, relayer_account):
     local_logger = logger.getChild("[sui_pool_executor]")
     local_logger.info("Start to relay sui withdraw vaa ^-^")
 
-    relay_record = RelayRecord()
-    gas_record = GasRecord()
+    relay_record = RelayRecord(db, notifier)
+    gas_record = GasRecord(db)
+
+    relayer_address = sui_project.accounts[relayer_account].account_address
+    owner = lease_owner(relayer_account)
+    withdraw_filter = {"status": "withdraw", "withdraw_chain_id": 0}
 
     while True:
         try:
-            relay_transactions = relay_record.find(
-                {"status": "withdraw", "withdraw_chain_id": 0})
+            withdraw_txs = await relay_record.claim_more(withdraw_filter, owner, SUI_RELAY_BATCH_SIZE)
         except Exception as e:
-            local_logger.warning(f"relay record find failed! {e}")
+            local_logger.warning(f"relay record claim failed! {e}")
+            await asyncio.sleep(3)
             continue
 
-        for withdraw_tx in relay_transactions:
-            try:
-                core_costed_fee = (
-                    withdraw_tx['core_costed_fee']
-                    if "core_costed_fee" in withdraw_tx
-                    else 0
-                )
-                relay_fee_value = withdraw_tx['relay_fee'] - core_costed_fee
-
-                available_gas_amount = get_fee_amount(relay_fee_value, 'sui')
+        if not withdraw_txs:
+            await notifier.wait()
+            continue
 
-                source_chain_id = withdraw_tx['src_chain_id']
-                source_nonce = withdraw_tx['nonce']
-                token_name = withdraw_tx['withdraw_pool']
-                vaa = withdraw_tx['withdraw_vaa']
+        async with relay_record.lease_all(withdraw_txs, owner):
+            try:
+                vaas = [await relay_record.load_vaa(withdraw_tx, 'withdraw_vaa') for withdraw_tx in withdraw_txs]
 
                 # check relayer balance
-                if sui_total_balance() < int(1e9):
-                    local_logger.warning(
-                        f"Relayer balance is not enough, need {relay_fee_value} sui")
-                    time.sleep(5)
+                if await sui_total_balance(relayer_address) < int(1e9):
+                    local_logger.warning("Relayer balance is not enough")
+                    await asyncio.sleep(5)
                     continue
 
-                gas_used, executed, status, digest = dola_sui_lending.pool_withdraw(
-                    vaa, token_name)
+                if len(withdraw_txs) == 1:
+                    results = [await run_in_pool(
+                        pool, dola_sui_lending.pool_withdraw, vaas[0], withdraw_txs[0]['withdraw_pool'])]
+                else:
+                    local_logger.info(f"Relay {len(withdraw_txs)} withdraw vaas in one transaction")
+                    results = await run_in_pool(
+                        pool, dola_sui_lending.pool_withdraw_batch,
+                        [(vaa, withdraw_tx['withdraw_pool']) for withdraw_tx, vaa in zip(withdraw_txs, vaas)])
+
+                gas_price = int(await sui_project.async_client.suix_getReferenceGasPrice())
+                for withdraw_tx, result in zip(withdraw_txs, results):
+                    await record_sui_withdraw_result(local_logger, relay_record, gas_record, withdraw_tx, gas_price,
+                                                     *result)
+            except Exception as e:
+                traceback.print_exc()
+                local_logger.error(f"Execute sui pool withdraw fail\n {e}")
+                for withdraw_tx in withdraw_txs:
+                    await relay_record.defer(withdraw_tx['_id'], owner)
+
 
-                if executed:
-                    timestamp = int(time.time())
-                    tx_gas_amount = gas_used
+async def record_sui_withdraw_result(local_logger, relay_record, gas_record, withdraw_tx, gas_price,
+                                     gas_used, executed, status, digest):
+    core_costed_fee = (
+        withdraw_tx['core_costed_fee']
+        if "core_costed_fee" in withdraw_tx
+        else 0
+    )
+    relay_fee_value = withdraw_tx['relay_fee'] - core_costed_fee
+
+    source_chain_id = withdraw_tx['src_chain_id']
+    source_nonce = withdraw_tx['nonce']
+    token_name = withdraw_tx['withdraw_pool']
+
+    if executed:
+        available_gas_amount = await asyncio.to_thread(get_fee_amount, relay_fee_value, 'sui')
+        timestamp = int(time.time())
+        tx_gas_amount = gas_used
+
+        gas_limit = int(tx_gas_amount / gas_price)
+        await gas_record.update_record({'src_chain_id': source_chain_id, 'nonce': source_nonce},
+                                       {"$set": {'withdraw_gas': gas_limit, 'dst_chain_id': 0}})
+
+        withdraw_cost_fee = await asyncio.to_thread(get_fee_value, tx_gas_amount, 'sui')
+
+        date = str(datetime.datetime.utcfromtimestamp(timestamp))
+        await relay_record.update_record({'_id': withdraw_tx['_id']},
+                                         {"$set": {'status': 'success',
+                                                   'withdraw_cost_fee': withdraw_cost_fee,
+                                                   'end_time': date, 'withdraw_tx_id': digest,
+                                                   'completed_at': datetime.datetime.utcnow()}})
+
+        local_logger.info("Execute sui withdraw success! ")
+        local_logger.info(
+            f"token: {token_name} source_chain: {source_chain_id} nonce: {source_nonce}")
+        local_logger.info(
+            f"relay fee: {relay_fee_value} USD, consumed fee: {withdraw_cost_fee} USD")
+        if available_gas_amount < tx_gas_amount:
+            call_name = withdraw_tx['call_name']
+            local_logger.warning(
+                "Execute withdraw fail on sui, not enough relay fee! ")
+            local_logger.warning(
+                f"Need gas fee: {withdraw_cost_fee} USD, but available gas fee: {relay_fee_value} USD"
+            )
+            local_logger.warning(
+                f"call: {call_name} source_chain: {source_chain_id}, nonce: {source_nonce}")
+    else:
+        await relay_record.update_record({'_id': withdraw_tx['_id']},
+                                         {"$set": {'status': 'fail',
+                                                   'reason': status}})
+        local_logger.warning("Execute sui core fail! ")
+        local_logger.warning(f"status: {status}")
 
-                    gas_price = int(
-                        sui_project.client.suix_getReferenceGasPrice())
-                    gas_limit = int(tx_gas_amount / gas_price)
-                    gas_record.update_record({'src_chain_id': source_chain_id, 'nonce': source_nonce},
-                                             {"$set": {'withdraw_gas': gas_limit, 'dst_chain_id': 0}})
 
-                    withdraw_cost_fee = get_fee_value(tx_gas_amount, 'sui')
+# receiveWithdraw transactions of one chain waiting for their receipts at the same time
+ETH_WITHDRAW_IN_FLIGHT = 4
 
-                    date = str(datetime.datetime.utcfromtimestamp(timestamp))
-                    relay_record.update_record({'withdraw_vaa': vaa},
-                                               {"$set": {'status': 'success', 'withdraw_cost_fee': withdraw_cost_fee,
-                                                         'end_time': date, 'withdraw_tx_id': digest}})
+ETH_WITHDRAW_TIMEOUT = 600
 
-                    local_logger.info("Execute sui withdraw success! ")
-                    local_logger.info(
-                        f"token: {token_name} source_chain: {source_chain_id} nonce: {source_nonce}")
-                    local_logger.info(
-                        f"relay fee: {relay_fee_value} USD, consumed fee: {get_fee_value(tx_gas_amount)} USD")
-                    if available_gas_amount < tx_gas_amount:
-                        call_name = withdraw_tx['call_name']
-                        local_logger.warning(
-                            "Execute withdraw fail on sui, not enough relay fee! ")
-                        local_logger.warning(
-                            f"Need gas fee: {get_fee_value(tx_gas_amount)} USD, but available gas fee: {relay_fee_value} USD"
-                        )
-                        local_logger.warning(
-                            f"call: {call_name} source_chain: {source_chain_id}, nonce: {source_nonce}")
-                else:
-                    relay_record.update_record({'vaa': withdraw_tx['vaa']},
-                                               {"$set": {'status': 'fail',
-                                                         'reason': status}})
-                    local_logger.warning("Execute sui core fail! ")
-                    local_logger.warning(f"status: {status}")
-            except Exception as e:
-                traceback.print_exc()
-                local_logger.error(f"Execute sui pool withdraw fail\n {e}")
-        time.sleep(3)
 
+async def eth_pool_executor(db, notifier: JobNotifier, eth_client, network, max_in_flight=ETH_WITHDRAW_IN_FLIGHT):
+    """
+    Relay the withdrawals of one chain. Nonces are managed locally, so up to max_in_flight receiveWithdraw
+    transactions are pending at once while their receipts are polled.
+    """
+    local_logger = logger.getChild(f"[{network}_pool_executor]")
+    local_logger.info(f"Start to relay {network} withdraw vaa ^-^")
 
-def eth_pool_executor():
-    dola_ethereum_sdk.set_dola_project_path(Path("../.."))
-    local_logger = logger.getChild("[eth_pool_executor]")
-    local_logger.info("Start to relay eth withdraw vaa ^-^")
+    relay_record = RelayRecord(db, notifier)
+    gas_record = GasRecord(db)
 
-    relay_record = RelayRecord()
-    gas_record = GasRecord()
+    sender = AsyncTxSender(eth_client, dola_ethereum_sdk.config["wallets"]["from_key"], max_in_flight)
+    local_logger.info(f"Ethereum account: {sender.address}")
+    owner = lease_owner(sender.address)
 
-    while True:
-        try:
-            relay_transactions = relay_record.find(
-                {"status": "withdraw", "withdraw_chain_id": {"$ne": 0}})
-        except Exception as e:
-            local_logger.warning(f"relay record find failed! {e}")
-            continue
+    dola_chain_id = config.NET_TO_DOLA_CHAIN_ID[network]
+    wormhole_adapter_pool = dola_ethereum_sdk.config["networks"][network]["wormhole_adapter_pool"]["latest"]
+    gas_token = get_gas_token(network)
 
-        for withdraw_tx in relay_transactions:
-            try:
-                dola_chain_id = withdraw_tx['withdraw_chain_id']
-                network = get_dola_network(dola_chain_id)
-                dola_ethereum_sdk.set_ethereum_network(network)
+    def save_pending(withdraw_tx):
+        async def on_sent(pending):
+            # Saved before waiting, so a retry looks for these transactions before sending another one
+            await relay_record.update_record({'_id': withdraw_tx['_id']},
+                                             {"$set": {'withdraw_pending': pending.to_record()}})
 
-                ethereum_wormhole_bridge = dola_ethereum_load.wormhole_adapter_pool_package(
-                    network)
-                ethereum_account = dola_ethereum_sdk.get_account()
-                local_logger.info(
-                    f"Ethereum account: {ethereum_account.address}")
+        return on_sent
+
+    async def execute(withdraw_tx):
+        async with relay_record.lease(withdraw_tx, owner):
+            try:
                 source_chain_id = withdraw_tx['src_chain_id']
                 source_chain = get_dola_network(source_chain_id)
                 source_nonce = withdraw_tx['nonce']
 
-                vaa = withdraw_tx['withdraw_vaa']
+                vaa = await relay_record.load_vaa(withdraw_tx, 'withdraw_vaa')
 
                 core_costed_fee = (
                     withdraw_tx['core_costed_fee']
@@ -792,56 +1394,122 @@ def eth_pool_executor():
                     else 0
                 )
                 relay_fee_value = withdraw_tx['relay_fee'] - core_costed_fee
-                available_gas_amount = get_fee_amount(relay_fee_value, get_gas_token(network))
+                available_gas_amount = await asyncio.to_thread(get_fee_amount, relay_fee_value, gas_token)
                 # check relayer balance
-                if network in ['arbitrum-main', 'optimism-main'] and int(ethereum_account.balance()) < int(0.01 * 1e18):
-                    local_logger.warning(
-                        f"Relayer balance is not enough, need 0.01 {get_gas_token(network)}, but available {ethereum_account.balance()}")
-                    time.sleep(5)
-                    continue
-
-                gas_price = int(brownie.web3.eth.gas_price)
-                gas_used = ethereum_wormhole_bridge.receiveWithdraw.estimate_gas(
-                    vaa, {"from": ethereum_account})
-
-                gas_record.update_record({'src_chain_id': source_chain_id, 'nonce': source_nonce},
-                                         {"$set": {'withdraw_gas': gas_used, 'dst_chain_id': dola_chain_id}})
-
-                tx_gas_amount = int(gas_used) * gas_price
-
-                result = ethereum_wormhole_bridge.receiveWithdraw(
-                    vaa, {"from": ethereum_account})
+                if network in ['arbitrum-main', 'optimism-main']:
+                    balance = await eth_client.get_balance(sender.address)
+                    if balance < int(0.01 * 1e18):
+                        local_logger.warning(
+                            f"Relayer balance is not enough, need 0.01 {gas_token}, but available {balance}")
+                        await asyncio.sleep(5)
+                        return
+
+                # An earlier attempt may have sent the withdrawal and timed out or stopped before its receipt
+                receipt = None
+                pending = None
+                if withdraw_tx.get('withdraw_pending'):
+                    pending = PendingTx.from_record(withdraw_tx['withdraw_pending'])
+                    receipt = await sender.receipt(pending.tx_hashes)
+                if receipt is None:
+                    if await dola_ethereum_init.async_is_vaa_consumed(eth_client, wormhole_adapter_pool, vaa):
+                        await relay_record.update_record({'_id': withdraw_tx['_id']}, {"$set": {
+                            'status': 'success', 'end_time': str(datetime.datetime.utcfromtimestamp(int(time.time()))),
+                            'completed_at': datetime.datetime.utcnow()}})
+                        local_logger.warning(
+                            f"Withdraw of source: {source_chain} nonce: {source_nonce} executed by an unknown tx")
+                        return
+                    if pending is not None and await sender.is_pending(pending):
+                        receipt = await sender.resume(pending, ETH_WITHDRAW_TIMEOUT, save_pending(withdraw_tx))
+
+                if receipt is None:
+                    # The estimate is the gas limit of the transaction, no second estimate when sending
+                    data = dola_ethereum_init.receive_withdraw_data(vaa)
+                    try:
+                        gas_limit = await eth_client.estimate_gas(
+                            {'from': sender.address, 'to': wormhole_adapter_pool, 'data': data})
+                    except RpcError as e:
+                        raise ValueError(f"Estimate receiveWithdraw fail: {e}") from e
+
+                    receipt, pending = await sender.transact(wormhole_adapter_pool, data, gas_limit,
+                                                             timeout=ETH_WITHDRAW_TIMEOUT,
+                                                             on_sent=save_pending(withdraw_tx))
+                tx_id = receipt['transactionHash']
+                if int(receipt['status'], 16) != 1:
+                    raise ValueError(f"receiveWithdraw reverted: {tx_id}")
+                gas_used = int(receipt['gasUsed'], 16)
+                gas_price = int(receipt['effectiveGasPrice'], 16) if 'effectiveGasPrice' in receipt \
+                    else pending.gas_price
+
+                await gas_record.update_record({'src_chain_id': source_chain_id, 'nonce': source_nonce},
+                                               {"$set": {'withdraw_gas': gas_used, 'dst_chain_id': dola_chain_id}})
+
+                tx_gas_amount = gas_used * gas_price
 
-                tx_id = result.txid
                 timestamp = time.time()
                 date = str(datetime.datetime.utcfromtimestamp(int(timestamp)))
 
-                withdraw_cost_fee = get_fee_value(tx_gas_amount, get_gas_token(network))
-                relay_record.update_record({'withdraw_vaa': withdraw_tx['withdraw_vaa']},
-                                           {"$set": {'status': 'success', 'withdraw_cost_fee': withdraw_cost_fee,
-                                                     'end_time': date, 'withdraw_tx_id': tx_id}})
+                withdraw_cost_fee = await asyncio.to_thread(get_fee_value, tx_gas_amount, gas_token)
+                await relay_record.update_record({'_id': withdraw_tx['_id']},
+                                                 {"$set": {'status': 'success', 'withdraw_cost_fee': withdraw_cost_fee,
+                                                           'end_time': date, 'withdraw_tx_id': tx_id,
+                                                           'completed_at': datetime.datetime.utcnow()}})
 
                 local_logger.info(f"Execute {network} withdraw success! ")
                 local_logger.info(
                     f"source: {source_chain} nonce: {source_nonce}")
                 local_logger.info(
-                    f"relay fee: {relay_fee_value} USD, consumed fee: {get_fee_value(tx_gas_amount, get_gas_token(network))} USD")
+                    f"relay fee: {relay_fee_value} USD, consumed fee: {withdraw_cost_fee} USD")
 
                 if available_gas_amount < tx_gas_amount:
                     local_logger.warning(
-                        f"Execute withdraw success on {get_dola_network(dola_chain_id)}, but not enough relay fee! ")
+                        f"Execute withdraw success on {network}, but not enough relay fee! ")
                     local_logger.warning(
-                        f"Need gas fee: {get_fee_value(tx_gas_amount, get_gas_token(network))} USD, but available gas fee: {relay_fee_value} USD")
+                        f"Need gas fee: {withdraw_cost_fee} USD, but available gas fee: {relay_fee_value} USD")
                     call_name = withdraw_tx['call_name']
                     local_logger.warning(
                         f"call: {call_name} source: {source_chain}, nonce: {source_nonce}")
             except ValueError as e:
                 local_logger.warning(f"Execute eth pool withdraw fail\n {e}")
-                relay_record.update_record({'withdraw_vaa': withdraw_tx['withdraw_vaa']},
-                                           {"$set": {'status': 'fail', 'reason': str(e)}})
+                await relay_record.update_record({'_id': withdraw_tx['_id']},
+                                                 {"$set": {'status': 'fail', 'reason': str(e)}})
             except Exception as e:
                 traceback.print_exc()
                 local_logger.error(f"Execute eth pool withdraw fail\n {e}")
+                await relay_record.defer(withdraw_tx['_id'], owner)
+
+    slots = asyncio.Semaphore(max_in_flight)
+    running = set()
+
+    async def run(withdraw_tx):
+        try:
+            await execute(withdraw_tx)
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            await slots.acquire()
+            try:
+                withdraw_tx = await relay_record.claim({"status": "withdraw", "withdraw_chain_id": dola_chain_id},
+                                                       owner)
+            except Exception as e:
+                slots.release()
+                local_logger.warning(f"relay record claim failed! {e}")
+                await asyncio.sleep(1)
+                continue
+
+            if withdraw_tx is None:
+                slots.release()
+                await notifier.wait()
+                continue
+
+            task = asyncio.create_task(run(withdraw_tx))
+            running.add(task)
+            task.add_done_callback(running.discard)
+    finally:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
 
 
 def check_valid_call_name(call_name):
@@ -850,6 +1518,24 @@ def check_valid_call_name(call_name):
         raise ValueError("Invalid call name!")
 
 
+UNRELAY_TX_PROJECTION = {'_id': False, 'lease_owner': False, 'lease_expire': False}
+
+
+def attach_vaas(db, records):
+    """Inline the hex vaa of records whose vaa lives in RelayVaa, for api consumers"""
+    vaa_hashes = [record['vaa_hash'] for record in records if 'vaa_hash' in record]
+    if not vaa_hashes:
+        return records
+    vaas = {
+        item['_id']: f"0x{bytes(item['vaa']).hex()}"
+        for item in db['RelayVaa'].find({'_id': {'$in': vaa_hashes}})
+    }
+    for record in records:
+        if 'vaa_hash' in record:
+            record['vaa'] = vaas.get(record.pop('vaa_hash'), "")
+    return records
+
+
 def get_unrelay_txs(src_chain_id, call_name, limit):
     db = mongodb()
     relay_record = db['RelayRecord']
@@ -859,21 +1545,21 @@ def get_unrelay_txs(src_chain_id, call_name, limit):
     if int(limit) > 0:
         result = list(relay_record.find(
             {'src_chain_id': int(src_chain_id), 'call_name': call_name, 'status': 'fail', 'reason': 'success'},
-            {'_id': False}).limit(
+            UNRELAY_TX_PROJECTION).limit(
             int(limit)))
     else:
         result = list(relay_record.find(
             {'src_chain_id': int(src_chain_id), 'call_name': call_name, 'status': 'fail', 'reason': 'success'},
-            {'_id': False}))
+            UNRELAY_TX_PROJECTION))
 
-    return {'result': result}
+    return {'result': attach_vaas(db, result)}
 
 
 def get_unrelay_tx_by_sequence(src_chain_id, sequence):
     db = mongodb()
     relay_record = db['RelayRecord']
 
-    return {'result': list(
+    return {'result': attach_vaas(db, list(
         relay_record.find(
             {
                 'src_chain_id': int(src_chain_id),
@@ -881,9 +1567,9 @@ def get_unrelay_tx_by_sequence(src_chain_id, sequence):
                 'reason': 'success',
                 'sequence': int(sequence),
             },
-            {'_id': False}
+            UNRELAY_TX_PROJECTION
         )
-    )}
+    ))}
 
 
 # The largest relay fee in total history
@@ -930,8 +1616,7 @@ def calculate_relay_fee(records, src_chain_id, dst_chain_id):
     if int(dst_chain_id) == 0:
         withdraw_gas_price = core_gas_price
     else:
-        dola_ethereum_sdk.set_ethereum_network(dst_net)
-        withdraw_gas_price = int(brownie.web3.eth.gas_price)
+        withdraw_gas_price = int(dola_ethereum_registry.web3(dst_net).eth.gas_price)
 
     max_record = max(records, key=lambda x: x['core_gas'] + x['withdraw_gas'])
 
@@ -953,26 +1638,6 @@ def calculate_withdraw_fee(withdraw_gas, gas_price, dst_net):
 
 
 @retry
-def get_signed_vaa_by_wormhole(
-        emitter: str,
-        sequence: int,
-        src_net: str = None
-):
-    wormhole_url = sui_project.network_config['wormhole_url']
-    emitter_address = dola_sui_init.format_emitter_address(emitter)
-    emitter_chain_id = config.NET_TO_WORMHOLE_CHAIN_ID[src_net]
-
-    url = f"{wormhole_url}/v1/signed_vaa/{emitter_chain_id}/{emitter_address}/{sequence}"
-    response = requests.get(url)
-
-    if 'vaaBytes' not in response.json():
-        raise ValueError(f"Get {src_net} signed vaa failed: {response.text}")
-
-    vaa_bytes = response.json()['vaaBytes']
-    vaa = base64.b64decode(vaa_bytes).hex()
-    return f"0x{vaa}"
-
-
 def get_signed_vaa(
         sequence: int,
         src_wormhole_id: int = None,
@@ -1013,8 +1678,16 @@ def mongodb():
     return client['DolaProtocol']
 
 
-def sui_total_balance():
-    return int(sui_project.client.suix_getBalance(sui_project.account.account_address, '0x2::sui::SUI')['totalBalance'])
+def async_mongodb():
+    mongo_uri = get_mongodb_uri()
+    client = AsyncIOMotorClient(mongo_uri)
+
+    return client['DolaProtocol']
+
+
+async def sui_total_balance(address):
+    result = await sui_project.async_client.suix_getBalance(address, '0x2::sui::SUI')
+    return int(result['totalBalance'])
 
 
 def graph_query(block_number, limit=5):
@@ -1065,69 +1738,149 @@ def test_validate_vaa():
     assert check_payload_hash(payload, payload_by_evm)
 
 
-def main():
-    init_logger()
-    init_markets()
-    # fix request ssl error
-    fix_requests_ssl()
+# Backoff between the restarts of a failed relayer task
+SUPERVISE_MIN_BACKOFF = 1
+SUPERVISE_MAX_BACKOFF = 300
+
+# A task that ran this long before failing is restarted after the min backoff again
+SUPERVISE_HEALTHY_RUNTIME = 600
+
+
+def task_name(factory):
+    func = getattr(factory, 'func', factory)
+    args = [str(arg) for arg in getattr(factory, 'args', ()) if isinstance(arg, (str, int))]
+    return "_".join([func.__name__, *args])
 
+
+async def restart_forever(factory):
+    """
+    Run factory() again whenever it fails or returns, waiting SUPERVISE_MIN_BACKOFF doubled after every quick
+    failure up to SUPERVISE_MAX_BACKOFF. Only BaseExceptions that are not Exceptions get through.
+    """
+    name = task_name(factory)
+    local_logger = logger.getChild(f"[supervise_{name}]")
+    backoff = SUPERVISE_MIN_BACKOFF
+    while True:
+        started = time.monotonic()
+        try:
+            await factory()
+            local_logger.warning(f"{name} returned")
+        except Exception as e:
+            local_logger.error(f"{name} failed: {e}, {traceback.format_exc()}")
+        if time.monotonic() - started > SUPERVISE_HEALTHY_RUNTIME:
+            backoff = SUPERVISE_MIN_BACKOFF
+        local_logger.warning(f"Restart {name} in {backoff}s")
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, SUPERVISE_MAX_BACKOFF)
+
+
+async def supervise(factories):
+    """
+    Run each coroutine factory as a sibling task restarted with backoff on failure, so one failing task does not
+    stop the others. Unrecoverable errors (SystemExit, KeyboardInterrupt, ...) cancel the siblings and await
+    them before the error is raised, so no task outlives the runtime.
+    """
+    tasks = [asyncio.create_task(restart_forever(factory)) for factory in factories]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_relayer():
     # init dola monitor
-    all_pools = dola_monitor.get_all_pools()
+    all_pools = await asyncio.to_thread(dola_monitor.get_all_pools)
 
-    manager = Manager()
+    health = Health()
 
-    health = manager.Value('b', True)
+    q = asyncio.Queue()
 
-    lock = manager.Lock()
+    db = async_mongodb()
+    await ensure_indexes(db)
+    http = httpx.AsyncClient(timeout=10, limits=httpx.Limits(max_connections=64, max_keepalive_connections=16))
+    vaa_fetcher = WormholeVaaFetcher(db, http)
+    notifier = JobNotifier()
 
-    q = manager.Queue()
+    eth_networks = ['polygon-main', 'arbitrum-main', 'optimism-main', 'base-main']
+    eth_clients = {network: dola_ethereum_registry.async_client(network) for network in eth_networks}
 
-    pt = ProcessExecutor(executor=21)
+    # Building and signing transactions happens in worker processes, one per relayer account
+    core_accounts = ["LendingCore1", "LendingCore2", "LendingCore3"]
+    reader_pool = sui_worker_pool(max_workers=2)
+    # Guardian sets are the same on every chain, signatures are checked in the reader processes
+    guardian_sets = GuardianSetCache(eth_clients['polygon-main'],
+                                     dola_ethereum_sdk.config["networks"]['polygon-main']["wormhole"],
+                                     executor=reader_pool)
+    core_pools = [sui_worker_pool(account, subscribe_prices=True) for account in core_accounts]
+    withdraw_pool = sui_worker_pool("LendingPool")
 
     sui_dola_chain_id = config.NET_TO_DOLA_CHAIN_ID['sui-mainnet']
-    polygon_dola_chain_id = config.NET_TO_DOLA_CHAIN_ID['polygon-main']
-    optimism_dola_chain_id = config.NET_TO_DOLA_CHAIN_ID['optimism-main']
-    arbitrum_dola_chain_id = config.NET_TO_DOLA_CHAIN_ID['arbitrum-main']
-    base_dola_chain_id = config.NET_TO_DOLA_CHAIN_ID['base-main']
-
-    pt.run([
-        # One monitoring pool balance per chain
-        functools.partial(dola_monitor.sui_pool_monitor, logger.getChild("[sui_pool_monitor]"),
-                          all_pools[sui_dola_chain_id], q),
-        functools.partial(dola_monitor.eth_pool_monitor, logger.getChild("[polygon_pool_monitor]"),
-                          polygon_dola_chain_id,
-                          all_pools[polygon_dola_chain_id], q),
-        functools.partial(dola_monitor.eth_pool_monitor, logger.getChild("[optimism_pool_monitor]"),
-                          optimism_dola_chain_id,
-                          all_pools[optimism_dola_chain_id], q),
-        functools.partial(dola_monitor.eth_pool_monitor, logger.getChild("[arbitrum_pool_monitor]"),
-                          arbitrum_dola_chain_id,
-                          all_pools[arbitrum_dola_chain_id], q),
-        functools.partial(dola_monitor.eth_pool_monitor, logger.getChild("[base_pool_monitor]"),
-                          base_dola_chain_id,
-                          all_pools[base_dola_chain_id], q),
-        # Protocol health monitoring
-        functools.partial(dola_monitor.dola_monitor, logger.getChild("[dola_monitor]"), q, health, lock),
-        # Two core executor
-        functools.partial(sui_core_executor, "LendingCore1", 3, 0),
-        functools.partial(sui_core_executor, "LendingCore2", 3, 1),
-        functools.partial(sui_core_executor, "LendingCore3", 3, 2),
-        # User transaction watcher
-        functools.partial(sui_portal_watcher, health),
-        functools.partial(eth_portal_watcher, health, "polygon-main"),
-        functools.partial(wormhole_vaa_guardian, "polygon-main"),
-        functools.partial(eth_portal_watcher, health, "arbitrum-main"),
-        functools.partial(wormhole_vaa_guardian, "arbitrum-main"),
-        functools.partial(eth_portal_watcher, health, "optimism-main"),
-        functools.partial(wormhole_vaa_guardian, "optimism-main"),
-        functools.partial(eth_portal_watcher, health, "base-main"),
-        functools.partial(wormhole_vaa_guardian, "base-main"),
-        # User withdraw watcher
-        functools.partial(pool_withdraw_watcher, health),
-        # User withdraw executor
-        functools.partial(sui_pool_executor, "LendingPool"),
-        eth_pool_executor,
-    ])
+
+    try:
+        await supervise([
+            # One monitoring pool balance per chain
+            functools.partial(dola_monitor.async_sui_pool_monitor, logger.getChild("[sui_pool_monitor]"),
+                              all_pools[sui_dola_chain_id], q),
+            *[
+                functools.partial(dola_monitor.async_eth_pool_monitor,
+                                  logger.getChild(f"[{network.split('-')[0]}_pool_monitor]"),
+                                  config.NET_TO_DOLA_CHAIN_ID[network],
+                                  all_pools[config.NET_TO_DOLA_CHAIN_ID[network]], q)
+                for network in eth_networks
+            ],
+            # Protocol health monitoring
+            functools.partial(dola_monitor.async_dola_monitor, logger.getChild("[dola_monitor]"), q, health),
+            # Relay jobs written by other relayer processes
+            functools.partial(relay_record_waker, db, notifier),
+            functools.partial(archive_relay_records, db),
+            # Core executors share one leased job queue
+            *[
+                functools.partial(sui_core_executor, db, core_pool, notifier, account)
+                for core_pool, account in zip(core_pools, core_accounts)
+            ],
+            # User transaction watcher
+            functools.partial(sui_portal_watcher, db, vaa_fetcher, guardian_sets, reader_pool, notifier, health),
+            *[
+                watcher
+                for network in eth_networks
+                for watcher in [
+                    functools.partial(eth_portal_watcher, db, vaa_fetcher, guardian_sets, eth_clients[network],
+                                      notifier, health, network),
+                    functools.partial(wormhole_vaa_guardian, db, vaa_fetcher, guardian_sets, eth_clients[network],
+                                      notifier, network),
+                ]
+            ],
+            # User withdraw watcher
+            functools.partial(pool_withdraw_watcher, db, vaa_fetcher, guardian_sets, reader_pool, notifier, health),
+            # User withdraw executor
+            functools.partial(sui_pool_executor, db, withdraw_pool, notifier, "LendingPool"),
+            *[functools.partial(eth_pool_executor, db, notifier, eth_clients[network], network)
+              for network in eth_networks],
+        ])
+    finally:
+        await http.aclose()
+        await sui_project.async_client.close()
+        await dola_ethereum_registry.close()
+        db.client.close()
+        for pool in [reader_pool, *core_pools, withdraw_pool]:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    init_logger()
+    init_markets()
+    # fix request ssl error
+    fix_requests_ssl()
+
+    dola_sui_sdk.set_dola_project_path(Path("../.."))
+    dola_ethereum_sdk.set_dola_project_path(Path("../.."))
+
+    asyncio.run(run_relayer())
 
 
 if __name__ == "__main__":
@@ -30,5 +30,5 @@ setup(
     python_requires=">=3.6",
     package_data={'': ['*']},
     packages=["dola_sui_sdk"],
-    install_requires=["sui-brownie"]
+    install_requires=["sui-brownie", "numpy"]
 )
@@ -0,0 +1,134 @@
+import unittest
+from types import SimpleNamespace
+
+from dola_sui_sdk.health_engine import HealthSnapshot, RAY, U256_MAX
+from dola_sui_sdk.lending_state import Reserve, UserInfo, Price
+
+BTC = 0
+USDT = 1
+
+VIOLATOR = 1
+LIQUIDATOR = 2
+SAVER = 3
+
+
+def reserve(dola_pool_id, liquidity_index, borrow_index, collateral_coefficient, borrow_coefficient,
+            treasury_factor=0):
+    table = {"fields": {"id": {"id": f"0x{dola_pool_id}"}}}
+    return Reserve(dola_pool_id, {
+        "is_isolated_asset": False,
+        "borrowable_in_isolation": False,
+        "treasury": "0",
+        "isolate_debt": "0",
+        "last_update_timestamp": "0",
+        "treasury_factor": str(treasury_factor),
+        "supply_cap_ceiling": "0",
+        "borrow_cap_ceiling": "0",
+        "current_borrow_rate": "0",
+        "current_liquidity_rate": "0",
+        "current_borrow_index": str(borrow_index),
+        "current_liquidity_index": str(liquidity_index),
+        "collateral_coefficient": str(collateral_coefficient),
+        "borrow_coefficient": str(borrow_coefficient),
+        "borrow_rate_factors": {"fields": {"base_borrow_rate": "0", "borrow_rate_slope1": "0",
+                                           "borrow_rate_slope2": "0", "optimal_utilization": "0"}},
+        "otoken_scaled": {"fields": {"total_supply": "0", "user_state": table}},
+        "dtoken_scaled": {"fields": {"total_supply": "0", "user_state": table}},
+    })
+
+
+def user_info(dola_user_id, collaterals, loans, average_liquidity=0):
+    return UserInfo(dola_user_id, {"average_liquidity": str(average_liquidity), "last_average_update": "0",
+                                   "liquid_assets": [], "collaterals": collaterals, "loans": loans})
+
+
+def fixed_mirror():
+    """
+    BTC at 30000 and USDT at 1, 8 decimals everywhere.
+
+    - violator: 1 BTC scaled collateral at liquidity index 1.1, 25000 USDT scaled debt at borrow index 1.2
+    - liquidator: 10000 USDT collateral, average liquidity 15000
+    - saver: 1 BTC supplied without loans
+    """
+    return SimpleNamespace(
+        reserves={
+            BTC: reserve(BTC, 11 * RAY // 10, RAY, 8 * RAY // 10, 12 * RAY // 10, treasury_factor=RAY // 10),
+            USDT: reserve(USDT, RAY, 12 * RAY // 10, 9 * RAY // 10, RAY),
+        },
+        prices={
+            BTC: Price(BTC, {"value": str(30000 * 10 ** 8), "decimal": "8", "last_update_timestamp": "0"}),
+            USDT: Price(USDT, {"value": str(10 ** 8), "decimal": "8", "last_update_timestamp": "0"}),
+        },
+        user_infos={
+            VIOLATOR: user_info(VIOLATOR, [BTC], [USDT]),
+            LIQUIDATOR: user_info(LIQUIDATOR, [USDT], [], average_liquidity=15000 * 10 ** 8),
+            SAVER: user_info(SAVER, [BTC], []),
+        },
+        otoken_scaled={BTC: {VIOLATOR: 10 ** 8, SAVER: 10 ** 8}, USDT: {LIQUIDATOR: 10000 * 10 ** 8}},
+        dtoken_scaled={BTC: {}, USDT: {VIOLATOR: 25000 * 10 ** 8}},
+    )
+
+
+class TestHealthSnapshot(unittest.TestCase):
+    """Expected values worked out by hand from logic.move"""
+
+    def setUp(self):
+        self.mirror = fixed_mirror()
+        self.snapshot = HealthSnapshot(self.mirror)
+
+    def test_health_factor(self):
+        violator = [self.snapshot.user_index[VIOLATOR]]
+        # collateral 1 BTC * 1.1 * 30000 = 33000, weighted by 0.8
+        self.assertEqual(self.snapshot.health_collateral_value(violator)[0], 26400 * 10 ** 8)
+        # debt 25000 USDT * 1.2 = 30000, weighted by 1.0
+        self.assertEqual(self.snapshot.health_loan_value(violator)[0], 30000 * 10 ** 8)
+        # ray_div(26400, 30000) = 0.88
+        self.assertEqual(self.snapshot.user_health_factor(VIOLATOR), 88 * RAY // 100)
+        self.assertEqual(self.snapshot.user_health_factor(LIQUIDATOR), U256_MAX)
+        self.assertEqual(self.snapshot.user_health_factor(SAVER), U256_MAX)
+        self.assertEqual(self.snapshot.unhealthy_users(), [(VIOLATOR, 88 * RAY // 100)])
+
+    def test_liquidation_discount(self):
+        average_liquidity = self.mirror.user_infos[LIQUIDATOR].average_liquidity
+        # base 1 - 0.88 = 0.12, booster min(15000 / (5 * 30000), 1) + 1 = 1.1, discount 0.132
+        self.assertEqual(self.snapshot.liquidation_discount(average_liquidity, VIOLATOR), 132 * RAY // 1000)
+
+    def test_calculate_max_liquidation(self):
+        average_liquidity = self.mirror.user_infos[LIQUIDATOR].average_liquidity
+        # target health value: 30000 * 1.25 - 26400 = 11100
+        # target coefficient: 1.25 * (1 - 0.132) * 1.0 - 0.8 = 0.285
+        # max liquidable collateral value: ray_div(11100, 0.285) = 38947.36842105
+        # collateral ratio 33000 / 38947.36842105 = 0.8473 caps the debt ratio 30000 / 33806.31578947 = 0.8874,
+        # so the whole 1.1 BTC of collateral goes against 38947.36842105 * 0.868 * 0.8473 = 28644 USDT of debt
+        self.assertEqual(self.snapshot.max_liquidation(average_liquidity, VIOLATOR, BTC, USDT),
+                         (11 * 10 ** 7, 28644 * 10 ** 8))
+
+    def test_calculate_actual_liquidation(self):
+        # The liquidator repays 10000 of the 28644 USDT it could: 1.1 BTC * 10000 / 28644 = 0.38402458 BTC
+        # reward (0.38402458 * 30000 - 10000) / 30000 = 0.05069125 BTC, the treasury keeps 10% of it
+        self.assertEqual(
+            self.snapshot.actual_liquidation(BTC, 11 * 10 ** 7, USDT, 28644 * 10 ** 8, 10000 * 10 ** 8),
+            (38402458, 10000 * 10 ** 8, 37895546, 506912))
+        # Repaying more than the max liquidates the max only
+        self.assertEqual(
+            self.snapshot.actual_liquidation(BTC, 11 * 10 ** 7, USDT, 28644 * 10 ** 8, 30000 * 10 ** 8)[:2],
+            (11 * 10 ** 7, 28644 * 10 ** 8))
+
+    def test_liquidation_profit(self):
+        average_liquidity = self.mirror.user_infos[LIQUIDATOR].average_liquidity
+        # 0.37895546 BTC * 30000 - 10000 USDT
+        self.assertEqual(self.snapshot.liquidation_profit(average_liquidity, LIQUIDATOR, VIOLATOR, BTC, USDT),
+                         (136866380000, 38402458, 10000 * 10 ** 8))
+
+    def test_reload_user(self):
+        # The violator repays half of the debt
+        self.mirror.dtoken_scaled[USDT][VIOLATOR] = 12500 * 10 ** 8
+        i = self.snapshot.user_index[VIOLATOR]
+        self.snapshot.load_user(self.mirror, i, VIOLATOR)
+        # ray_div(26400, 15000) = 1.76
+        self.assertEqual(self.snapshot.user_health_factor(VIOLATOR), 176 * RAY // 100)
+        self.assertEqual(self.snapshot.unhealthy_users(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from dola_sui_sdk import interfaces
+
+
+def module_function(*param_types):
+    return SimpleNamespace(abi={"parameters": list(param_types)})
+
+
+OBJECT = {"Reference": {"Struct": {}}}
+
+
+class TestBatchView(unittest.TestCase):
+
+    def setUp(self):
+        project = mock.MagicMock()
+        patcher = mock.patch.object(interfaces, "sui_project", project)
+        self.sui_project = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(interfaces, "load")
+        load = patcher.start()
+        self.addCleanup(patcher.stop)
+        load.external_interfaces_package.return_value.interfaces = SimpleNamespace(
+            get_user_lending_info=module_function(OBJECT, OBJECT, "U64"),
+            get_feed_tokens_for_relayer=module_function(OBJECT, "Bool"),
+        )
+
+    def view_result(self, events, returns):
+        self.sui_project.batch_transaction_view.return_value = {
+            "results": [{"returnValues": values} for values in returns],
+            "events": [{"type": f"0xe::{module}::Event", "parsedJson": fields} for module, fields in events],
+        }
+
+    def test_calls_without_event(self):
+        self.view_result([("interfaces", {"user": 1}), ("lending_logic", {}), ("interfaces", {"user": 2})],
+                         [[], [[[1, 3], "vector<u16>"]], []])
+        outputs = interfaces.batch_view([
+            ("get_user_lending_info", ["0xstorage", "0xoracle", 1]),
+            ("get_feed_tokens_for_relayer", ["0xstorage", True]),
+            ("get_user_lending_info", ["0xstorage", "0xoracle", 2]),
+        ])
+        self.assertEqual(outputs, [({"user": 1}, []), (None, [[[1, 3], "vector<u16>"]]), ({"user": 2}, [])])
+
+    def test_missing_event(self):
+        self.view_result([("interfaces", {"user": 1})], [[], []])
+        with self.assertRaises(ValueError):
+            interfaces.batch_view([("get_user_lending_info", ["0xstorage", "0xoracle", n]) for n in [1, 2]])
+
+
+if __name__ == "__main__":
+    unittest.main()
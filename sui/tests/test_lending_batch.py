@@ -0,0 +1,154 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from dola_sui_sdk import lending, oracle
+
+
+def gas_used(gas):
+    return {'computationCost': str(gas), 'storageCost': '0', 'storageRebate': '0'}
+
+
+def dry_run(gas, error=None):
+    status = {'status': 'success'} if error is None else {'status': 'failure', 'error': error}
+    return {'effects': {'status': status, 'gasUsed': gas_used(gas)}}
+
+
+class FakeChain:
+    """Items are gas costs, negative ones fail. Feeds cost FEED_GAS."""
+    FEED_GAS = 100
+
+    def __init__(self):
+        self.simulated = []
+        self.executed = []
+
+    @staticmethod
+    def build_batch(items, feeds=None):
+        return list(items), ["feed"] if feeds else []
+
+    def simulate(self, actual_params, transactions):
+        self.simulated.append(list(actual_params))
+        gas = sum(abs(item) for item in actual_params) + (self.FEED_GAS if transactions else 0)
+        failing = [item for item in actual_params if item < 0]
+        return dry_run(gas, f"abort {failing[0]}" if failing else None)
+
+    def execute(self, actual_params, transactions):
+        self.executed.append(list(actual_params))
+        return {'effects': {'status': {'status': 'success'}, 'transactionDigest': f"digest{len(self.executed)}"}}
+
+
+class TestBisectBatchSimulate(unittest.TestCase):
+
+    def setUp(self):
+        self.chain = FakeChain()
+        patcher = mock.patch.object(lending, "sui_project", mock.MagicMock())
+        self.sui_project = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(lending, "price_freshness")
+        self.price_freshness = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sui_project.batch_transaction_simulate.side_effect = self.chain.simulate
+        self.sui_project.batch_transaction.side_effect = self.chain.execute
+
+    def test_success_in_one_dry_run(self):
+        groups = lending.bisect_batch_simulate(self.chain.build_batch, [1, 2, 3])
+        self.assertEqual([indexes for indexes, _ in groups], [[0, 1, 2]])
+        self.assertEqual(len(self.chain.simulated), 1)
+
+    def test_failures_are_isolated(self):
+        items = [1, -2, 3, 4, -5]
+        groups = lending.bisect_batch_simulate(self.chain.build_batch, items)
+        statuses = {tuple(indexes): result['effects']['status']['status'] for indexes, result in groups}
+        self.assertEqual(sorted(i for indexes, _ in groups for i in indexes), list(range(len(items))))
+        self.assertEqual(statuses[(1,)], 'failure')
+        self.assertEqual(statuses[(4,)], 'failure')
+        self.assertEqual(statuses[(0,)], 'success')
+        self.assertEqual(statuses[(2,)], 'success')
+        self.assertEqual(statuses[(3,)], 'success')
+
+    def test_execute_batch_gas_per_item(self):
+        items = [10, 20, -30, 40]
+        feeds = ([0], ["vaa"])
+        results = lending.execute_batch(self.chain.build_batch, items, [1000] * len(items), fee_rate=0.8,
+                                        feeds=feeds, item_feeds=[feeds, None, None, None])
+        # Every item is charged its own call and the feeds it needs, as if relayed alone
+        self.assertEqual([gas for gas, _, _, _ in results], [10 + FakeChain.FEED_GAS, 20, 30 + FakeChain.FEED_GAS, 40])
+        self.assertEqual([executed for _, executed, _, _ in results], [True, True, False, True])
+        self.assertEqual(results[2][2], "abort -30")
+        # The feeds only go into the first executed transaction
+        self.assertEqual(self.chain.executed, [[10, 20], [40]])
+        self.price_freshness.record_feed.assert_called_once()
+
+    def test_execute_batch_single_item_without_feeds(self):
+        results = lending.execute_batch(self.chain.build_batch, [7], [1000])
+        self.assertEqual(results, [(7, True, 'success', 'digest1')])
+        self.assertEqual(len(self.chain.simulated), 1)
+
+    def test_execute_batch_not_enough_fee(self):
+        results = lending.execute_batch(self.chain.build_batch, [50, 60], [10, 10])
+        self.assertEqual([executed for _, executed, _, _ in results], [False, False])
+        self.assertEqual(self.chain.executed, [])
+
+
+class TestPriceFreshness(unittest.TestCase):
+    PRICE_FRESH_TIME = 60
+    PRICE_GUARD_TIME = 600
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        project = mock.MagicMock()
+        project.cache_dir = Path(self.cache_dir.name)
+        project.network = "sui-test"
+        project.client.sui_getObject.return_value = {'data': {'content': {'fields': {
+            'price_fresh_time': str(self.PRICE_FRESH_TIME), 'price_guard_time': str(self.PRICE_GUARD_TIME)}}}}
+        patcher = mock.patch.object(oracle, "sui_project", project)
+        self.sui_project = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.price_freshness = oracle.PriceFreshness(margin=10)
+
+    def test_unknown_prices_are_stale(self):
+        self.assertEqual(self.price_freshness.stale([0, 1, 3]), [0, 1, 3])
+
+    def test_fresh_and_guard_periods(self):
+        now = int(time.time())
+        self.price_freshness.update({0: now - 30, 3: now - 55, 1: now - 300, 2: now - 595})
+        # pools 1 and 2 only need the guard period, the margin makes prices about to expire stale
+        self.assertEqual(self.price_freshness.stale([0, 1, 2, 3]), [2, 3])
+        self.assertTrue(self.price_freshness.is_fresh(3, guard=True))
+        self.sui_project.client.sui_getObject.assert_called_once()
+
+    def test_update_keeps_newest(self):
+        now = int(time.time())
+        self.price_freshness.update({0: now})
+        self.price_freshness.update({0: now - 100})
+        self.assertEqual(self.price_freshness.read()["timestamps"]["0"], now)
+
+    def test_record_feed(self):
+        now = int(time.time())
+        result = {'effects': {'status': {'status': 'success'}}, 'events': [
+            {'type': '0x8d::event::PriceFeedUpdateEvent', 'parsedJson': {'timestamp': str(now - 5)}},
+            {'type': '0x8d::event::PriceFeedUpdateEvent', 'parsedJson': {'timestamp': str(now - 1)}},
+        ]}
+        self.price_freshness.record_feed([0, 3], result)
+        self.assertEqual(self.price_freshness.read()["timestamps"], {"0": now - 1, "3": now - 1})
+
+        self.price_freshness.record_feed([4], {'effects': {'status': {'status': 'failure'}}})
+        self.assertNotIn("4", self.price_freshness.read()["timestamps"])
+
+    def test_feed_nums_are_not_filtered(self):
+        vaa = "0x00"
+        with mock.patch.object(lending, "sui_project", mock.MagicMock()), \
+                mock.patch.object(lending, "load") as load, mock.patch.object(lending, "init"):
+            interfaces = load.external_interfaces_package.return_value.interfaces
+            interfaces.get_feed_tokens_for_relayer.inspect.return_value = {
+                'results': [{'returnValues': [[[2, 0, 0, 3, 0]], [[0]]]}]}
+            self.price_freshness.update({3: int(time.time())})
+            with mock.patch.object(lending, "price_freshness", self.price_freshness):
+                self.assertEqual(sorted(lending.get_feed_tokens_for_relayer(vaa, is_withdraw=True)), [0, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
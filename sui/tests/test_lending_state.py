@@ -0,0 +1,194 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from dola_sui_sdk import lending_state
+from dola_sui_sdk.lending_state import LendingMirror
+
+OTOKEN_TABLE = "0x" + "a1" * 32
+DTOKEN_TABLE = "0x" + "d1" * 32
+
+BALANCE_FIELD_TYPE = "0x2::dynamic_field::Field<u64, u256>"
+
+
+def reserve_fields(otoken_total=0, dtoken_total=0):
+    fields = {name: "0" for name in [
+        "isolate_debt", "last_update_timestamp", "treasury_factor", "supply_cap_ceiling", "borrow_cap_ceiling",
+        "current_borrow_rate", "current_liquidity_rate", "collateral_coefficient", "borrow_coefficient"]}
+    fields.update({
+        "is_isolated_asset": False,
+        "borrowable_in_isolation": False,
+        "treasury": "0",
+        "current_borrow_index": str(10 ** 27),
+        "current_liquidity_index": str(10 ** 27),
+        "borrow_rate_factors": {"fields": {name: "0" for name in [
+            "base_borrow_rate", "borrow_rate_slope1", "borrow_rate_slope2", "optimal_utilization"]}},
+        "otoken_scaled": {"fields": {"total_supply": str(otoken_total),
+                                     "user_state": {"fields": {"id": {"id": OTOKEN_TABLE}}}}},
+        "dtoken_scaled": {"fields": {"total_supply": str(dtoken_total),
+                                     "user_state": {"fields": {"id": {"id": DTOKEN_TABLE}}}}},
+    })
+    return fields
+
+
+def stats_event(dola_user_id, dola_pool_id, otoken_scaled, dtoken_scaled):
+    return {
+        "type": "0xdola::lending_logic::LendingUserStatsEvent",
+        "parsedJson": {"user_id": str(dola_user_id), "pool_id": str(dola_pool_id),
+                       "otoken_scaled_amount": str(otoken_scaled), "dtoken_scaled_amount": str(dtoken_scaled)},
+    }
+
+
+def balance_field(object_id, dola_user_id, scaled):
+    return {"objectId": object_id,
+            "content": {"type": BALANCE_FIELD_TYPE, "fields": {"name": str(dola_user_id), "value": str(scaled)}}}
+
+
+class FakeClient:
+    def __init__(self):
+        self.objects = {}
+        # (InputObject, cursor) -> (transactions, next cursor, has next page)
+        self.pages = {}
+        self.queries = []
+
+    async def sui_multiGetObjects(self, object_ids, options):
+        return [{"data": self.objects[object_id]} if object_id in self.objects else {"error": "deleted"}
+                for object_id in object_ids]
+
+    async def suix_queryTransactionBlocks(self, query, cursor, limit, descending):
+        parent_id = query["filter"]["InputObject"]
+        self.queries.append((parent_id, cursor))
+        transactions, next_cursor, has_next_page = self.pages.get((parent_id, cursor), ([], None, False))
+        return {"data": transactions, "nextCursor": next_cursor if transactions else cursor,
+                "hasNextPage": has_next_page}
+
+
+class TestLendingMirror(unittest.TestCase):
+
+    def setUp(self):
+        # The mirror binds its semaphore to the loop of its thread
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+        self.client = FakeClient()
+        project = mock.MagicMock()
+        project.network_config = {"objects": {"LendingStorage": "0xstorage", "PriceOracle": "0xoracle"}}
+        project.async_client = self.client
+        patcher = mock.patch.object(lending_state, "sui_project", project)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.mirror = LendingMirror()
+        self.mirror.set_reserve(0, reserve_fields(), "0xreserve0")
+        self.changes = []
+        self.mirror.subscribe(lambda kind, key: self.changes.append((kind, key)))
+
+    def test_apply_events(self):
+        self.mirror.apply_events([
+            stats_event(1, 0, 100, 0),
+            {"type": "0xdola::lending_logic::LendingSupplyEvent", "parsedJson": {}},
+            stats_event(2, 0, 0, 50),
+        ])
+        self.assertEqual(self.mirror.otoken_scaled[0], {1: 100})
+        self.assertEqual(self.mirror.dtoken_scaled[0], {2: 50})
+        self.assertEqual(self.mirror.user_scaled_balances(1), {0: (100, 0)})
+        self.assertEqual(self.changes, [("user", 1), ("user", 2)])
+
+        # A balance back to zero leaves the table, the same event twice changes nothing
+        self.mirror.apply_events([stats_event(1, 0, 0, 0), stats_event(1, 0, 0, 0)])
+        self.assertEqual(self.mirror.otoken_scaled[0], {})
+        self.assertEqual(self.mirror.user_scaled_balances(1), {})
+
+    def test_event_of_unknown_pool(self):
+        self.mirror.apply_events([stats_event(1, 7, 10, 0)])
+        self.assertEqual(self.mirror.otoken_scaled[7], {1: 10})
+
+    def test_treasury_mint_without_event(self):
+        # Accrual mints otokens to the treasury, only the table field changes
+        changes = self.mirror.changed_fields([
+            {"type": "created", "objectId": "0xtreasury", "objectType": BALANCE_FIELD_TYPE,
+             "owner": {"ObjectOwner": OTOKEN_TABLE}},
+            {"type": "mutated", "objectId": "0xother", "objectType": BALANCE_FIELD_TYPE,
+             "owner": {"ObjectOwner": "0x" + "ee" * 32}},
+            {"type": "mutated", "objectId": "0xreserve0", "objectType": "0x2::dynamic_field::Field<u16, "
+                                                                       "0xdola::lending_core_storage::ReserveData>",
+             "owner": {"ObjectOwner": "0xreserves"}},
+        ])
+        self.assertEqual(changes, {"0xtreasury": True, "0xreserve0": True})
+
+        self.client.objects["0xtreasury"] = balance_field("0xtreasury", 9, 1234)
+        self.client.objects["0xreserve0"] = {
+            "objectId": "0xreserve0",
+            "content": {"type": "0x2::dynamic_field::Field<u16, 0xdola::lending_core_storage::ReserveData>",
+                        "fields": {"name": "0", "value": {"fields": reserve_fields(otoken_total=1234)}}}}
+        self.loop.run_until_complete(self.mirror.refresh_fields(changes))
+        self.assertEqual(self.mirror.otoken_scaled[0], {9: 1234})
+        self.assertEqual(self.mirror.check_totals(), [])
+        self.assertIn(("user", 9), self.changes)
+        self.assertIn(("reserve", 0), self.changes)
+
+    def test_deleted_balance_field(self):
+        self.mirror.balance_fields["0xdebt"] = ("dtoken", 0, 3)
+        self.mirror.apply_events([stats_event(3, 0, 0, 500)])
+
+        # Repaid in full without an event of the user, then the field is deleted
+        changes = self.mirror.changed_fields([
+            {"type": "deleted", "objectId": "0xdebt", "version": "12"},
+            {"type": "deleted", "objectId": "0xunknown", "version": "12"},
+        ])
+        self.assertEqual(changes, {"0xdebt": False})
+        self.loop.run_until_complete(self.mirror.refresh_fields(changes))
+        self.assertEqual(self.mirror.dtoken_scaled[0], {})
+        self.assertNotIn("0xdebt", self.mirror.balance_fields)
+
+    def test_field_deleted_after_the_applied_transactions(self):
+        self.mirror.balance_fields["0xsupply"] = ("otoken", 0, 4)
+        self.mirror.apply_events([stats_event(4, 0, 10, 0)])
+        changes = self.mirror.changed_fields([
+            {"type": "mutated", "objectId": "0xsupply", "objectType": BALANCE_FIELD_TYPE,
+             "owner": {"ObjectOwner": OTOKEN_TABLE}},
+        ])
+        self.loop.run_until_complete(self.mirror.refresh_fields(changes))
+        self.assertEqual(self.mirror.otoken_scaled[0], {})
+
+    def test_sync_pages(self):
+        # Bootstrap leaves the cursors at the latest transactions
+        self.mirror.cursors = {"0xstorage": "c0", "0xoracle": "o0"}
+        treasury_change = {"type": "created", "objectId": "0xtreasury", "objectType": BALANCE_FIELD_TYPE,
+                           "owner": {"ObjectOwner": OTOKEN_TABLE}}
+        self.client.pages[("0xstorage", "c0")] = (
+            [{"digest": "c1", "events": [stats_event(1, 0, 100, 0)], "objectChanges": [treasury_change]}],
+            "c1", True)
+        self.client.pages[("0xstorage", "c1")] = ([{"digest": "c2", "events": [stats_event(2, 0, 0, 50)]}], "c2", False)
+        self.client.pages[("0xoracle", "o0")] = ([{"digest": "o1"}], "o1", False)
+        self.client.objects["0xtreasury"] = balance_field("0xtreasury", 9, 7)
+
+        self.assertEqual(self.loop.run_until_complete(self.mirror.sync()), 3)
+        # Each parent object pages with its own filter and cursor
+        self.assertEqual(self.client.queries, [("0xstorage", "c0"), ("0xstorage", "c1"), ("0xoracle", "o0")])
+        self.assertEqual(self.mirror.cursors, {"0xstorage": "c2", "0xoracle": "o1"})
+        self.assertEqual(self.mirror.otoken_scaled[0], {1: 100, 9: 7})
+        self.assertEqual(self.mirror.dtoken_scaled[0], {2: 50})
+
+        self.client.queries.clear()
+        self.assertEqual(self.loop.run_until_complete(self.mirror.sync()), 0)
+        self.assertEqual(self.client.queries, [("0xstorage", "c2"), ("0xoracle", "o1")])
+
+    def test_failed_sync_is_replayed(self):
+        self.mirror.cursors = {"0xstorage": "c0", "0xoracle": "o0"}
+        self.client.pages[("0xstorage", "c0")] = ([{"digest": "c1", "objectChanges": [
+            {"type": "created", "objectId": "0xtreasury", "objectType": BALANCE_FIELD_TYPE,
+             "owner": {"ObjectOwner": OTOKEN_TABLE}}]}], "c1", False)
+        self.client.objects["0xtreasury"] = balance_field("0xtreasury", 9, 7)
+
+        with mock.patch.object(self.client, "sui_multiGetObjects", side_effect=ConnectionError("rpc down")):
+            with self.assertRaises(ConnectionError):
+                self.loop.run_until_complete(self.mirror.sync())
+        self.assertEqual(self.mirror.cursors, {"0xstorage": "c0", "0xoracle": "o0"})
+
+        self.assertEqual(self.loop.run_until_complete(self.mirror.sync()), 1)
+        self.assertEqual(self.mirror.otoken_scaled[0], {9: 7})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from dola_sui_sdk.lending_state import Price
+from dola_sui_sdk.liquidation_watchlist import LiquidationWatchlist, PriceTriggers
+from test_health_engine import BTC, USDT, VIOLATOR, SAVER, fixed_mirror, user_info
+
+BORROWER = 4
+
+
+class TestPriceTriggers(unittest.TestCase):
+
+    def test_bounds_are_inclusive(self):
+        triggers = PriceTriggers()
+        for price, dola_user_id in [(300, 3), (100, 1), (200, 2), (200, 5)]:
+            triggers.add(price, dola_user_id)
+        self.assertEqual(triggers.at_or_above(200), [2, 5, 3])
+        self.assertEqual(triggers.at_or_below(200), [1, 2, 5])
+        self.assertEqual(triggers.at_or_above(301), [])
+        self.assertEqual(triggers.at_or_below(99), [])
+
+        triggers.remove(200, 2)
+        triggers.remove(200, 7)
+        self.assertEqual(triggers.entries, [(100, 1), (200, 5), (300, 3)])
+
+
+class TestLiquidationWatchlist(unittest.TestCase):
+
+    def setUp(self):
+        self.mirror = fixed_mirror()
+        self.mirror.subscribe = lambda callback: None
+        # 1.1 BTC of collateral, 18000 USDT of debt: health collateral 26400, health loan 18000
+        self.mirror.user_infos[BORROWER] = user_info(BORROWER, [BTC], [USDT])
+        self.mirror.otoken_scaled[BTC][BORROWER] = 10 ** 8
+        self.mirror.dtoken_scaled[USDT][BORROWER] = 15000 * 10 ** 8
+        self.watchlist = LiquidationWatchlist(self.mirror, rebuild_interval=3600)
+
+    def set_price(self, dola_pool_id, value):
+        self.mirror.prices[dola_pool_id] = Price(dola_pool_id, {"value": str(value), "decimal": "8",
+                                                                "last_update_timestamp": "0"})
+        self.watchlist.on_change("price", dola_pool_id)
+
+    def test_trigger_prices(self):
+        self.assertEqual([dola_user_id for dola_user_id, _ in self.watchlist.process()], [VIOLATOR])
+        # BTC: exposure 26400, shortfall -8400, the health factor hits 1 at 30000 * 18000 / 26400 = 20454.54545454
+        falling = 2045454545454
+        # USDT: exposure -18000, the health factor hits 1 at 1 * 26400 / 18000 = 1.46666666
+        rising = 146666666
+        self.assertEqual(self.watchlist.falling[BTC].entries, [(falling + falling * 50 // 10000, BORROWER)])
+        self.assertEqual(self.watchlist.rising[USDT].entries, [(rising - rising * 50 // 10000, BORROWER)])
+        self.assertEqual(self.watchlist.falling[USDT].entries, [])
+        # No loan, no trigger
+        self.assertNotIn(SAVER, self.watchlist.user_triggers)
+        self.assertNotIn(VIOLATOR, self.watchlist.user_triggers)
+
+    def test_unhealthy_until_healthy_again(self):
+        self.watchlist.process()
+        # Within the margin of the trigger: scored again, still healthy
+        self.set_price(BTC, 20500 * 10 ** 8)
+        self.assertEqual([dola_user_id for dola_user_id, _ in self.watchlist.process()], [VIOLATOR])
+        self.assertIn(BORROWER, self.watchlist.user_triggers)
+
+        # 1.1 * 20000 * 0.8 = 17600 < 18000
+        self.set_price(BTC, 20000 * 10 ** 8)
+        self.assertEqual(sorted(dola_user_id for dola_user_id, _ in self.watchlist.process()), [VIOLATOR, BORROWER])
+        self.assertNotIn(BORROWER, self.watchlist.user_triggers)
+        # Reported again without any change
+        self.assertEqual(sorted(dola_user_id for dola_user_id, _ in self.watchlist.process()), [VIOLATOR, BORROWER])
+
+        # The violator repays, the borrower is healthy at the old BTC price
+        self.mirror.dtoken_scaled[USDT][VIOLATOR] = 10 ** 8
+        self.watchlist.on_change("user", VIOLATOR)
+        self.set_price(BTC, 30000 * 10 ** 8)
+        self.assertEqual(self.watchlist.process(), [])
+        self.assertEqual(self.watchlist.unhealthy, {})
+        self.assertIn(BORROWER, self.watchlist.user_triggers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from dola_sui_sdk.view_cache import ViewCache
+
+STORAGE = "0x" + "5a" * 32
+ORACLE = "0x" + "0c" * 32
+
+
+def inspect_result(storage_version, oracle_version, value):
+    # devInspect also reports the objects the call would mutate, at versions never committed
+    return {
+        "effects": {
+            "status": {"status": "success"},
+            "sharedObjects": [{"objectId": STORAGE, "version": storage_version, "digest": "d"},
+                              {"objectId": ORACLE, "version": oracle_version, "digest": "d"}],
+            "mutated": [{"owner": {"Shared": {}},
+                         "reference": {"objectId": STORAGE, "version": storage_version + 100, "digest": "d"}}],
+        },
+        "results": [{"returnValues": [[value, "u256"]]}],
+    }
+
+
+class TestViewCache(unittest.TestCase):
+
+    def setUp(self):
+        self.versions = {STORAGE: 10, ORACLE: 20}
+        self.project = SimpleNamespace(effects_listeners=[], client=mock.MagicMock())
+        self.project.client.sui_multiGetObjects.side_effect = lambda object_ids, options: [
+            {"data": {"objectId": object_id, "version": str(self.versions[object_id])}} for object_id in object_ids]
+        self.module_function = mock.MagicMock()
+        self.module_function.package = SimpleNamespace(project=self.project, package_id="0xe")
+        self.module_function.abi = {"module_name": "interfaces", "func_name": "get_user_health_factor"}
+        self.module_function.view.side_effect = lambda *arguments: inspect_result(
+            self.versions[STORAGE], self.versions[ORACLE], self.versions[STORAGE])
+        # Probe on every view
+        self.cache = ViewCache(probe_interval=-1)
+
+    def test_hit_then_miss_after_version_bump(self):
+        first = self.cache.view(self.module_function, 1)
+        self.assertEqual(self.cache.versions, {STORAGE: 10, ORACLE: 20})
+        self.assertIs(self.cache.view(self.module_function, 1), first)
+        self.assertEqual(self.module_function.view.call_count, 1)
+
+        # Another call of the same function is another entry
+        self.cache.view(self.module_function, 2)
+        self.assertEqual(self.module_function.view.call_count, 2)
+
+        self.versions[STORAGE] = 11
+        second = self.cache.view(self.module_function, 1)
+        self.assertEqual(self.module_function.view.call_count, 3)
+        self.assertEqual(second["results"][0]["returnValues"], [[11, "u256"]])
+        self.assertIs(self.cache.view(self.module_function, 1), second)
+
+    def test_executed_transaction_effects(self):
+        self.cache.view(self.module_function, 1)
+        self.assertEqual(self.project.effects_listeners, [self.cache.observe_effects])
+        self.project.effects_listeners[0]({"mutated": [
+            {"owner": {"Shared": {}}, "reference": {"objectId": ORACLE, "version": "21", "digest": "d"}}]})
+        self.assertEqual(self.cache.versions[ORACLE], 21)
+        self.assertFalse(self.cache.is_latest({STORAGE: 10, ORACLE: 20}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -23,7 +23,7 @@ from . import bcs
 from .account import Account
 from .bcs import *
 from .parallelism import ThreadExecutor
-from .sui_client import SuiClient
+from .sui_client import SuiClient, AsyncSuiClient
 
 _load_project = []
 
@@ -280,7 +280,7 @@ class ModuleFunction:
         return self.package.project.execute(self.package.package_id, self.abi, *args, **kwargs)
 
     def __getattr__(self, item):
-        assert item in ["simulate", "inspect", "unsafe", "with_gas_coin",
+        assert item in ["simulate", "inspect", "view", "unsafe", "with_gas_coin",
                         "with_gas_coin_inspect"], f"{item} attribute not found"
         return functools.partial(getattr(self.package.project, item), self.package.package_id, self.abi)
 
@@ -407,8 +407,7 @@ class TransactionBuild:
 
     @classmethod
     def get_objects(cls, object_ids):
-        object_infos = cls.project().get_objects(object_ids)
-        return {object_info["data"]["objectId"]: object_info["data"] for object_info in object_infos}
+        return cls.project().get_object_infos(object_ids)
 
     @classmethod
     def prepare_object_info(cls, call_arg, parameters):
@@ -860,6 +859,10 @@ class TransactionBuild:
                                                    ObjectDigest(data["digest"])
                                                )))
 
+    @classmethod
+    def transaction_kind(cls, inputs, commands) -> TransactionKind:
+        return TransactionKind("ProgrammableTransaction", ProgrammableTransaction(inputs, commands))
+
     @classmethod
     def batch_transaction(
             cls,
@@ -867,8 +870,19 @@ class TransactionBuild:
             actual_params,
             transactions: list,
             gas_price,
-            gas_budget
+            gas_budget,
+            payment=None
     ):
+        batch_inputs, batch_commands = cls.batch_commands(actual_params, transactions)
+        return cls.build_intent_message(sender, batch_inputs, batch_commands, gas_price, gas_budget,
+                                        payment=payment, call_args=actual_params)
+
+    @classmethod
+    def batch_commands(
+            cls,
+            actual_params,
+            transactions: list,
+    ) -> (List[CallArg], List[Command]):
         batch_commands = []
         batch_call_args = []
         batch_parameters = []
@@ -936,8 +950,7 @@ class TransactionBuild:
                                  cls.generate_call_arg(batch_parameters[i], batch_call_args[i], object_infos)))
         batch_inputs.sort(key=lambda x: x[0])
         batch_inputs = [v[1] for v in batch_inputs]
-        return cls.build_intent_message(sender, batch_inputs, batch_commands, gas_price, gas_budget,
-                                        call_args=actual_params)
+        return batch_inputs, batch_commands
 
     @classmethod
     def upgrade(
@@ -1631,6 +1644,7 @@ class SuiProject:
         self.config = {}
         self.network_config = {}
         self.client: SuiClient = None
+        self.async_client: AsyncSuiClient = None
         self.accounts: Dict[str, Account] = {}
         self.__active_account = None
         self.packages: Dict[str, List[SuiPackage]] = DefaultDict([])
@@ -1640,6 +1654,11 @@ class SuiProject:
             self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.cache_file = self.cache_dir.joinpath(f"{self.network}-objects.json")
         self.cache_objects: Dict[Union[SuiObject, str], Dict[str, list]] = DefaultDict(DefaultDict(NonDupList()))
+        # Infos of shared and immutable objects: the initial shared version, or the version of an immutable
+        # object, never change, so call args of them are built without reading the objects again
+        self.static_object_infos: Dict[str, dict] = {}
+        # Called with the effects of every transaction executed successfully
+        self.effects_listeners = []
         self.cli_config_file = self.cache_dir.joinpath(".cli.yaml")
         self.cli_config: SuiCliConfig = None
 
@@ -1651,6 +1670,7 @@ class SuiProject:
     def add_endpoints(self, base_urls):
         for base_url in base_urls:
             self.client.add_endpoint(base_url)
+            self.async_client.add_endpoint(base_url)
 
     def set_gas_budget(self, gas_budget):
         """Set global gas budget"""
@@ -1726,6 +1746,7 @@ class SuiProject:
         # Create client
         assert "node_url" in self.network_config, "Endpoint not config"
         self.client = SuiClient(base_url=self.network_config["node_url"], timeout=3)
+        self.async_client = AsyncSuiClient(base_url=self.network_config["node_url"], timeout=3)
 
     def generate_account(self, account_name):
         assert account_name not in self.accounts
@@ -1852,6 +1873,8 @@ class SuiProject:
             pprint(result)
         assert result["effects"]["status"]["status"] == "success"
         self.update_object_index(result["effects"])
+        for listener in self.effects_listeners:
+            listener(result["effects"])
         print(f"Execute {module}::{function} success, transactionDigest: {result['effects']['transactionDigest']}")
         return result
 
@@ -1948,6 +1971,23 @@ class SuiProject:
                 raise ValueError
         return object_infos
 
+    def get_object_infos(self, object_ids):
+        """
+        :return: {object_id: object data}, shared and immutable objects from static_object_infos
+        """
+        missing = [object_id for object_id in dict.fromkeys(object_ids) if object_id not in self.static_object_infos]
+        object_infos = {}
+        if len(missing):
+            for object_info in self.get_objects(missing):
+                data = object_info["data"]
+                object_infos[data["objectId"]] = data
+                if "Shared" in data["owner"] or data["owner"] == "Immutable":
+                    self.static_object_infos[data["objectId"]] = data
+        for object_id in object_ids:
+            if object_id not in object_infos:
+                object_infos[object_id] = self.static_object_infos[object_id]
+        return object_infos
+
     def update_object_index(self, result):
         """
         Update Object cache after contract deployment and transaction execution
@@ -2071,22 +2111,33 @@ class SuiProject:
             gas_price=None,
             gas_budget=None,
     ):
-        if gas_budget is None:
-            gas_budget = self.gas_budget
-        if gas_price is None:
-            gas_price = self.estimate_gas_price()
-        msg = TransactionBuild.move_call(
-            self.account.account_address,
+        """devInspect ignores the gas data, gas_price and gas_budget are kept for compatibility"""
+        return self.view(package_id, abi, *arguments, type_arguments=type_arguments)
+
+    @property
+    def view_sender(self):
+        if self.__active_account is None:
+            return "0x" + "0" * 64
+        return self.__active_account.account_address
+
+    def view(
+            self,
             package_id,
-            abi,
-            type_arguments,
-            arguments,
-            gas_price=gas_price,
-            gas_budget=gas_budget
-        )
-        tx_bytes = base64.b64encode(msg.value.value.kind.encode).decode("ascii")
+            abi: dict,
+            *arguments,
+            type_arguments: List[str] = None,
+    ):
+        """
+        Read only call: only the transaction kind is built and sent to sui_devInspectTransactionBlock, so a
+        view is a single rpc once the shared objects are known, and needs no gas coin.
+        """
+        inputs, commands = TransactionBuild.command_move_call(package_id, abi, type_arguments, arguments)
+        return self.inspect_transaction_kind(TransactionBuild.transaction_kind(inputs, commands))
+
+    def inspect_transaction_kind(self, kind: TransactionKind):
+        tx_bytes = base64.b64encode(kind.encode).decode("ascii")
         return self.client.sui_devInspectTransactionBlock(
-            self.account.account_address,
+            self.view_sender,
             tx_bytes,
             None,
             None
@@ -2380,8 +2431,14 @@ class SuiProject:
             actual_params,
             transactions,
             gas_price=None,
-            gas_budget=None
+            gas_budget=None,
+            gas_coins=None
     ):
+        """
+        :param gas_coins: coins paying the gas, as returned by suix_getCoins or the gasObject reference of
+            effects. By default the largest coins of the account are used, so concurrent transactions must each
+            pass their own coins.
+        """
         if gas_budget is None:
             gas_budget = self.gas_budget
         if gas_price is None:
@@ -2391,12 +2448,19 @@ class SuiProject:
             package_id = module_function.package.package_id
             abi = module_function.abi
             inputs.append([package_id, abi, type_arguments, arguments])
+        payment = None
+        if gas_coins is not None:
+            payment = [ObjectRef(ObjectID(coin.get("coinObjectId", coin.get("objectId"))),
+                                 SequenceNumber(int(coin["version"])),
+                                 ObjectDigest(coin["digest"]))
+                       for coin in gas_coins]
         msg = TransactionBuild.batch_transaction(
             sender=self.account.account_address,
             actual_params=actual_params,
             transactions=inputs,
             gas_price=gas_price,
-            gas_budget=gas_budget)
+            gas_budget=gas_budget,
+            payment=payment)
 
         tx_bytes = base64.b64encode(msg.value.encode).decode("ascii")
         self.simulate_fail_abort(tx_bytes)
@@ -2441,29 +2505,22 @@ class SuiProject:
             gas_price=None,
             gas_budget=None
     ):
-        if gas_budget is None:
-            gas_budget = self.gas_budget
-        if gas_price is None:
-            gas_price = self.estimate_gas_price()
+        """devInspect ignores the gas data, gas_price and gas_budget are kept for compatibility"""
+        return self.batch_transaction_view(actual_params, transactions)
+
+    def batch_transaction_view(
+            self,
+            actual_params,
+            transactions,
+    ):
+        """Read only batch, see view"""
         inputs = []
         for module_function, arguments, type_arguments in transactions:
             package_id = module_function.package.package_id
             abi = module_function.abi
             inputs.append([package_id, abi, type_arguments, arguments])
-        msg = TransactionBuild.batch_transaction(
-            sender=self.account.account_address,
-            actual_params=actual_params,
-            transactions=inputs,
-            gas_price=gas_price,
-            gas_budget=gas_budget)
-
-        tx_bytes = base64.b64encode(msg.value.value.kind.encode).decode("ascii")
-        return self.client.sui_devInspectTransactionBlock(
-            self.account.account_address,
-            tx_bytes,
-            None,
-            None
-        )
+        batch_inputs, batch_commands = TransactionBuild.batch_commands(actual_params, inputs)
+        return self.inspect_transaction_kind(TransactionBuild.transaction_kind(batch_inputs, batch_commands))
 
     def with_gas_coin(
             self,
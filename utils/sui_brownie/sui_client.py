@@ -1,3 +1,6 @@
+import asyncio
+import random
+
 from retrying import retry
 import httpx
 
@@ -1257,3 +1260,113 @@ class SuiClient:
         response = response.json()
         assert "error" not in response, response
         return response["result"]
+
+
+class AsyncSuiClient:
+    """Asyncio counterpart of SuiClient sharing one connection pool across coroutines.
+
+    Requests are retried with the next endpoint on transport or api errors, the same
+    failover policy SuiClient applies through `update_endpoint`.
+    """
+
+    def __init__(self, base_url, timeout, max_attempts=5):
+        self.base_urls = [base_url]
+        self.endpoint = base_url
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self._client = None
+
+    def add_endpoint(self, base_url):
+        self.base_urls.append(base_url)
+
+    def update_endpoint(self):
+        self.endpoint = self.base_urls[(self.base_urls.index(self.endpoint) + 1) % len(self.base_urls)]
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def post(self, json):
+        last_error = None
+        for attempt in range(self.max_attempts):
+            try:
+                response = await self.client.post(url=self.endpoint, json=json)
+                if response.status_code >= 400:
+                    raise ApiError(response.text, response.status_code)
+                return response
+            except (httpx.HTTPError, ApiError) as e:
+                last_error = e
+                self.update_endpoint()
+                await asyncio.sleep(random.uniform(0.5, 1))
+        raise last_error
+
+    async def request(self, method, params):
+        response = await self.post(
+            json={
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": method,
+                "params": params
+            },
+        )
+        response = response.json()
+        assert "error" not in response, response
+        return response["result"]
+
+    async def sui_devInspectTransactionBlock(self, sender_address, tx_bytes, gas_price, epoch):
+        return await self.request("sui_devInspectTransactionBlock", [sender_address, tx_bytes, gas_price, epoch])
+
+    async def sui_dryRunTransactionBlock(self, tx_bytes):
+        return await self.request("sui_dryRunTransactionBlock", [tx_bytes])
+
+    async def sui_executeTransactionBlock(self, tx_bytes, signatures, options, request_type):
+        return await self.request("sui_executeTransactionBlock", [tx_bytes, signatures, options, request_type])
+
+    async def sui_getCheckpoint(self, checkpoint_id):
+        return await self.request("sui_getCheckpoint", [checkpoint_id])
+
+    async def sui_getEvents(self, transaction_digest):
+        return await self.request("sui_getEvents", [transaction_digest])
+
+    async def sui_getLatestCheckpointSequenceNumber(self):
+        return await self.request("sui_getLatestCheckpointSequenceNumber", [])
+
+    async def sui_getObject(self, object_id, options):
+        return await self.request("sui_getObject", [object_id, options])
+
+    async def sui_getTransactionBlock(self, digest, options):
+        return await self.request("sui_getTransactionBlock", [digest, options])
+
+    async def sui_multiGetObjects(self, object_ids, options):
+        return await self.request("sui_multiGetObjects", [object_ids, options])
+
+    async def sui_multiGetTransactionBlocks(self, digests, options):
+        return await self.request("sui_multiGetTransactionBlocks", [digests, options])
+
+    async def suix_getBalance(self, owner, coin_type):
+        return await self.request("suix_getBalance", [owner, coin_type])
+
+    async def suix_getCoins(self, owner, coin_type, cursor, limit):
+        return await self.request("suix_getCoins", [owner, coin_type, cursor, limit])
+
+    async def suix_getDynamicFieldObject(self, parent_object_id, name):
+        return await self.request("suix_getDynamicFieldObject", [parent_object_id, name])
+
+    async def suix_getDynamicFields(self, parent_object_id, cursor, limit):
+        return await self.request("suix_getDynamicFields", [parent_object_id, cursor, limit])
+
+    async def suix_getReferenceGasPrice(self):
+        return await self.request("suix_getReferenceGasPrice", [])
+
+    async def suix_queryEvents(self, query, cursor, limit, descending_order):
+        return await self.request("suix_queryEvents", [query, cursor, limit, descending_order])
+
+    async def suix_queryTransactionBlocks(self, query, cursor, limit, descending_order):
+        return await self.request("suix_queryTransactionBlocks", [query, cursor, limit, descending_order])